@@ -9,11 +9,13 @@ import time
 import random
 import sqlite3
 import socket
+import json
+import queue
 from datetime import datetime, timedelta
 
 # Auto-install packages if missing
 def install_packages():
-    required = {'flask': 'flask', 'flask_socketio': 'flask-socketio'}
+    required = {'flask': 'flask'}
     for module, package in required.items():
         try:
             __import__(module)
@@ -23,8 +25,7 @@ def install_packages():
 
 install_packages()
 
-from flask import Flask, render_template_string, jsonify
-from flask_socketio import SocketIO
+from flask import Flask, Response, render_template_string, jsonify, request
 import webbrowser
 
 # ============================================================================
@@ -47,6 +48,10 @@ class Config:
     
     USE_REAL_BLOOMBERG = True
     PORT = 8080
+    PUSH_MAX_FPS = 4  # at most this many delta frames per second on /api/stream
+    PUSH_QUEUE_FRAMES = 8  # frames buffered per browser before it has to catch up by polling
+    PUSH_KEEPALIVE_SECONDS = 15
+    PUSH_IDLE_CHECK_SECONDS = 1.0  # writes from other desks on the share are picked up this often
 
 # ============================================================================
 # BLOOMBERG CONNECTOR
@@ -302,16 +307,44 @@ class SharedDatabase:
         
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_status ON trades(status)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_trader ON trades(trader_name)")
+        self._create_change_tracking(cursor)
         
         conn.commit()
         conn.close()
     
+    def _create_change_tracking(self, cursor):
+        # Same change feed as the Windows build (and a no-op once it has set the file up): every write
+        # bumps store_meta.change_seq inside SQLite, deletes leave a tombstone
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(trades)").fetchall()]
+        if 'change_seq' not in columns:
+            cursor.execute("ALTER TABLE trades ADD COLUMN change_seq INTEGER DEFAULT 0")
+            columns.append('change_seq')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_seq ON trades(change_seq)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        cursor.execute("INSERT OR IGNORE INTO store_meta VALUES ('change_seq', 0)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS trade_tombstones (trade_id TEXT PRIMARY KEY, change_seq INTEGER NOT NULL)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tombstone_seq ON trade_tombstones(change_seq)")
+        bump = "UPDATE store_meta SET value = value + 1 WHERE key = 'change_seq';"
+        stamp = "UPDATE trades SET change_seq = (SELECT value FROM store_meta WHERE key = 'change_seq') WHERE rowid = NEW.rowid;"
+        data_columns = ', '.join(c for c in columns if c != 'change_seq')
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_trades_seq_insert AFTER INSERT ON trades BEGIN
+            {bump} {stamp}
+            DELETE FROM trade_tombstones WHERE trade_id = NEW.trade_id; END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_trades_seq_update AFTER UPDATE OF {data_columns} ON trades BEGIN
+            {bump} {stamp} END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_trades_seq_delete AFTER DELETE ON trades BEGIN
+            {bump}
+            INSERT OR REPLACE INTO trade_tombstones VALUES (OLD.trade_id, (SELECT value FROM store_meta WHERE key = 'change_seq')); END""")
+    
     def save_trade(self, trade):
         conn = sqlite3.connect(self.db_file)
         cursor = conn.cursor()
         
         cursor.execute("""
-            INSERT OR REPLACE INTO trades VALUES 
+            INSERT OR REPLACE INTO trades (trade_id, timestamp, currency_pair, side,
+                notional_amount, base_currency, quote_currency, execution_rate, current_market_rate,
+                value_date, settlement_date, counterparty, trader_name, status,
+                unrealized_pnl, realized_pnl, last_updated) VALUES 
             (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
         """, (
             trade['trade_id'], str(trade['timestamp']), trade['currency_pair'],
@@ -334,6 +367,24 @@ class SharedDatabase:
         conn.close()
         return [dict(row) for row in rows]
     
+    def current_seq(self):
+        conn = sqlite3.connect(self.db_file)
+        row = conn.execute("SELECT value FROM store_meta WHERE key = 'change_seq'").fetchone()
+        conn.close()
+        return row[0] if row else 0
+    
+    def get_changes_since(self, since):
+        """(seq, trades, deleted_ids, full) after change sequence `since`; full means trades is the whole table"""
+        seq = self.current_seq()
+        if since <= 0 or since > seq:
+            return seq, self.get_all_trades(), [], True
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM trades WHERE change_seq > ?", (since,)).fetchall()
+        deleted = conn.execute("SELECT trade_id FROM trade_tombstones WHERE change_seq > ?", (since,)).fetchall()
+        conn.close()
+        return seq, [dict(row) for row in rows], [row[0] for row in deleted], False
+    
     def get_open_trades(self):
         conn = sqlite3.connect(self.db_file)
         conn.row_factory = sqlite3.Row
@@ -351,7 +402,6 @@ shared_db = SharedDatabase(Config.DATABASE_FILE)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'fx-tracker-secret'
-socketio = SocketIO(app, cors_allowed_origins="*")
 tracker_instance = None
 
 HTML_TEMPLATE = """<!DOCTYPE html>
@@ -533,52 +583,84 @@ HTML_TEMPLATE = """<!DOCTYPE html>
                 });
         }
         
+        let tradeIndex = new Map(), changeSeq = 0;
+        
+        function sortKey(t) {
+            // Epoch ms once the Windows build has migrated the shared file, str(datetime) before that
+            return typeof t.timestamp === 'number' ? t.timestamp : Date.parse(String(t.timestamp).replace(' ', 'T')) || 0;
+        }
+        
+        function applyTradeDelta(d) {
+            if (d.full) tradeIndex = new Map();
+            d.trades.forEach(t => tradeIndex.set(t.trade_id, t));
+            d.deleted.forEach(id => tradeIndex.delete(id));
+            changeSeq = d.seq;
+            renderTrades(Array.from(tradeIndex.values()).sort((a, b) => sortKey(b) - sortKey(a)));
+        }
+        
         function updateTrades() {
-            fetch('/api/trades')
+            fetch('/api/trades?since=' + changeSeq)
                 .then(r => r.json())
-                .then(trades => {
-                    const tbody = document.getElementById('trades');
-                    tbody.innerHTML = '';
-                    
-                    document.getElementById('trade-count').textContent = trades.length;
-                    const openTrades = trades.filter(t => t.status === 'open');
-                    document.getElementById('open-count').textContent = openTrades.length;
-                    document.getElementById('last-update').textContent = new Date().toLocaleTimeString();
-                    
-                    const totalPnL = trades.reduce((sum, t) => sum + (t.pnl || 0), 0);
-                    const pnlEl = document.getElementById('total-pnl');
-                    pnlEl.textContent = (totalPnL >= 0 ? '+' : '') + '$' + Math.abs(totalPnL).toLocaleString('en-US', {minimumFractionDigits: 2});
-                    pnlEl.style.color = totalPnL >= 0 ? '#48bb78' : '#f56565';
-                    
-                    if (trades.length === 0) {
-                        tbody.innerHTML = '<tr><td colspan="10" style="text-align: center; padding: 60px; color: #a0aec0;">No trades yet. Monitoring...</td></tr>';
-                        return;
-                    }
-                    
-                    trades.forEach(t => {
-                        const row = tbody.insertRow();
-                        const pnl = t.pnl || 0;
-                        const pnlClass = pnl >= 0 ? 'pnl-positive' : 'pnl-negative';
-                        
-                        row.innerHTML = 
-                            '<td><span class="trade-id">' + t.trade_id + '</span></td>' +
-                            '<td>' + new Date(t.timestamp).toLocaleString('en-US', {month:'short', day:'numeric', hour:'2-digit', minute:'2-digit'}) + '</td>' +
-                            '<td><span class="trader-badge">' + t.trader + '</span></td>' +
-                            '<td>' + t.pair + '</td>' +
-                            '<td><span class="side-' + t.side + '">' + t.side + '</span></td>' +
-                            '<td>' + t.amount.toLocaleString('en-US', {maximumFractionDigits: 0}) + '</td>' +
-                            '<td>' + t.entry_rate.toFixed(4) + '</td>' +
-                            '<td>' + (t.current_rate ? t.current_rate.toFixed(4) : '--') + '</td>' +
-                            '<td class="' + pnlClass + '">' + (pnl >= 0 ? '+' : '') + '$' + Math.abs(pnl).toLocaleString('en-US', {minimumFractionDigits: 2}) + '</td>' +
-                            '<td><span class="status-' + t.status + '">' + t.status.toUpperCase() + '</span></td>';
-                    });
-                });
+                .then(d => { if (d.full || d.trades.length || d.deleted.length) applyTradeDelta(d); else changeSeq = d.seq; });
+        }
+        
+        function renderTrades(trades) {
+            const tbody = document.getElementById('trades');
+            tbody.innerHTML = '';
+            
+            document.getElementById('trade-count').textContent = trades.length;
+            const openTrades = trades.filter(t => t.status === 'open');
+            document.getElementById('open-count').textContent = openTrades.length;
+            document.getElementById('last-update').textContent = new Date().toLocaleTimeString();
+            
+            const totalPnL = trades.reduce((sum, t) => sum + (t.pnl || 0), 0);
+            const pnlEl = document.getElementById('total-pnl');
+            pnlEl.textContent = (totalPnL >= 0 ? '+' : '') + '$' + Math.abs(totalPnL).toLocaleString('en-US', {minimumFractionDigits: 2});
+            pnlEl.style.color = totalPnL >= 0 ? '#48bb78' : '#f56565';
+            
+            if (trades.length === 0) {
+                tbody.innerHTML = '<tr><td colspan="10" style="text-align: center; padding: 60px; color: #a0aec0;">No trades yet. Monitoring...</td></tr>';
+                return;
+            }
+            
+            trades.forEach(t => {
+                const row = tbody.insertRow();
+                const pnl = t.pnl || 0;
+                const pnlClass = pnl >= 0 ? 'pnl-positive' : 'pnl-negative';
+                
+                row.innerHTML = 
+                    '<td><span class="trade-id">' + t.trade_id + '</span></td>' +
+                    '<td>' + new Date(t.timestamp).toLocaleString('en-US', {month:'short', day:'numeric', hour:'2-digit', minute:'2-digit'}) + '</td>' +
+                    '<td><span class="trader-badge">' + t.trader + '</span></td>' +
+                    '<td>' + t.pair + '</td>' +
+                    '<td><span class="side-' + t.side + '">' + t.side + '</span></td>' +
+                    '<td>' + t.amount.toLocaleString('en-US', {maximumFractionDigits: 0}) + '</td>' +
+                    '<td>' + t.entry_rate.toFixed(4) + '</td>' +
+                    '<td>' + (t.current_rate ? t.current_rate.toFixed(4) : '--') + '</td>' +
+                    '<td class="' + pnlClass + '">' + (pnl >= 0 ? '+' : '') + '$' + Math.abs(pnl).toLocaleString('en-US', {minimumFractionDigits: 2}) + '</td>' +
+                    '<td><span class="status-' + t.status + '">' + t.status.toUpperCase() + '</span></td>';
+            });
+        }
+        
+        // Deltas pushed over Server-Sent Events, same as the Windows build; polling only while the stream is down
+        let pushConnected = false;
+        if (window.EventSource) {
+            const es = new EventSource('/api/stream');
+            es.onopen = () => { pushConnected = true; };
+            es.onerror = () => { pushConnected = false; };
+            es.onmessage = e => {
+                const f = JSON.parse(e.data);
+                if (!f.full && f.seq <= changeSeq) return;
+                if (!f.full && f.since > changeSeq) { updateTrades(); return; }  // missed a frame
+                applyTradeDelta(f);
+            };
         }
         
         updateStatus();
         updateTrades();
         setInterval(updateStatus, 5000);
-        setInterval(updateTrades, 1000);
+        setInterval(() => { if (!pushConnected) updateTrades(); }, 1000);
+        setInterval(updateTrades, 15000);  // safety resync while pushed
     </script>
 </body>
 </html>"""
@@ -587,12 +669,11 @@ HTML_TEMPLATE = """<!DOCTYPE html>
 def index():
     return render_template_string(HTML_TEMPLATE)
 
-@app.route('/api/trades')
-def api_get_trades():
-    trades = shared_db.get_all_trades()
-    return jsonify([{
+def trade_json(t):
+    return {
         'trade_id': t['trade_id'],
-        'timestamp': str(t['timestamp']),
+        # Epoch ms once the Windows build has migrated the shared file, str(datetime) before that
+        'timestamp': t['timestamp'] if isinstance(t['timestamp'], int) else str(t['timestamp']),
         'pair': t['currency_pair'],
         'side': t['side'],
         'amount': float(t['notional_amount']),
@@ -601,7 +682,92 @@ def api_get_trades():
         'pnl': float(t['unrealized_pnl']) if t['status'] == 'open' else (float(t['realized_pnl']) if t['realized_pnl'] else 0),
         'status': t['status'],
         'trader': t['trader_name']
-    } for t in trades])
+    }
+
+@app.route('/api/trades')
+def api_get_trades():
+    since = request.args.get('since', type=int)
+    if since is not None:
+        # Delta mode: only rows changed after `since`; a full snapshot when since=0 or the store was reset
+        try:
+            seq, trades, deleted, full = shared_db.get_changes_since(since)
+            return jsonify({'seq': seq, 'full': full, 'trades': [trade_json(t) for t in trades], 'deleted': deleted})
+        except:
+            return jsonify({'seq': since, 'full': False, 'trades': [], 'deleted': []})
+    return jsonify([trade_json(t) for t in shared_db.get_all_trades()])
+
+class ChangeBroadcaster:
+    """Change-feed deltas to every open dashboard, at most PUSH_MAX_FPS frames/s"""
+    
+    def __init__(self, storage):
+        self.storage = storage
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.seq = None
+    
+    def notify(self):
+        self.wake.set()
+    
+    def subscribe(self):
+        q = queue.Queue(maxsize=Config.PUSH_QUEUE_FRAMES)
+        with self.lock:
+            self.subscribers.add(q)
+        return q
+    
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.discard(q)
+    
+    def run(self):
+        # New trades, closes and marks that land within one frame interval go out as one frame
+        while True:
+            self.wake.wait(Config.PUSH_IDLE_CHECK_SECONDS)
+            self.wake.clear()
+            try:
+                self.publish()
+            except:
+                pass
+            time.sleep(1.0 / Config.PUSH_MAX_FPS)
+    
+    def publish(self):
+        if self.seq is None or not self.subscribers:
+            self.seq = self.storage.current_seq()  # nobody listening: just keep up with the feed
+            return
+        since = self.seq
+        seq, trades, deleted, full = self.storage.get_changes_since(since)
+        if seq == since:
+            return
+        self.seq = seq
+        frame = json.dumps({'since': since, 'seq': seq, 'full': full,
+                            'trades': [trade_json(t) for t in trades], 'deleted': deleted})
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(frame)
+            except queue.Full:
+                pass  # the page sees a gap in since/seq and catches up with a delta poll
+
+broadcaster = ChangeBroadcaster(shared_db)
+
+@app.route('/api/stream')
+def api_stream():
+    q = broadcaster.subscribe()
+    def stream():
+        try:
+            yield 'retry: 2000\n\n'
+            while True:
+                try:
+                    frame = q.get(timeout=Config.PUSH_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'data: {frame}\n\n'
+        finally:
+            broadcaster.unsubscribe(q)
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/status')
 def api_status():
@@ -636,6 +802,7 @@ class TeamFXTracker:
         
         threading.Thread(target=self.monitor_trades, daemon=True).start()
         threading.Thread(target=self.update_pnl, daemon=True).start()
+        threading.Thread(target=broadcaster.run, daemon=True).start()
         
         def open_browser():
             time.sleep(3)
@@ -643,8 +810,7 @@ class TeamFXTracker:
         
         threading.Thread(target=open_browser, daemon=True).start()
         
-        socketio.run(app, host='0.0.0.0', port=Config.PORT, debug=False,
-                     allow_unsafe_werkzeug=True, use_reloader=False)
+        app.run(host='0.0.0.0', port=Config.PORT, debug=False, use_reloader=False, threaded=True)
     
     def monitor_trades(self):
         while True:
@@ -666,12 +832,14 @@ class TeamFXTracker:
                     trade = scrub_trade_details(new_trade)
                     self.tracked_trades.add(trade['trade_id'])
                     self.storage.save_trade(trade)
+                    broadcaster.notify()
                 
                 if closed_trade:
                     trade = scrub_trade_details(closed_trade)
                     trade['current_market_rate'] = self.bloomberg.get_current_rate(trade['currency_pair'])
                     trade['realized_pnl'] = self.calculate_pnl(trade)
                     self.storage.save_trade(trade)
+                    broadcaster.notify()
                 
                 time.sleep(30)
             except:
@@ -684,6 +852,7 @@ class TeamFXTracker:
                     trade['current_market_rate'] = self.bloomberg.get_current_rate(trade['currency_pair'])
                     trade['unrealized_pnl'] = self.calculate_pnl(trade)
                     self.storage.save_trade(trade)
+                broadcaster.notify()
                 time.sleep(2)
             except:
                 time.sleep(5)
@@ -705,7 +874,6 @@ class TeamFXTracker:
 # ============================================================================
 
 if __name__ == '__main__':
-    global tracker_instance
     tracker_instance = TeamFXTracker()
     
     try:
@@ -0,0 +1,586 @@
+# fx_tracker_bench.py - Benchmarks for FX Trade Tracker internals
+# Runs against throwaway databases in a temp folder, never the shared Z: database
+#
+# Usage:
+#   python fx_tracker_bench.py            (run everything)
+#   python fx_tracker_bench.py pool       (run one benchmark)
+
+import sys
+import os
+import time
+import threading
+import shutil
+import sqlite3
+import json
+import tempfile
+import random
+import hashlib
+import tracemalloc
+from datetime import datetime, timedelta
+
+import fx_tracker_windows as fx
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+PAIRS = ['EUR/USD', 'GBP/USD', 'USD/JPY', 'AUD/USD', 'USD/CHF', 'EUR/GBP']
+
+def make_trade(i, status='open'):
+    pair = PAIRS[i % len(PAIRS)]
+    rate = 148.50 if 'JPY' in pair else 1.0850
+    return fx.scrub_trade_details({
+        'trade_id': f'BENCH{i:08d}',
+        'timestamp': datetime.now() - timedelta(seconds=i),
+        'currency_pair': pair,
+        'side': 'BUY' if i % 2 else 'SELL',
+        'notional_amount': 1000000 + i,
+        'execution_rate': rate,
+        'counterparty': 'HSBC',
+        'trader_name': 'Bench',
+        'status': status,
+    })
+
+class TempFolder:
+    def __enter__(self):
+        self.path = tempfile.mkdtemp(prefix='fxbench_')
+        return self.path
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def timed(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    return n / elapsed if elapsed else float('inf')
+
+def report(title, rows):
+    print(f"\n{title}")
+    print('-' * len(title))
+    for label, value in rows:
+        print(f"  {label:<40} {value}")
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+def bench_pool(n=2000):
+    """Pooled SharedDatabase vs the old connect/close per call"""
+    with TempFolder() as folder:
+        db_file = os.path.join(folder, 'pool.db')
+        db = fx.SharedDatabase(db_file)
+        trades = [make_trade(i) for i in range(200)]
+        for t in trades:
+            db.save_trade(t)
+
+        def per_call_read(i):
+            conn = sqlite3.connect(db_file, timeout=10.0)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute("SELECT * FROM trades WHERE status = 'open'").fetchall()
+            conn.close()
+            return [dict(r) for r in rows]
+
+        def per_call_write(i):
+            t = trades[i % len(trades)]
+            conn = sqlite3.connect(db_file, timeout=10.0)
+            conn.execute("UPDATE trades SET unrealized_pnl = ? WHERE trade_id = ?", (float(i), t.trade_id))
+            conn.commit()
+            conn.close()
+
+        def pooled_write(i):
+            t = trades[i % len(trades)]
+            t.unrealized_pnl = float(i)
+            db.save_trade(t)
+
+        rows = [
+            ('per-call connect, read open book', f"{timed(per_call_read, n):,.0f} ops/s"),
+            ('pooled, read open book', f"{timed(lambda i: db.get_open_trades(), n):,.0f} ops/s"),
+            ('per-call connect, single-row write', f"{timed(per_call_write, n):,.0f} ops/s"),
+            ('pooled, save_trade', f"{timed(pooled_write, n):,.0f} ops/s"),
+            ('connections opened by pool', db.pool.stats['created']),
+        ]
+        db.close()
+    report(f"Connection pool ({n} ops each, 200-trade book, local disk)", rows)
+
+def bench_batch(n=2000):
+    """One repricing pass over an n-position book: per-trade commits vs one batch"""
+    with TempFolder() as folder:
+        db = fx.SharedDatabase(os.path.join(folder, 'batch.db'))
+        db.save_trades_batch([make_trade(i) for i in range(n)])
+        book = db.get_open_trades()
+
+        start = time.perf_counter()
+        for t in book:
+            t.unrealized_pnl += 1.0
+            db.save_trade(t)
+        per_trade = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for t in book:
+            t.unrealized_pnl += 1.0
+        db.save_trades_batch(book)
+        batched = time.perf_counter() - start
+
+        marks = [(t.trade_id, 1.1, t.unrealized_pnl + 1.0, 0.0) for t in book]
+        start = time.perf_counter()
+        changed = db.update_marks(marks)
+        targeted = time.perf_counter() - start
+
+        start = time.perf_counter()
+        unchanged = db.update_marks(marks)
+        targeted_noop = time.perf_counter() - start
+        db.close()
+    report(f"P&L write-back ({n} open positions, local disk)", [
+        ('save_trade per position', f"{per_trade * 1000:,.1f} ms / pass ({n} commits)"),
+        ('save_trades_batch', f"{batched * 1000:,.1f} ms / pass (1 commit)"),
+        ('update_marks, every mark moved', f"{targeted * 1000:,.1f} ms / pass ({changed} rows changed)"),
+        ('update_marks, no mark moved', f"{targeted_noop * 1000:,.1f} ms / pass ({unchanged} rows changed)"),
+    ])
+
+def bench_concurrency(readers=4, seconds=3.0, book=2000):
+    """Dashboard pollers vs the 1 Hz writer: one global lock vs lock-free readers"""
+    rows = []
+    with TempFolder() as folder:
+        for label, serialize in (('global lock (old)', True), ('lock-free readers', False)):
+            db = fx.SharedDatabase(os.path.join(folder, f'rw_{serialize}.db'))
+            db.save_trades_batch([make_trade(i) for i in range(book)])
+            ids = [t.trade_id for t in db.get_open_trades()]
+            stop = threading.Event()
+            reads = [0] * readers
+            passes = []
+
+            def reader(slot):
+                while not stop.is_set():
+                    if serialize:
+                        with db.write_lock:
+                            db.get_all_trades()
+                    else:
+                        db.get_all_trades()
+                    reads[slot] += 1
+
+            def writer():
+                tick = 0
+                while not stop.is_set():
+                    tick += 1
+                    start = time.perf_counter()
+                    db.update_marks([(tid, 1.0 + tick * 1e-4, float(tick), float(tick)) for tid in ids])
+                    passes.append(time.perf_counter() - start)
+
+            threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+            threads.append(threading.Thread(target=writer))
+            for t in threads: t.start()
+            time.sleep(seconds)
+            stop.set()
+            for t in threads: t.join()
+            waits = db.write_lock.snapshot()
+            rows.append((f'{label}: full-book reads', f"{sum(reads) / seconds:,.0f} /s"))
+            rows.append((f'{label}: writer pass', f"{sum(passes) / len(passes) * 1000:,.1f} ms avg over {len(passes)} passes"))
+            rows.append((f'{label}: writer lock wait', f"avg {waits['avg_ms']} ms, max {waits['max_ms']} ms"))
+            db.close()
+    report(f"Reader/writer concurrency ({readers} pollers, {book}-trade book, {db.profile['journal_mode']} journal)", rows)
+
+def bench_query(n=100000):
+    """Full-list download vs a server-side filtered page on a large history"""
+    with TempFolder() as folder:
+        db = fx.SharedDatabase(os.path.join(folder, 'query.db'))
+        db.save_trades_batch([make_trade(i, 'open' if i % 20 == 0 else 'closed') for i in range(n)])
+        client = fx.app.test_client()
+        fx.shared_db = db
+        rows = []
+        for label, url in (('full /api/trades', '/api/trades'),
+                           ('open USD/JPY, newest 50', '/api/trades?status=open&pair=USD/JPY&limit=50'),
+                           ('search "BENCH0009", by pnl', '/api/trades?q=BENCH0009&sort=pnl&limit=50'),
+                           ('all, by pips, page 10', '/api/trades?sort=pips&limit=50&offset=450')):
+            start = time.perf_counter()
+            body = client.get(url).get_data()
+            rows.append((label, f"{(time.perf_counter() - start) * 1000:,.1f} ms, {len(body) / 1024:,.0f} KB"))
+        db.close()
+    report(f"Blotter queries ({n:,} trades)", rows)
+
+def bench_pnl(sizes=(10000, 100000, 1000000)):
+    """Per-trade calculate_pnl loop vs PositionBook vectorized pass, with the one-off load and in-place patching"""
+    if not fx.HAS_NUMPY:
+        print("\nP&L engine benchmark needs NumPy (pip install numpy)")
+        return
+    tracker = fx.TeamFXTracker.__new__(fx.TeamFXTracker)  # calculate_pnl only, no threads or storage
+    pair_rates = {pair: (148.5 if 'JPY' in pair else 1.085) for pair in PAIRS}
+    rows = []
+    for n in sizes:
+        book_rows = [fx.Trade(f'T{i}', None, PAIRS[i % len(PAIRS)], 'BUY' if i % 2 else 'SELL', 1000000.0, None, None,
+                              1.08 + (i % 100) * 1e-4, None, None, None, None, None, 'open', 0.0, None, None)
+                     for i in range(n)]
+
+        start = time.perf_counter()
+        for trade in book_rows:
+            trade.current_market_rate = pair_rates[trade.currency_pair]
+            trade.unrealized_pnl = tracker.calculate_pnl(trade)
+        loop = time.perf_counter() - start
+
+        start = time.perf_counter()
+        book = fx.PositionBook()
+        book.load(book_rows)
+        loaded = time.perf_counter() - start
+
+        vector = [pair_rates[pair] for pair in book.pairs]
+        start = time.perf_counter()
+        book.reprice(vector)
+        repriced = time.perf_counter() - start
+
+        # Stream mode: a tick on one pair reprices just that pair's positions
+        start = time.perf_counter()
+        one = book.rows_for(PAIRS[:1])
+        book.changed_marks(*book.reprice(vector, one), one)
+        ticked = time.perf_counter() - start
+
+        # The tracker loads once, then patches the live book per ingest batch: 100 opens + 100 closes
+        batch = book_rows[:100]
+        for trade in batch:
+            trade.status = 'closed'
+        start = time.perf_counter()
+        book.apply(batch)
+        for trade in batch:
+            trade.status = 'open'
+        book.apply(batch)
+        patched = time.perf_counter() - start
+
+        rows.append((f'{n:>9,} positions: python loop', f"{loop * 1000:,.1f} ms"))
+        rows.append((f'{n:>9,} positions: one-off book load', f"{loaded * 1000:,.1f} ms"))
+        rows.append((f'{n:>9,} positions: vectorized reprice', f"{repriced * 1000:,.2f} ms ({loop / repriced:,.0f}x, "
+                                                               f"{loop / (loaded + repriced):,.1f}x with the load)"))
+        rows.append((f'{n:>9,} positions: one pair ticking', f"{ticked * 1000:,.2f} ms ({len(one):,} positions repriced)"))
+        rows.append((f'{n:>9,} positions: patch 200 events', f"{patched * 1000:,.2f} ms"))
+        del book_rows, book
+    report("P&L engine", rows)
+
+def bench_ticks(rates=(1000, 10000, 100000), seconds=2.0):
+    """Local UDP tick server -> UdpTickStream -> TickHub (rate cache + dirty pairs)"""
+    rows = []
+    for n, rate in enumerate(rates):
+        port = fx.Config.TICK_FEED_PORT + 10 + n
+        hub = fx.TickHub(fx.RateCache())
+        stream = fx.UdpTickStream(hub.on_ticks, port=port)
+        stream.start()
+        server = fx.TickServer(rate, port=port, seed=n)
+        start = time.perf_counter()
+        server.run(duration=seconds)
+        sent_in = time.perf_counter() - start
+        time.sleep(0.2)  # drain
+        stream.stop()
+        dirty = len(hub.take_dirty())
+        lost = server.sent - hub.ticks
+        rows.append((f'{rate:>7,} ticks/s target',
+                     f"sent {server.sent / sent_in:,.0f}/s, ingested {hub.ticks:,} "
+                     f"({lost / server.sent:.1%} lost), {dirty} dirty pairs"))
+    report(f"Tick stream ingest ({seconds:.0f} s per rate, loopback UDP)", rows)
+
+def bench_ingest(n=20000, rate=5000):
+    """Event ingestion: n trade events (10% re-sent) at a paced rate -> micro-batched writes"""
+    with TempFolder() as folder:
+        db = fx.SharedDatabase(os.path.join(folder, 'ingest.db'))
+        prepare = lambda events: [fx.scrub_trade_details(raw) for kind, raw in events]
+        ingest = fx.TradeIngestQueue(db, prepare)
+        ingest.start()
+        raws = [make_trade(i).to_dict() for i in range(n)]
+        start = time.perf_counter()
+        for i, raw in enumerate(raws):
+            ingest.push('new', raw, 1)
+            if i % 10 == 0:
+                ingest.push('new', raws[i // 2], 1)  # duplicate delivery
+            if i % 50 == 49:
+                time.sleep(max(start + (i + 1) / rate - time.perf_counter(), 0))
+        while ingest.latency.count < n + n // 10:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        stats = ingest.get_stats()
+        db.close()
+    report(f"Trade ingestion ({n:,} events + {n // 10:,} duplicates at {rate:,}/s)", [
+        ('throughput', f"{stats['events'] / elapsed:,.0f} events/s"),
+        ('transactions', f"{stats['batches']:,} ({stats['events'] / stats['batches']:,.1f} events each)"),
+        ('rows written / duplicates dropped', f"{stats['written']:,} / {stats['duplicates']:,}"),
+        ('enqueue -> commit latency', f"p50 {stats['latency']['p50_ms']} ms, p99 {stats['latency']['p99_ms']} ms"),
+    ])
+
+def bench_mock(history=200000, closes=2000, flow_rates=(1000, 10000), seconds=2.0):
+    """Mock load generator: close selection over a large history, and sustained flow rate"""
+    mock = fx.MockBloombergAPI(max_history=history + closes)
+    for i in range(history):
+        mock.new_trade()
+
+    def scan_close(i):  # the old maybe_close_trade: rebuild the open list every call
+        open_trades = [t for t in mock.trades if t['status'] == 'open']
+        fx.random.choice(open_trades)['status'] = 'closed'
+
+    rows = [
+        ('scan history per close (old)', f"{timed(scan_close, closes // 100):,.0f} closes/s"),
+        ('open-trade index, swap-remove', f"{timed(lambda i: mock.close_trade(), closes):,.0f} closes/s"),
+    ]
+    for rate in flow_rates:
+        flow = fx.MockBloombergAPI(trades_per_second=rate)
+        opened = closed = 0
+        flow.generate_flow()
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            time.sleep(fx.Config.MOCK_FLOW_TICK_SECONDS)
+            new_trades, closed_trades = flow.generate_flow()
+            opened += len(new_trades)
+            closed += len(closed_trades)
+        elapsed = time.perf_counter() - start
+        rows.append((f'{rate:>6,} trades/s target', f"opened {opened / elapsed:,.0f}/s, closed {closed / elapsed:,.0f}/s, "
+                                                      f"{len(flow.open_trades):,} open"))
+    report(f"Mock trade source ({history:,}-trade history)", rows)
+
+def bench_sim(steps=1000000, seed=42):
+    """Demo price simulator: generation cost, per-quote cost, and bit-for-bit repeatability"""
+    sim = fx.PriceSimulator(seed=seed)
+    start = time.perf_counter()
+    rows = sim.generate(steps)
+    generated = time.perf_counter() - start
+    digest = hashlib.sha256(repr(rows).encode()).hexdigest()[:16]
+    replay = hashlib.sha256(repr(fx.PriceSimulator(seed=seed).generate(steps)).encode()).hexdigest()[:16]
+    del rows
+
+    def uniform_quote(i):  # the old get_current_rate: independent noise around the base rate
+        base = fx.MockBloombergAPI.BASE_RATES['EUR/USD']
+        return round(base + random.uniform(-0.02, 0.02), 4)
+
+    mock = fx.MockBloombergAPI(seed=seed)
+    report(f"Price simulator ({steps:,} steps x {len(sim.pairs)} pairs, {sim.model}, numpy={fx.HAS_NUMPY})", [
+        ('vectorized generation', f"{steps * len(sim.pairs) / generated:,.0f} prices/s"),
+        ('uniform noise quote (old)', f"{timed(uniform_quote, 200000):,.0f} quotes/s"),
+        ('simulator quote, all pairs', f"{timed(lambda i: mock.get_rates(sim.pairs), 200000):,.0f} snapshots/s"),
+        (f'path digest, seed {seed}', f"{digest} (replay {'matches' if digest == replay else 'DIFFERS: ' + replay})"),
+    ])
+
+def bench_replay(seconds=300, book=2000, seed=42):
+    """Tick log write rate, then the whole TeamFXTracker repricing pipeline driven from a replay at max speed"""
+    with TempFolder() as folder:
+        path = os.path.join(folder, 'session.ticks')
+        sim = fx.PriceSimulator(seed=seed, step_seconds=1)
+        recorder = fx.TickRecorder(path)
+        t0 = time.time_ns()
+        start = time.perf_counter()
+        for second in range(seconds):  # one recorded snapshot of every pair per second
+            recorder.record_many(zip(sim.pairs, sim.step()), ns=t0 + second * 10 ** 9)
+        recorded = time.perf_counter() - start
+        recorder.close()
+        size = os.path.getsize(path)
+
+        rows = [('record', f"{recorder.records / recorded:,.0f} ticks/s, {size / recorder.records:.1f} bytes/tick")]
+        digests = []
+        for run in (1, 2):
+            db = fx.SharedDatabase(os.path.join(folder, f'replay{run}.db'))
+            db.save_trades_batch([make_trade(i) for i in range(book)])
+            fx.shared_db = fx.broadcaster.storage = db
+            fx.Config.REPLAY_TICK_LOG, fx.Config.REPLAY_SPEED = path, 0
+            tracker = fx.TeamFXTracker()
+            start = time.perf_counter()
+            cycles = changed = 0
+            while not tracker.bloomberg.finished:
+                changed += tracker.reprice_open_book()
+                cycles += 1
+            elapsed = time.perf_counter() - start
+            marks = sorted((t.trade_id, t.current_market_rate, t.unrealized_pnl) for t in db.get_open_trades())
+            digests.append(hashlib.sha256(repr(marks).encode()).hexdigest()[:16])
+            fx.Config.REPLAY_TICK_LOG = None
+            db.close()
+        rows.append(('max-speed replay, reprice + write-back', f"{cycles / elapsed:,.1f} snapshots/s "
+                                                               f"({seconds / elapsed:,.0f}x recorded pace)"))
+        rows.append(('marks written', f"{changed:,} over {cycles:,} snapshots"))
+        rows.append(('final book digest, two replays', ' / '.join(digests) + (' (match)' if digests[0] == digests[1] else ' (DIFFER)')))
+    report(f"Replay pipeline ({seconds:,} s recorded, {len(sim.pairs)} pairs, {book:,}-position book)", rows)
+
+def bench_trades(n=1000000):
+    """Trade records vs per-trade dicts over an n-row history: memory, row/JSON conversion, full read"""
+    rows = [make_trade(i, 'open' if i % 20 == 0 else 'closed').to_row() for i in range(n)]
+
+    def footprint(build):
+        tracemalloc.start()
+        records = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return records, size / n
+
+    def rate(fn, records):
+        start = time.perf_counter()
+        for record in records:
+            fn(record)
+        return f"{n / (time.perf_counter() - start):,.0f} /s"
+
+    dicts, dict_bytes = footprint(lambda: [dict(zip(fx.TRADE_COLUMNS, row)) for row in rows])
+    dict_from_row = rate(lambda row: dict(zip(fx.TRADE_COLUMNS, row)), rows)
+    del dicts
+    trades, trade_bytes = footprint(lambda: [fx.Trade(*row) for row in rows])
+    result = [
+        ('bytes per trade: dict (old)', f"{dict_bytes:,.0f}"),
+        ('bytes per trade: Trade', f"{trade_bytes:,.0f}"),
+        ('from row: dict(row) (old)', dict_from_row),
+        ('from row: Trade.from_row', rate(fx.Trade.from_row, rows)),
+        ('to row: Trade.to_row', rate(fx.Trade.to_row, trades)),
+        ('to JSON: Trade.to_json', rate(fx.Trade.to_json, trades)),
+    ]
+    del rows
+    with TempFolder() as folder:
+        db = fx.SharedDatabase(os.path.join(folder, 'trades.db'))
+        db.save_trades_batch(trades)
+        del trades
+        with db.read_pool.connection() as conn:
+            start = time.perf_counter()
+            old = [dict(row) for row in conn.execute("SELECT * FROM trades ORDER BY timestamp DESC").fetchall()]
+            result.append(('full read, sqlite3.Row -> dict (old)', f"{time.perf_counter() - start:,.2f} s"))
+            del old
+        start = time.perf_counter()
+        db.get_all_trades()
+        result.append(('full read, get_all_trades -> Trade', f"{time.perf_counter() - start:,.2f} s"))
+        db.close()
+    report(f"Trade records ({n:,}-row history)", result)
+
+def bench_schema(n=200000):
+    """v0 text timestamps vs migrated epoch integers: migration cost and time-ordered reads"""
+    with TempFolder() as folder:
+        path = os.path.join(folder, 'schema.db')
+        conn = sqlite3.connect(path)
+        conn.execute(fx.TRADES_TABLE_SQL.replace('INTEGER', 'TEXT') % 'trades')  # the v0 column types
+        conn.execute("CREATE INDEX idx_timestamp ON trades(timestamp)")
+        base = datetime.now()
+        v0_columns = [c for c in fx.TRADE_COLUMNS if c != 'pips']
+        conn.executemany(f"INSERT INTO trades ({', '.join(v0_columns)}) VALUES ({','.join('?' * len(v0_columns))})",
+                         [(f'BENCH{i:08d}', str(base - timedelta(seconds=i)), 'EUR/USD', 'BUY', 1e6, 'EUR', 'USD', 1.085, None,
+                           str(base.date()), str(base.date()), 'HSBC', 'Bench', 'closed', 0.0, 1.0, str(base))
+                          for i in range(n)])
+        conn.commit()
+
+        def newest_page(i):
+            conn.execute("SELECT * FROM trades ORDER BY timestamp DESC LIMIT 200").fetchall()
+
+        def full_sort(i):
+            conn.execute("SELECT timestamp FROM trades ORDER BY timestamp DESC").fetchall()
+
+        rows = [('text: newest 200 page', f"{timed(newest_page, 200):,.0f} /s"),
+                ('text: full ordered scan', f"{timed(full_sort, 5):,.1f} /s")]
+        conn.close()
+        start = time.perf_counter()
+        db = fx.SharedDatabase(path)
+        rows.append(('migrate to current schema', f"{time.perf_counter() - start:,.2f} s"))
+        conn = sqlite3.connect(path)
+        rows += [('epoch: newest 200 page', f"{timed(newest_page, 200):,.0f} /s"),
+                 ('epoch: full ordered scan', f"{timed(full_sort, 5):,.1f} /s")]
+        conn.close()
+        db.close()
+    report(f"Trade timestamps ({n:,} trades)", rows)
+
+def bench_archive(n=200000, open_trades=500, days=730, horizon=7):
+    """Live-table poll cost with years of closed history, before and after the hot/cold split"""
+    with TempFolder() as folder:
+        db = fx.SharedDatabase(os.path.join(folder, 'archive.db'))
+        trades = [make_trade(i, 'open' if i < open_trades else 'closed') for i in range(n)]
+        for i, t in enumerate(trades):  # closes spread evenly over `days`
+            t.timestamp = fx.epoch_ms(datetime.now() - timedelta(days=days * i / n))
+        db.save_trades_batch(trades)
+        db.pool.run(lambda conn: conn.execute("UPDATE trades SET last_updated = timestamp") and conn.commit())
+        fx.shared_db = db
+        client = fx.app.test_client()
+
+        def poll():
+            start = time.perf_counter()
+            body = client.get('/api/trades?since=0').get_data()
+            return f"{(time.perf_counter() - start) * 1000:,.0f} ms, {len(body) / 1024:,.0f} KB"
+
+        rows = [(f'full poll, {n:,} live rows', poll())]
+        start = time.perf_counter()
+        moved = db.archive_closed(fx.epoch_ms(datetime.now() - timedelta(days=horizon)))
+        rows.append((f'archive {moved:,} closes', f"{time.perf_counter() - start:,.2f} s"))
+        rows.append((f'full poll, {n - moved:,} live rows', poll()))
+        start = time.perf_counter()
+        body = client.get('/api/archive?pair=USD/JPY&limit=50').get_data()
+        rows.append(('/api/archive USD/JPY, newest 50', f"{(time.perf_counter() - start) * 1000:,.1f} ms, {len(body) / 1024:,.0f} KB"))
+        db.close()
+    report(f"Hot/cold split ({n:,} trades over {days} days, {horizon}-day horizon)", rows)
+
+def bench_summary(n=50000, moved=500):
+    """Stats cards: full list + client-side passes (old) vs incremental /api/summary"""
+    with TempFolder() as folder:
+        db = fx.SharedDatabase(os.path.join(folder, 'summary.db'))
+        trades = [make_trade(i, 'open' if i % 2 else 'closed') for i in range(n)]
+        db.save_trades_batch(trades)
+        fx.shared_db = fx.broadcaster.storage = fx.summary.storage = db
+        fx.summary._reset()
+        client = fx.app.test_client()
+
+        def old_cards(i):
+            listing = json.loads(client.get('/api/trades').get_data())
+            open_count = sum(1 for t in listing if t['status'] == 'open')
+            closed_count = sum(1 for t in listing if t['status'] == 'closed')
+            return len(listing), open_count, closed_count, sum(t['pnl'] for t in listing)
+
+        def reprice(i):
+            db.update_marks([(t.trade_id, 1.1 + i * 1e-5, float(i), 0.1 * i) for t in trades[1:moved * 2:2]])
+
+        start = time.perf_counter()
+        client.get('/api/summary')
+        first = time.perf_counter() - start
+        timings = []
+        for i in range(20):
+            reprice(i)
+            start = time.perf_counter()
+            client.get('/api/summary')
+            timings.append(time.perf_counter() - start)
+        rows = [
+            ('full list + passes (old)', f"{1000 / timed(old_cards, 3):,.0f} ms per refresh"),
+            ('/api/summary, first (full build)', f"{first * 1000:,.0f} ms"),
+            (f'/api/summary after {moved} marks moved', f"{sum(timings) / len(timings) * 1000:,.1f} ms per refresh"),
+        ]
+        db.close()
+    report(f"Stats cards ({n:,}-trade live blotter)", rows)
+
+def bench_shell(n=500):
+    """Dashboard page load: Jinja render of the old inline template vs the pre-built shell and assets"""
+    from flask import render_template_string
+    inline = (f"<!DOCTYPE html><html><head><style>{fx.DASHBOARD_CSS}</style></head><body>{fx.DASHBOARD_BODY}"
+              f"<script>{fx.DASHBOARD_WORKER_JS}</script><script>{fx.DASHBOARD_JS}</script></body></html>")
+    client = fx.app.test_client()
+    gz = {'Accept-Encoding': 'gzip'}
+    etag = client.get('/').headers['ETag']
+
+    def old_page(i):
+        with fx.app.test_request_context('/'):
+            render_template_string(inline)
+
+    first_load = sum(len(client.get(url, headers=gz).get_data()) for url in ['/'] + list(fx.STATIC_ASSETS))
+    report("Dashboard shell", [
+        ('render_template_string per load (old)', f"{timed(old_page, n):,.0f} /s, {len(inline.encode()):,} bytes"),
+        ('pre-built shell, gzip', f"{timed(lambda i: client.get('/', headers=gz), n):,.0f} /s"),
+        ('pre-built shell, ETag revalidation', f"{timed(lambda i: client.get('/', headers={'If-None-Match': etag}), n):,.0f} /s"),
+        ('first load, shell + assets on the wire', f"{first_load:,} bytes ({'br' if fx.HAS_BROTLI else 'gzip'} available)"),
+        ('repeat load on the wire', f"{len(client.get('/', headers={'If-None-Match': etag}).get_data())} bytes + 304"),
+    ])
+
+BENCHMARKS = {
+    'pool': bench_pool,
+    'batch': bench_batch,
+    'concurrency': bench_concurrency,
+    'query': bench_query,
+    'pnl': bench_pnl,
+    'ticks': bench_ticks,
+    'ingest': bench_ingest,
+    'mock': bench_mock,
+    'sim': bench_sim,
+    'replay': bench_replay,
+    'trades': bench_trades,
+    'schema': bench_schema,
+    'archive': bench_archive,
+    'summary': bench_summary,
+    'shell': bench_shell,
+}
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        BENCHMARKS[name]()
+
+if __name__ == '__main__':
+    main()
@@ -13,9 +13,21 @@ import os
 import subprocess
 import threading
 import time
+import math
 import random
 import sqlite3
-from datetime import datetime, timedelta
+import queue
+import atexit
+import json
+import socket
+import struct
+import gzip
+import hashlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+
+STARTED_AT = time.time()  # startup-to-first-paint is measured from here
 
 # ============================================================================
 # AUTO-INSTALL PACKAGES
@@ -32,7 +44,7 @@ def install_packages():
 
 try:
     install_packages()
-    from flask import Flask, render_template_string, jsonify, request
+    from flask import Flask, Response, jsonify, request
     import webview
 except ImportError:
     print("Error: Run: pip install flask pywebview")
@@ -46,6 +58,20 @@ try:
 except ImportError:
     HAS_BLOOMBERG = False
 
+# NumPy powers the vectorized P&L engine; without it the tracker reprices trade by trade
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Brotli shrinks the dashboard assets further for clients that accept it; gzip is always built
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -65,10 +91,152 @@ class Config:
     USE_REAL_BLOOMBERG = HAS_BLOOMBERG
     PORT = 8765
     
+    # Connection pool for the shared database (network share friendly)
+    DB_POOL_SIZE = 8                 # idle connections kept open per process
+    DB_TIMEOUT = 10.0                # sqlite busy timeout in seconds
+    DB_HEALTHCHECK_SECONDS = 15      # ping idle connections older than this before reuse
+    
+    # Storage profile - 'auto' probes SHARED_FOLDER at startup: WAL on local disk,
+    # rollback journal on network shares (WAL needs shared memory on a single host)
+    DB_JOURNAL_MODE = 'auto'         # 'auto', 'wal' or 'delete'
+    DB_SYNCHRONOUS = 'NORMAL'        # used with WAL; rollback journal always runs FULL
+    DB_CACHE_SIZE_KB = 16384
+    DB_MMAP_SIZE = 64 * 1024 * 1024  # disabled on network shares
+    DB_WAL_AUTOCHECKPOINT = 1000     # pages
+    DB_CHECKPOINT_SECONDS = 60       # background PASSIVE checkpoint interval, 0 = off
+    
+    # Hot/cold split: closed trades older than this move from the live table to trades_archive.
+    # Opt-in: archived rows leave the blotter and are only reachable through /api/archive
+    ARCHIVE_AFTER_DAYS = 0           # 0 = never archive (e.g. 7 keeps a week of closes live)
+    ARCHIVE_CHECK_SECONDS = 600
+    ARCHIVE_BATCH = 500              # trades moved per transaction (short write locks on the share)
+    
+    # Server push (Server-Sent Events on /api/stream)
+    PUSH_MAX_FPS = 4                 # at most this many delta frames per second
+    PUSH_IDLE_CHECK_SECONDS = 2      # also look for writes from other desks this often
+    PUSH_KEEPALIVE_SECONDS = 15
+    PUSH_QUEUE_FRAMES = 8            # a client this far behind is dropped a frame and resyncs
+    
+    # Server-side blotter queries (/api/trades?status=...&sort=...&limit=...)
+    QUERY_DEFAULT_LIMIT = 200
+    QUERY_MAX_LIMIT = 1000
+    
+    # Shared in-process rate cache
+    RATE_CACHE_TTL_SECONDS = 0.5     # quotes younger than this are reused without asking the feed
+    RATE_CACHE_MAX_PAIRS = 256
+    RATE_STALE_SECONDS = 10          # marks from quotes older than this are flagged stale
+    
+    # Market data: 'poll' asks for a rate snapshot every second; 'stream' takes pushed ticks
+    # (//blp/mktdata on a live terminal, otherwise the local UDP tick server stand-in)
+    MARKET_DATA_MODE = 'poll'
+    STREAM_PAIRS = ['EUR/USD', 'GBP/USD', 'USD/JPY', 'AUD/USD', 'USD/CHF', 'EUR/GBP', 'USD/CAD', 'NZD/USD']
+    STREAM_REPRICE_SECONDS = 0.2     # ticking pairs are repriced at most this often
+    BOOK_RESYNC_MAX = 500            # trades opened/amended elsewhere past this in one pass: reload the open book
+    # Price move of one pip per pair; pairs not listed fall back to 0.01 for JPY crosses, else 0.0001
+    PIP_SIZES = {'EUR/USD': 0.0001, 'GBP/USD': 0.0001, 'USD/JPY': 0.01, 'AUD/USD': 0.0001, 'USD/CHF': 0.0001,
+                 'EUR/GBP': 0.0001, 'USD/CAD': 0.0001, 'NZD/USD': 0.0001, 'EUR/JPY': 0.01, 'GBP/JPY': 0.01}
+    TICK_FEED_HOST = '127.0.0.1'
+    TICK_FEED_PORT = 8766
+    
+    # Trade ingestion: connector events are deduplicated and written in micro-batches
+    INGEST_BATCH_MAX = 500           # events per transaction
+    INGEST_BATCH_WAIT = 0.005        # seconds to linger for more events after the first arrives
+    INGEST_VERSIONS_MAX = 50000      # open trades whose last written version is remembered (LRU)
+    MOCK_EVENT_SECONDS = 30          # demo feed: how often the mock may open/close a trade
+    MOCK_TRADES_PER_SECOND = 0       # >0: sustained synthetic flow for load testing (0 = demo trickle)
+    MOCK_CLOSE_RATIO = 0.9           # closes per new trade in sustained flow (<1 lets the book grow)
+    MOCK_FLOW_TICK_SECONDS = 0.05    # how often the sustained flow is released
+    MOCK_MAX_HISTORY = 100000        # mock blotter history kept in memory (open trades stay indexed)
+    
+    # Demo price simulator: seeded, correlated random walk (same seed + same calls = same prices)
+    SIM_SEED = None                  # None = fresh prices each launch; set an int for repeatable runs
+    SIM_MODEL = 'ou'                 # 'ou' mean-reverts to the base rates, 'gbm' drifts freely
+    SIM_STEP_SECONDS = 60            # simulated market time per step (one rate snapshot or tick round)
+    SIM_MEAN_REVERSION = 20.0        # OU pull back to the base rate, per year (half-life ~13 days)
+    SIM_DEFAULT_VOLATILITY = 0.08    # annualised
+    SIM_VOLATILITY = {'USD/JPY': 0.10, 'GBP/USD': 0.09, 'AUD/USD': 0.11, 'NZD/USD': 0.11}
+    # Daily-return correlations (EUR/GBP, CHF and the dollar bloc are implied by a currency-factor fit,
+    # so the table is positive definite as a whole - edit entries together, not one at a time)
+    SIM_CORRELATIONS = {
+        ('EUR/USD', 'GBP/USD'): 0.75, ('EUR/USD', 'USD/JPY'): 0.07, ('EUR/USD', 'AUD/USD'): 0.36,
+        ('EUR/USD', 'USD/CHF'): -0.70, ('EUR/USD', 'EUR/GBP'): 0.37, ('EUR/USD', 'USD/CAD'): -0.33,
+        ('EUR/USD', 'NZD/USD'): 0.34, ('GBP/USD', 'USD/JPY'): 0.25, ('GBP/USD', 'AUD/USD'): 0.50,
+        ('GBP/USD', 'USD/CHF'): -0.42, ('GBP/USD', 'EUR/GBP'): -0.33, ('GBP/USD', 'USD/CAD'): -0.47,
+        ('GBP/USD', 'NZD/USD'): 0.48, ('USD/JPY', 'AUD/USD'): 0.37, ('USD/JPY', 'USD/CHF'): 0.40,
+        ('USD/JPY', 'EUR/GBP'): -0.25, ('USD/JPY', 'USD/CAD'): -0.32, ('USD/JPY', 'NZD/USD'): 0.35,
+        ('AUD/USD', 'USD/CHF'): 0.09, ('AUD/USD', 'EUR/GBP'): -0.20, ('AUD/USD', 'USD/CAD'): -0.80,
+        ('AUD/USD', 'NZD/USD'): 0.90, ('USD/CHF', 'EUR/GBP'): -0.42, ('USD/CHF', 'USD/CAD'): -0.07,
+        ('USD/CHF', 'NZD/USD'): 0.08, ('EUR/GBP', 'USD/CAD'): 0.19, ('EUR/GBP', 'NZD/USD'): -0.19,
+        ('USD/CAD', 'NZD/USD'): -0.79,
+    }
+    SIM_BUFFER_STEPS = 4096          # steps generated per vectorized refill
+    
+    # Tick log: every rate the connector observes, appended to a binary log that --replay plays back
+    RECORD_TICKS = False
+    TICK_LOG_FOLDER = os.path.join(os.path.expanduser('~'), 'Documents', 'FXTracker', 'ticks')  # local, one file per day
+    REPLAY_TICK_LOG = None           # path: price from this log instead of the terminal/demo feed
+    REPLAY_SPEED = 1.0               # 1 = recorded pace, N = N x faster, 0 = as fast as the tracker consumes
+    REPLAY_MAX_STEP_SECONDS = 1.0    # max speed: recorded time consumed per rate snapshot
+    
     WINDOW_TITLE = "FX Trade Tracker"
     WINDOW_WIDTH = 1600
     WINDOW_HEIGHT = 950
 
+# ============================================================================
+# RATE CACHE
+# ============================================================================
+
+class RateCache:
+    """Last quote per pair with when and where it came from; bounded, least recently used out first"""
+    
+    def __init__(self, ttl=Config.RATE_CACHE_TTL_SECONDS, max_pairs=Config.RATE_CACHE_MAX_PAIRS,
+                 stale_after=Config.RATE_STALE_SECONDS):
+        self.ttl = ttl
+        self.max_pairs = max_pairs
+        self.stale_after = stale_after
+        self.entries = OrderedDict()  # pair -> (rate, fetched_at epoch seconds, source)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_fresh(self, pair):
+        with self.lock:
+            entry = self.entries.get(pair)
+            if entry and time.time() - entry[1] < self.ttl:
+                self.entries.move_to_end(pair)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+    
+    def put(self, pair, rate, source):
+        with self.lock:
+            self.entries[pair] = (rate, time.time(), source)
+            self.entries.move_to_end(pair)
+            while len(self.entries) > self.max_pairs:
+                self.entries.popitem(last=False)
+    
+    def get_last(self, pair):
+        """Last known rate regardless of age (its staleness shows up in quote())"""
+        with self.lock:
+            entry = self.entries.get(pair)
+            return entry[0] if entry else None
+    
+    def quote(self, pair):
+        with self.lock:
+            entry = self.entries.get(pair)
+        if not entry:
+            return None
+        age = time.time() - entry[1]
+        return {'rate': entry[0], 'age': round(age, 1), 'source': entry[2], 'stale': age > self.stale_after}
+    
+    def quotes(self):
+        with self.lock:
+            pairs = list(self.entries)
+        return {pair: self.quote(pair) for pair in pairs}
+
+rate_cache = RateCache()
+
 # ============================================================================
 # BLOOMBERG CONNECTOR
 # ============================================================================
@@ -79,6 +247,11 @@ class BloombergConnector:
         self.session = None
         self.connection_status = "DEMO MODE"
         self.mock_api = MockBloombergAPI()
+        self.refdata_ready = False
+        self.request_lock = threading.Lock()  # one outstanding refdata request per session
+        self.rate_cache = rate_cache
+        self.stream = None
+        self.recorder = TickRecorder(tick_log_path()) if Config.RECORD_TICKS else None
         
         if self.use_real:
             threading.Thread(target=self._connect_async, daemon=True).start()
@@ -92,6 +265,7 @@ class BloombergConnector:
             self.session = blpapi.Session(session_options)
             
             if self.session.start() and self.session.openService("//blp/emapisvc"):
+                self.refdata_ready = self.session.openService("//blp/refdata")
                 self.connection_status = "✅ Bloomberg Connected"
             else:
                 raise Exception()
@@ -106,21 +280,593 @@ class BloombergConnector:
         return self.mock_api.get_trades() if self.mock_api else []
     
     def get_current_rate(self, pair):
-        return self.mock_api.get_current_rate(pair) if self.mock_api else 1.0
+        return self.get_rates([pair]).get(pair)
+    
+    def start_stream(self, on_ticks, pairs=None):
+        """Subscription mode: ticks go to on_ticks([(pair, price), ...]) instead of being polled"""
+        pairs = pairs or Config.STREAM_PAIRS
+        if self.recorder:
+            on_ticks = self.recorder.tap(on_ticks)
+        if self.use_real:
+            self.stream = BloombergTickStream(pairs, on_ticks)
+        else:
+            self.stream = UdpTickStream(on_ticks)
+        self.stream.start()
+        return self.stream
+    
+    def get_rates(self, pairs):
+        """One quote per distinct pair. Quotes younger than the cache TTL are reused; the rest are
+        fetched together (a single request on a live terminal). A pair the feed did not price keeps
+        its last cached quote, which /api/trades then flags as stale once it ages out."""
+        rates, missing = {}, []
+        for pair in dict.fromkeys(pairs):
+            # While streaming, the last tick is the price; its age is what staleness reports
+            rate = self.rate_cache.get_last(pair) if self.stream else self.rate_cache.get_fresh(pair)
+            if rate is None:
+                missing.append(pair)
+            else:
+                rates[pair] = rate
+        if not missing:
+            return rates
+        fetched, source = self._fetch_rates(missing)
+        if self.recorder:
+            self.recorder.record_many(fetched.items())
+        for pair in missing:
+            if fetched.get(pair) is not None:
+                rates[pair] = fetched[pair]
+                self.rate_cache.put(pair, fetched[pair], source)
+            elif self.rate_cache.get_last(pair) is not None:
+                rates[pair] = self.rate_cache.get_last(pair)
+        return rates
+    
+    def _fetch_rates(self, pairs):
+        if self.use_real and self.refdata_ready:
+            try:
+                return self._request_rates(pairs), 'bloomberg'
+            except:
+                return {}, 'bloomberg'
+        return (self.mock_api.get_rates(pairs) if self.mock_api else {}), 'demo'
+    
+    def _request_rates(self, pairs):
+        tickers = {pair.replace('/', '') + ' Curncy': pair for pair in pairs}
+        rates = {}
+        with self.request_lock:
+            service = self.session.getService("//blp/refdata")
+            request = service.createRequest("ReferenceDataRequest")
+            for ticker in tickers:
+                request.append("securities", ticker)
+            request.append("fields", "PX_LAST")
+            self.session.sendRequest(request)
+            
+            while True:
+                event = self.session.nextEvent(3000)
+                if event.eventType() == blpapi.Event.TIMEOUT:
+                    break
+                if event.eventType() not in (blpapi.Event.RESPONSE, blpapi.Event.PARTIAL_RESPONSE):
+                    continue
+                for msg in event:
+                    if not msg.hasElement("securityData"):
+                        continue
+                    sec_data = msg.getElement("securityData")
+                    for i in range(sec_data.numValues()):
+                        security = sec_data.getValueAsElement(i)
+                        pair = tickers.get(security.getElementAsString("security"))
+                        if pair and security.hasElement("fieldData"):
+                            field_data = security.getElement("fieldData")
+                            if field_data.hasElement("PX_LAST"):
+                                rates[pair] = float(field_data.getElement("PX_LAST").getValue())
+                if event.eventType() == blpapi.Event.RESPONSE:
+                    break
+        return rates
     
     def check_for_new_events(self):
         if self.mock_api:
             return self.mock_api.maybe_generate_new_trade(), self.mock_api.maybe_close_trade()
         return None, None
+    
+    def poll_events(self):
+        """(new trades, closed trades) since the last poll"""
+        if self.mock_api and self.mock_api.trades_per_second:
+            return self.mock_api.generate_flow()
+        new_trade, closed_trade = self.check_for_new_events()
+        return [new_trade] if new_trade else [], [closed_trade] if closed_trade else []
+    
+    def start_event_pump(self, listener, interval=None):
+        """Push trade events to listener(kind, trade, version, seen_at) as the source produces them"""
+        if interval is None:
+            flowing = self.mock_api and self.mock_api.trades_per_second
+            interval = Config.MOCK_FLOW_TICK_SECONDS if flowing else Config.MOCK_EVENT_SECONDS
+        threading.Thread(target=self._event_pump, args=(listener, interval), daemon=True).start()
+    
+    def _event_pump(self, listener, interval):
+        while True:
+            try:
+                new_trades, closed_trades = self.poll_events()
+                seen = time.perf_counter()
+                # Copies: the source keeps mutating its own dicts (a close flips status in place)
+                for trade in new_trades:
+                    listener('new', dict(trade), trade.get('version'), seen)
+                for trade in closed_trades:
+                    listener('close', dict(trade), trade.get('version'), seen)
+            except:
+                pass
+            time.sleep(interval)
+
+# ============================================================================
+# MARKET DATA STREAMING
+# ============================================================================
+
+# UDP tick wire format: pair (ASCII, NUL padded), epoch nanoseconds, price - many per datagram
+TICK_WIRE = struct.Struct('<8sqd')
+TICKS_PER_DATAGRAM = 60
+
+class TickHub:
+    """Where streamed ticks land: last price per pair goes into the rate cache and the pair is
+    queued for repricing. Ticks for one pair between reprices collapse into one."""
+    
+    def __init__(self, cache):
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.dirty = set()
+        self.ticks = 0
+        self.started = time.time()
+    
+    def on_ticks(self, ticks):
+        latest = dict(ticks)  # last tick per pair wins
+        for pair, price in latest.items():
+            self.cache.put(pair, price, 'stream')
+        with self.lock:
+            self.dirty.update(latest)
+            self.ticks += len(ticks)
+    
+    def mark_dirty(self, pair):
+        with self.lock:
+            self.dirty.add(pair)
+    
+    def take_dirty(self):
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+        return dirty
+    
+    def get_stats(self):
+        elapsed = time.time() - self.started
+        return {'ticks': self.ticks, 'ticks_per_second': round(self.ticks / elapsed, 1) if elapsed else 0.0}
+
+class BloombergTickStream:
+    """//blp/mktdata LAST_PRICE subscription on its own session"""
+    
+    def __init__(self, pairs, on_ticks):
+        self.pairs = list(pairs)
+        self.on_ticks = on_ticks
+        self.session = None
+        self.running = False
+    
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+    
+    def stop(self):
+        self.running = False
+    
+    def _run(self):
+        try:
+            session_options = blpapi.SessionOptions()
+            session_options.setServerHost('localhost')
+            session_options.setServerPort(8194)
+            self.session = blpapi.Session(session_options)
+            if not self.session.start() or not self.session.openService("//blp/mktdata"):
+                return
+            subscriptions = blpapi.SubscriptionList()
+            for i, pair in enumerate(self.pairs):
+                subscriptions.add(pair.replace('/', '') + ' Curncy', "LAST_PRICE", "", blpapi.CorrelationId(i))
+            self.session.subscribe(subscriptions)
+            
+            while self.running:
+                event = self.session.nextEvent(1000)
+                if event.eventType() != blpapi.Event.SUBSCRIPTION_DATA:
+                    continue
+                ticks = []
+                for msg in event:
+                    if msg.hasElement("LAST_PRICE"):
+                        pair = self.pairs[msg.correlationIds()[0].value()]
+                        ticks.append((pair, float(msg.getElementAsFloat("LAST_PRICE"))))
+                if ticks:
+                    self.on_ticks(ticks)
+        except:
+            pass
+        finally:
+            if self.session:
+                try:
+                    self.session.stop()
+                except:
+                    pass
+
+class UdpTickStream:
+    """Receives ticks from the local tick server stand-in (TickServer)"""
+    
+    def __init__(self, on_ticks, host=None, port=None):
+        self.on_ticks = on_ticks
+        self.host = host or Config.TICK_FEED_HOST
+        self.port = port or Config.TICK_FEED_PORT
+        self.sock = None
+        self.running = False
+    
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind((self.host, self.port))
+        self.sock.settimeout(1.0)
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+    
+    def stop(self):
+        self.running = False
+    
+    def _run(self):
+        while self.running:
+            try:
+                data = self.sock.recv(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                self.on_ticks([(name.rstrip(b'\0').decode('ascii'), price)
+                               for name, _, price in TICK_WIRE.iter_unpack(data)])
+            except:
+                pass
+        self.sock.close()
+
+class TickServer:
+    """Local stand-in for a streaming feed: random-walk ticks over UDP at a fixed rate,
+    so the subscription path can be load-tested without a terminal"""
+    
+    def __init__(self, rate=1000, host=None, port=None, pairs=None, seed=None):
+        self.rate = rate
+        self.address = (host or Config.TICK_FEED_HOST, port or Config.TICK_FEED_PORT)
+        self.pairs = list(pairs or Config.STREAM_PAIRS)
+        self.names = [pair.encode('ascii') for pair in self.pairs]
+        self.sim = PriceSimulator(self.pairs, seed=seed)
+        self.row, self.column = None, 0
+        self.sent = 0
+        self.running = False
+    
+    def _next_tick(self):
+        # One simulator step prices every pair; ticks go out round-robin through the row
+        if self.column == 0:
+            self.row = self.sim.step()
+        i = self.column
+        self.column = (i + 1) % len(self.pairs)
+        return TICK_WIRE.pack(self.names[i], time.time_ns(), self.row[i])
+    
+    def run(self, duration=None):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.running = True
+        start = time.perf_counter()
+        try:
+            while self.running:
+                elapsed = time.perf_counter() - start
+                if duration is not None and elapsed >= duration:
+                    break
+                due = int(elapsed * self.rate) - self.sent
+                if due <= 0:
+                    time.sleep(0.0005)
+                    continue
+                while due > 0:
+                    batch = min(due, TICKS_PER_DATAGRAM)
+                    sock.sendto(b''.join(self._next_tick() for _ in range(batch)), self.address)
+                    self.sent += batch
+                    due -= batch
+        finally:
+            sock.close()
+            self.running = False
+        return self.sent
+    
+    def start(self, duration=None):
+        threading.Thread(target=self.run, args=(duration,), daemon=True).start()
+    
+    def stop(self):
+        self.running = False
+
+# ============================================================================
+# TICK LOG - RECORD AND REPLAY
+# ============================================================================
+
+# Tick log: magic header, then fixed-width little-endian records. A tick is (pair id, epoch ns, price);
+# the first time a pair appears a definition record (TICK_PAIR_DEF_ID, pair id, name) of the same width
+# precedes it, so a log is self-describing and can be appended to across restarts.
+TICK_LOG_MAGIC = b'FXTICK1\0'
+TICK_RECORD = struct.Struct('<Hqd')
+TICK_PAIR_DEF = struct.Struct('<Hq8s')
+TICK_PAIR_DEF_ID = 0xFFFF
+
+def tick_log_path(day=None):
+    return os.path.join(Config.TICK_LOG_FOLDER, f"{(day or datetime.now()):%Y%m%d}.ticks")
+
+def read_tick_log(path):
+    """[(pair, epoch ns, price), ...] in recorded order; a record cut short by a crash is ignored"""
+    return _read_tick_log(path)[1]
+
+def _read_tick_log(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(TICK_LOG_MAGIC):
+        raise ValueError(f"{path} is not a tick log")
+    body = memoryview(data)[len(TICK_LOG_MAGIC):]
+    body = body[:len(body) - len(body) % TICK_RECORD.size]
+    names, ticks = {}, []
+    for i, (pair_id, ns, price) in enumerate(TICK_RECORD.iter_unpack(body)):
+        if pair_id == TICK_PAIR_DEF_ID:
+            names[ns] = TICK_PAIR_DEF.unpack_from(body, i * TICK_RECORD.size)[2].rstrip(b'\0').decode('ascii')
+        else:
+            ticks.append((names[pair_id], ns, price))
+    return names, ticks
+
+class TickRecorder:
+    """Appends every observed rate to a tick log"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pair_ids = {}
+        self.records = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) >= len(TICK_LOG_MAGIC):
+            names, _ = _read_tick_log(path)
+            self.pair_ids = {pair: pair_id for pair_id, pair in names.items()}
+            self.file = open(path, 'ab')
+            # Drop a torn record from a crash so new records stay aligned
+            size = os.path.getsize(path)
+            self.file.truncate(size - (size - len(TICK_LOG_MAGIC)) % TICK_RECORD.size)
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(TICK_LOG_MAGIC)
+    
+    def _pair_id(self, pair):
+        pair_id = self.pair_ids.get(pair)
+        if pair_id is None:
+            pair_id = self.pair_ids[pair] = len(self.pair_ids)
+            self.file.write(TICK_PAIR_DEF.pack(TICK_PAIR_DEF_ID, pair_id, pair.encode('ascii')))
+        return pair_id
+    
+    def record_many(self, ticks, ns=None):
+        """ticks: [(pair, price), ...] observed at ns (default now)"""
+        ns = time.time_ns() if ns is None else ns
+        try:
+            with self.lock:
+                for pair, price in ticks:
+                    if price is not None:
+                        self.file.write(TICK_RECORD.pack(self._pair_id(pair), ns, price))
+                        self.records += 1
+                self.file.flush()
+        except:
+            pass
+    
+    def tap(self, on_ticks):
+        """Wrap a stream callback so its ticks are recorded on the way through"""
+        def recorded(ticks):
+            self.record_many(ticks)
+            on_ticks(ticks)
+        return recorded
+    
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+class ReplayConnector(BloombergConnector):
+    """Plays a tick log back through the connector interface (get_rates / get_current_rate /
+    check_for_new_events / start_stream). speed 1 keeps the recorded pacing, N runs N x faster,
+    0 runs flat out: each snapshot consumes REPLAY_MAX_STEP_SECONDS of recorded time."""
+    
+    def __init__(self, path, speed=1.0, mock_api=None):
+        super().__init__(use_real=False)
+        self.connection_status = f"⏪ Replay {os.path.basename(path)} ({f'{speed:g}x' if speed else 'max speed'})"
+        self.mock_api = mock_api  # optional trade source; a recorded session's trades are already in the database
+        if self.recorder:         # never re-record a replay into today's log
+            self.recorder.close()
+            self.recorder = None
+        self.ticks = read_tick_log(path)
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.cursor = 0
+        self.last = {}
+        self.start_ns = self.clock = self.ticks[0][1] if self.ticks else 0
+        self.started = None
+    
+    @property
+    def finished(self):
+        return self.cursor >= len(self.ticks)
+    
+    def advance(self):
+        """Move replay time on (wall clock x speed, or one step at max speed); returns the ticks passed"""
+        with self.lock:
+            if self.speed:
+                now = time.perf_counter()
+                if self.started is None:
+                    self.started = now
+                target = self.start_ns + int((now - self.started) * self.speed * 1e9)
+            else:
+                target = self.clock + int(Config.REPLAY_MAX_STEP_SECONDS * 1e9)
+            end = self.cursor
+            while end < len(self.ticks) and self.ticks[end][1] <= target:
+                end += 1
+            passed = [(pair, price) for pair, ns, price in self.ticks[self.cursor:end]]
+            self.last.update(passed)
+            self.cursor, self.clock = end, target
+            return passed
+    
+    def get_rates(self, pairs):
+        if not self.stream:
+            self.advance()
+        rates = {pair: self.last[pair] for pair in dict.fromkeys(pairs) if pair in self.last}
+        for pair, rate in rates.items():
+            self.rate_cache.put(pair, rate, 'replay')
+        return rates
+    
+    def start_stream(self, on_ticks, pairs=None):
+        self.stream = ReplayTickStream(self, on_ticks, pairs)
+        self.stream.start()
+        return self.stream
+
+class ReplayTickStream:
+    """Subscription mode over a replay: passed ticks are pushed as they come due"""
+    
+    def __init__(self, replay, on_ticks, pairs=None):
+        self.replay = replay
+        self.on_ticks = on_ticks
+        self.pairs = set(pairs or Config.STREAM_PAIRS)
+        self.running = False
+    
+    def run(self):
+        self.running = True
+        while self.running and not self.replay.finished:
+            ticks = [(pair, price) for pair, price in self.replay.advance() if pair in self.pairs]
+            if ticks:
+                self.on_ticks(ticks)
+            if self.replay.speed:
+                time.sleep(0.005)
+        self.running = False
+    
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+    
+    def stop(self):
+        self.running = False
+
+# ============================================================================
+# PRICE SIMULATION
+# ============================================================================
+
+class PriceSimulator:
+    """Seeded random walk behind the demo feed, bit-for-bit repeatable for a given seed and call sequence.
+    Log prices follow a mean-reverting (Ornstein-Uhlenbeck) or GBM walk per pair, shocks are correlated
+    across pairs through the Cholesky factor of SIM_CORRELATIONS, and prices snap to the pair's tick
+    (0.001 for JPY pairs, 0.00001 otherwise). Steps are generated a buffer at a time, vectorized."""
+    
+    SECONDS_PER_YEAR = 365.25 * 24 * 3600
+    
+    def __init__(self, pairs=None, seed=None, model=None, step_seconds=None, buffer_size=None):
+        self.pairs = list(pairs or MockBloombergAPI.BASE_RATES)
+        self.index = {pair: i for i, pair in enumerate(self.pairs)}
+        self.seed = Config.SIM_SEED if seed is None else seed
+        self.model = model or Config.SIM_MODEL
+        self.buffer_size = buffer_size or Config.SIM_BUFFER_STEPS
+        self.dt = (step_seconds or Config.SIM_STEP_SECONDS) / self.SECONDS_PER_YEAR
+        self.theta = Config.SIM_MEAN_REVERSION
+        self.anchor = [math.log(MockBloombergAPI.BASE_RATES.get(pair, 1.0)) for pair in self.pairs]
+        self.sigma = [Config.SIM_VOLATILITY.get(pair, Config.SIM_DEFAULT_VOLATILITY) for pair in self.pairs]
+        self.tick_sizes = [pip_size(pair) / 10 for pair in self.pairs]
+        self.decimals = [round(-math.log10(tick)) for tick in self.tick_sizes]
+        self.level = list(self.anchor)  # current (unsnapped) log prices
+        self.buffer, self.cursor, self.steps = [], 0, 0
+        if HAS_NUMPY:
+            self.rng = np.random.default_rng(self.seed)
+            self.chol = np.linalg.cholesky(self.correlation())
+        else:
+            self.rng = random.Random(self.seed)  # independent walks, no correlation
+    
+    def correlation(self):
+        corr = np.eye(len(self.pairs))
+        for (a, b), rho in Config.SIM_CORRELATIONS.items():
+            if a in self.index and b in self.index:
+                corr[self.index[a], self.index[b]] = corr[self.index[b], self.index[a]] = rho
+        # A hand-entered table need not be positive definite: clip eigenvalues, rescale to unit diagonal
+        w, v = np.linalg.eigh(corr)
+        if w.min() < 1e-6:
+            corr = (v * np.maximum(w, 1e-6)) @ v.T
+            d = np.sqrt(np.diag(corr))
+            corr = corr / np.outer(d, d)
+        return corr
+    
+    def step(self):
+        """Advance one step; prices for every pair in self.pairs order"""
+        if self.cursor >= len(self.buffer):
+            self.buffer, self.cursor = self.generate(self.buffer_size), 0
+        row = self.buffer[self.cursor]
+        self.cursor += 1
+        self.steps += 1
+        return row
+    
+    def quote(self, pairs):
+        row = self.step()
+        return {pair: row[self.index[pair]] for pair in pairs if pair in self.index}
+    
+    def generate(self, n):
+        """The next n steps as rows of snapped prices (continues the walk)"""
+        if not HAS_NUMPY:
+            return [self._scalar_step() for _ in range(n)]
+        z = self.rng.standard_normal((n, len(self.pairs))) @ self.chol.T
+        sigma = np.array(self.sigma)
+        x0 = np.array(self.level)
+        if self.model == 'gbm':
+            path = x0 + np.cumsum(sigma * math.sqrt(self.dt) * z - 0.5 * sigma ** 2 * self.dt, axis=0)
+        else:
+            # Exact OU step y' = phi*y + eps, unrolled as y_t = phi^t * (y_0 + cumsum(phi^-s * eps_s)).
+            # phi^-s grows along the chunk, so chunks are cut short enough to stay well inside float range.
+            anchor = np.array(self.anchor)
+            phi = math.exp(-self.theta * self.dt)
+            eps = z * sigma * math.sqrt((1 - phi ** 2) / (2 * self.theta))
+            chunk = max(1, min(n, int(50 / max(self.theta * self.dt, 1e-12))))
+            path = np.empty_like(eps)
+            y0 = x0 - anchor
+            for start in range(0, n, chunk):
+                t = np.arange(1, min(chunk, n - start) + 1)[:, None]
+                seg = phi ** t * (y0 + np.cumsum(eps[start:start + len(t)] * phi ** -t, axis=0))
+                path[start:start + len(t)] = anchor + seg
+                y0 = seg[-1]
+        self.level = path[-1].tolist()
+        ticks = np.array(self.tick_sizes)
+        prices = np.rint(np.exp(path) / ticks) * ticks
+        for j, places in enumerate(self.decimals):
+            prices[:, j] = np.round(prices[:, j], places)
+        return prices.tolist()
+    
+    def _scalar_step(self):
+        row = []
+        for j, x in enumerate(self.level):
+            shock = self.rng.gauss(0.0, 1.0)
+            if self.model == 'gbm':
+                x += self.sigma[j] * math.sqrt(self.dt) * shock - 0.5 * self.sigma[j] ** 2 * self.dt
+            else:
+                phi = math.exp(-self.theta * self.dt)
+                x = self.anchor[j] + phi * (x - self.anchor[j]) + \
+                    self.sigma[j] * math.sqrt((1 - phi ** 2) / (2 * self.theta)) * shock
+            self.level[j] = x
+            tick = self.tick_sizes[j]
+            row.append(round(round(math.exp(x) / tick) * tick, self.decimals[j]))
+        return row
 
 # ============================================================================
 # MOCK DATA - FIXED REALISTIC RATES PER CURRENCY PAIR
 # ============================================================================
 
 class MockBloombergAPI:
-    def __init__(self):
-        self.trades = []
+    BASE_RATES = {
+        'EUR/USD': 1.0850,
+        'GBP/USD': 1.2650,
+        'USD/JPY': 148.50,  # FIXED: Realistic JPY rate!
+        'AUD/USD': 0.6550,
+        'USD/CHF': 0.8450,
+        'EUR/GBP': 0.8580,
+        'USD/CAD': 1.3650,
+        'NZD/USD': 0.6150
+    }
+    
+    def __init__(self, trades_per_second=None, close_ratio=None, max_history=None, seed=None):
+        seed = Config.SIM_SEED if seed is None else seed
+        self.rng = random.Random(seed)
+        self.sim = PriceSimulator(seed=seed)
+        self.trades = deque(maxlen=Config.MOCK_MAX_HISTORY if max_history is None else max_history)
         self.trade_counter = 1 
+        # Open-trade index: swap-remove array + trade_id -> slot, so a close never scans the history
+        self.open_trades = []
+        self.open_slots = {}
+        # Sustained synthetic flow (0 = the original random demo trickle)
+        self.trades_per_second = Config.MOCK_TRADES_PER_SECOND if trades_per_second is None else trades_per_second
+        self.close_ratio = Config.MOCK_CLOSE_RATIO if close_ratio is None else close_ratio
+        self.flow_clock = None
+        self.open_credit = 0.0
+        self.close_credit = 0.0
         self._generate_initial_team_trades()
     
     def get_realistic_rate(self, pair):
@@ -137,7 +883,7 @@ class MockBloombergAPI:
         }
         
         min_rate, max_rate = rate_ranges.get(pair, (1.0, 1.2))
-        return round(random.uniform(min_rate, max_rate), 4)
+        return round(self.rng.uniform(min_rate, max_rate), 4)
     
     def _generate_initial_team_trades(self):
         pairs = ['EUR/USD', 'GBP/USD', 'USD/JPY', 'AUD/USD', 'USD/CHF', 'EUR/GBP']
@@ -145,91 +891,159 @@ class MockBloombergAPI:
         traders = ['John Smith', 'Sarah Johnson', 'Mike Chen', 'Emily Davis', 'Tom Wilson']
         
         for i in range(15):
-            pair = random.choice(pairs)
+            pair = self.rng.choice(pairs)
             currencies = pair.split('/')
             
             trade = {
                 'trade_id': f'FX{datetime.now().strftime("%Y%m%d%H%M%S")}{self.trade_counter:06d}',
-                'timestamp': datetime.now() - timedelta(hours=random.randint(1, 72)),
+                'timestamp': datetime.now() - timedelta(hours=self.rng.randint(1, 72)),
                 'currency_pair': pair,
-                'side': random.choice(['BUY', 'SELL']),
-                'notional_amount': random.randint(500000, 25000000),
+                'side': self.rng.choice(['BUY', 'SELL']),
+                'notional_amount': self.rng.randint(500000, 25000000),
                 'base_currency': currencies[0],
                 'quote_currency': currencies[1],
                 'execution_rate': self.get_realistic_rate(pair),
                 'value_date': (datetime.now() + timedelta(days=2)).date(),
                 'settlement_date': (datetime.now() + timedelta(days=2)).date(),
-                'counterparty': random.choice(counterparties),
-                'trader_name': random.choice(traders),
-                'status': random.choice(['open', 'open', 'open', 'open', 'closed', 'closed', 'closed'])
+                'counterparty': self.rng.choice(counterparties),
+                'trader_name': self.rng.choice(traders),
+                'status': self.rng.choice(['open', 'open', 'open', 'open', 'closed', 'closed', 'closed']),
+                'version': 1
             }
-            self.trades.append(trade)
-            self.trade_counter += 1
+            self._record(trade)
+    
+    def _record(self, trade):
+        self.trades.append(trade)
+        self.trade_counter += 1
+        if trade['status'] == 'open':
+            self.open_slots[trade['trade_id']] = len(self.open_trades)
+            self.open_trades.append(trade)
+    
+    def _unindex(self, slot):
+        """Swap-remove the open trade at slot: move the last one into the hole, O(1)"""
+        trade = self.open_trades[slot]
+        last = self.open_trades.pop()
+        if last is not trade:
+            self.open_trades[slot] = last
+            self.open_slots[last['trade_id']] = slot
+        del self.open_slots[trade['trade_id']]
+        return trade
             
     def get_trades(self):
-        return self.trades
+        return list(self.trades)
     
     def get_current_rate(self, pair):
         """Get realistic current rates"""
-        base_rates = {
-            'EUR/USD': 1.0850,
-            'GBP/USD': 1.2650,
-            'USD/JPY': 148.50,  # FIXED: Realistic JPY rate!
-            'AUD/USD': 0.6550,
-            'USD/CHF': 0.8450,
-            'EUR/GBP': 0.8580,
-            'USD/CAD': 1.3650,
-            'NZD/USD': 0.6150
-        }
-        base = base_rates.get(pair, 1.0)
-        
-        # Add small variation
-        if 'JPY' in pair:
-            variation = random.uniform(-2.0, 2.0)  # JPY moves in larger numbers
-        else:
-            variation = random.uniform(-0.02, 0.02)
-        
-        return round(base + variation, 4)
+        return self.get_rates([pair]).get(pair)
+    
+    def get_rates(self, pairs):
+        """One simulator step, quoted for pairs (pairs the simulator doesn't know sit at their base rate)"""
+        rates = self.sim.quote(pairs)
+        for pair in pairs:
+            rates.setdefault(pair, self.BASE_RATES.get(pair, 1.0))
+        return rates
     
     def maybe_generate_new_trade(self):
-        if random.random() < 0.08:
-            pairs = ['EUR/USD', 'GBP/USD', 'USD/JPY']
-            traders = ['John Smith', 'Sarah Johnson', 'Mike Chen']
-            pair = random.choice(pairs)
-            currencies = pair.split('/')
-            
-            trade = {
-                'trade_id': f'FX{datetime.now().strftime("%Y%m%d%H%M%S")}{self.trade_counter:06d}',
-                'timestamp': datetime.now(),
-                'currency_pair': pair,
-                'side': random.choice(['BUY', 'SELL']),
-                'notional_amount': random.randint(1000000, 15000000),
-                'base_currency': currencies[0],
-                'quote_currency': currencies[1],
-                'execution_rate': self.get_realistic_rate(pair),
-                'value_date': (datetime.now() + timedelta(days=2)).date(),
-                'settlement_date': (datetime.now() + timedelta(days=2)).date(),
-                'counterparty': random.choice(['JP Morgan', 'Citi', 'HSBC']),
-                'trader_name': random.choice(traders),
-                'status': 'open'
-            }
-            self.trades.append(trade)
-            self.trade_counter += 1
-            return trade
+        if self.rng.random() < 0.08:
+            return self.new_trade()
         return None
     
+    def new_trade(self):
+        pairs = ['EUR/USD', 'GBP/USD', 'USD/JPY']
+        traders = ['John Smith', 'Sarah Johnson', 'Mike Chen']
+        pair = self.rng.choice(pairs)
+        currencies = pair.split('/')
+        
+        trade = {
+            'trade_id': f'FX{datetime.now().strftime("%Y%m%d%H%M%S")}{self.trade_counter:06d}',
+            'timestamp': datetime.now(),
+            'currency_pair': pair,
+            'side': self.rng.choice(['BUY', 'SELL']),
+            'notional_amount': self.rng.randint(1000000, 15000000),
+            'base_currency': currencies[0],
+            'quote_currency': currencies[1],
+            'execution_rate': self.get_realistic_rate(pair),
+            'value_date': (datetime.now() + timedelta(days=2)).date(),
+            'settlement_date': (datetime.now() + timedelta(days=2)).date(),
+            'counterparty': self.rng.choice(['JP Morgan', 'Citi', 'HSBC']),
+            'trader_name': self.rng.choice(traders),
+            'status': 'open',
+            'version': 1
+        }
+        self._record(trade)
+        return trade
+    
     def maybe_close_trade(self):
-        open_trades = [t for t in self.trades if t['status'] == 'open']
-        if open_trades and random.random() < 0.04:
-            trade = random.choice(open_trades)
-            trade['status'] = 'closed'
-            return trade
+        if self.open_trades and self.rng.random() < 0.04:
+            return self.close_trade()
         return None
+    
+    def close_trade(self, trade_id=None):
+        """Close trade_id (or a random open trade); None if nothing open matches"""
+        if trade_id is None:
+            if not self.open_trades: return None
+            slot = self.rng.randrange(len(self.open_trades))
+        else:
+            slot = self.open_slots.get(trade_id)
+            if slot is None: return None
+        trade = self._unindex(slot)
+        trade['status'] = 'closed'
+        trade['version'] = trade.get('version', 1) + 1
+        return trade
+    
+    def generate_flow(self, now=None):
+        """Sustained flow: (new trades, closed trades) owed since the last call at trades_per_second"""
+        now = time.perf_counter() if now is None else now
+        if self.flow_clock is None:
+            self.flow_clock = now
+            return [], []
+        elapsed, self.flow_clock = now - self.flow_clock, now
+        # Fractional credit carries over so low rates and short intervals still average out exactly
+        self.open_credit += elapsed * self.trades_per_second
+        self.close_credit += elapsed * self.trades_per_second * self.close_ratio
+        opens, closes = int(self.open_credit), int(self.close_credit)
+        self.open_credit -= opens
+        self.close_credit -= closes
+        new_trades = [self.new_trade() for _ in range(opens)]
+        closed_trades = [t for t in (self.close_trade() for _ in range(closes)) if t]
+        return new_trades, closed_trades
 
 # ============================================================================
 # DATABASE
 # ============================================================================
 
+# Times are stored as integer epoch milliseconds; dates as epoch milliseconds of UTC midnight,
+# so JS new Date(ms) lands on the right calendar day
+def epoch_ms(value):
+    """datetime / ISO text / epoch ms -> epoch milliseconds (naive datetimes are local time)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if value.lstrip('-').isdigit():
+            return int(value)
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if isinstance(value, datetime):
+        return int(round(value.timestamp() * 1000))
+    return epoch_date_ms(value)
+
+def epoch_date_ms(value):
+    """date / datetime / 'YYYY-MM-DD...' -> epoch milliseconds of that day's UTC midnight"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if value.lstrip('-').isdigit():
+            return int(value)
+        value = date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - date(1970, 1, 1)).days * 86400000
+
 def scrub_trade_details(trade_raw):
     if not trade_raw: return None
     try:
@@ -242,196 +1056,1470 @@ def scrub_trade_details(trade_raw):
             base_curr = trade_raw.get('base_currency', '')
             quote_curr = trade_raw.get('quote_currency', '')
         
-        return {
-            'trade_id': str(trade_raw.get('trade_id', '')),
-            'timestamp': trade_raw.get('timestamp') or datetime.now(),
-            'currency_pair': str(pair),
-            'side': str(trade_raw.get('side', '')).upper(),
-            'notional_amount': float(trade_raw.get('notional_amount', 0)),
-            'base_currency': base_curr,
-            'quote_currency': quote_curr,
-            'execution_rate': float(trade_raw.get('execution_rate', 0)),
-            'current_market_rate': float(trade_raw.get('current_market_rate')) if trade_raw.get('current_market_rate') else None,
-            'value_date': trade_raw.get('value_date') or (datetime.now() + timedelta(days=2)).date(),
-            'settlement_date': trade_raw.get('settlement_date') or (datetime.now() + timedelta(days=2)).date(),
-            'counterparty': str(trade_raw.get('counterparty', '')),
-            'trader_name': str(trade_raw.get('trader_name', '')),
-            'status': str(trade_raw.get('status', 'open')).lower(),
-            'unrealized_pnl': float(trade_raw.get('unrealized_pnl', 0.0)),
-            'realized_pnl': float(trade_raw.get('realized_pnl')) if trade_raw.get('realized_pnl') else None,
-            'last_updated': datetime.now()
-        }
+        return Trade(
+            str(trade_raw.get('trade_id', '')),
+            epoch_ms(trade_raw.get('timestamp') or datetime.now()),
+            str(pair),
+            str(trade_raw.get('side', '')).upper(),
+            float(trade_raw.get('notional_amount', 0)),
+            base_curr,
+            quote_curr,
+            float(trade_raw.get('execution_rate', 0)),
+            float(trade_raw.get('current_market_rate')) if trade_raw.get('current_market_rate') else None,
+            epoch_date_ms(trade_raw.get('value_date') or (datetime.now() + timedelta(days=2)).date()),
+            epoch_date_ms(trade_raw.get('settlement_date') or (datetime.now() + timedelta(days=2)).date()),
+            str(trade_raw.get('counterparty', '')),
+            str(trade_raw.get('trader_name', '')),
+            str(trade_raw.get('status', 'open')).lower(),
+            float(trade_raw.get('unrealized_pnl', 0.0)),
+            float(trade_raw.get('realized_pnl')) if trade_raw.get('realized_pnl') else None,
+            epoch_ms(datetime.now())
+        )
     except:
         return None
 
-class SharedDatabase:
-    def __init__(self, db_file):
-        self.db_file = db_file
-        self.lock = threading.Lock()
-        self._create_tables()
-    
-    def _create_tables(self):
-        with self.lock:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            cursor.execute("""CREATE TABLE IF NOT EXISTS trades (
-                trade_id TEXT PRIMARY KEY, timestamp TEXT NOT NULL, currency_pair TEXT NOT NULL,
-                side TEXT NOT NULL, notional_amount REAL NOT NULL, base_currency TEXT,
-                quote_currency TEXT, execution_rate REAL NOT NULL, current_market_rate REAL,
-                value_date TEXT, settlement_date TEXT, counterparty TEXT, trader_name TEXT,
-                status TEXT DEFAULT 'open', unrealized_pnl REAL DEFAULT 0, realized_pnl REAL, last_updated TEXT)""")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_status ON trades(status)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_trader ON trades(trader_name)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_pair ON trades(currency_pair)")
-            conn.commit()
-            conn.close()
-    
-    def save_trade(self, trade):
-        if not trade or not trade.get('trade_id'): return False
-        try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_file, timeout=10.0)
-                cursor = conn.cursor()
-                cursor.execute("INSERT OR REPLACE INTO trades VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
-                    (trade['trade_id'], str(trade['timestamp']), trade['currency_pair'], trade['side'],
-                     float(trade['notional_amount']), trade['base_currency'], trade['quote_currency'],
-                     float(trade['execution_rate']), float(trade['current_market_rate']) if trade['current_market_rate'] else None,
-                     str(trade['value_date']), str(trade['settlement_date']), trade['counterparty'],
-                     trade['trader_name'], trade['status'], float(trade['unrealized_pnl']),
-                     float(trade['realized_pnl']) if trade['realized_pnl'] else None, str(datetime.now())))
-                conn.commit()
-                conn.close()
-                return True
-        except:
-            return False
-    
-    def delete_trade(self, trade_id):
-        try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_file, timeout=10.0)
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM trades WHERE trade_id = ?", (trade_id,))
-                deleted = cursor.rowcount > 0
-                conn.commit()
-                conn.close()
-                return deleted
-        except:
-            return False
-    
-    def get_all_trades(self):
-        try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_file, timeout=10.0)
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM trades ORDER BY timestamp DESC")
-                rows = cursor.fetchall()
-                conn.close()
-                return [dict(row) for row in rows]
-        except:
-            return []
-    
-    def get_open_trades(self):
-        try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_file, timeout=10.0)
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM trades WHERE status = 'open'")
-                rows = cursor.fetchall()
-                conn.close()
-                return [dict(row) for row in rows]
-        except:
-            return []
+NETWORK_FILESYSTEMS = {'cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', 'afpfs', 'fuse.sshfs', 'webdav'}
+
+def _is_network_path(path):
+    path = os.path.abspath(path)
+    if path.startswith('\\\\') or path.startswith('//'):
+        return True
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            drive = os.path.splitdrive(path)[0] + '\\'
+            return ctypes.windll.kernel32.GetDriveTypeW(drive) == 4  # DRIVE_REMOTE
+        best, fstype = '', ''
+        with open('/proc/mounts') as mounts:
+            for line in mounts:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount = parts[1].replace('\\040', ' ')
+                # Whole path components only: /mnt/share must not claim /mnt/share2
+                inside = path == mount or path.startswith(mount.rstrip('/') + '/')
+                if inside and len(mount) > len(best):
+                    best, fstype = mount, parts[2]
+        return fstype in NETWORK_FILESYSTEMS
+    except:
+        return False
+
+def _wal_works(folder):
+    probe = os.path.join(folder, '.fx_wal_probe.db')
+    try:
+        writer = sqlite3.connect(probe, timeout=2.0)
+        try:
+            if writer.execute("PRAGMA journal_mode = WAL").fetchone()[0].lower() != 'wal':
+                return False
+            writer.execute("CREATE TABLE IF NOT EXISTS probe (x INTEGER)")
+            writer.execute("INSERT INTO probe VALUES (1)")
+            writer.commit()
+            reader = sqlite3.connect(probe, timeout=2.0)
+            try:
+                return reader.execute("SELECT COUNT(*) FROM probe").fetchone()[0] > 0
+            finally:
+                reader.close()
+        finally:
+            writer.close()
+    except:
+        return False
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(probe + suffix)
+            except OSError:
+                pass
+
+def probe_storage_profile(folder, journal_mode=None):
+    """Pick the journal mode and pragmas for the database folder"""
+    mode = (journal_mode or Config.DB_JOURNAL_MODE).lower()
+    reason = 'configured'
+    if mode == 'auto':
+        if _is_network_path(folder):
+            mode, reason = 'delete', 'network share'
+        elif _wal_works(folder):
+            mode, reason = 'wal', 'local disk, WAL probe passed'
+        else:
+            mode, reason = 'delete', 'WAL probe failed'
+    wal = mode == 'wal'
+    return {
+        'journal_mode': mode,
+        'reason': reason,
+        'synchronous': Config.DB_SYNCHRONOUS if wal else 'FULL',
+        'cache_size_kb': Config.DB_CACHE_SIZE_KB,
+        'mmap_size': Config.DB_MMAP_SIZE if wal else 0,
+        'wal_autocheckpoint': Config.DB_WAL_AUTOCHECKPOINT,
+        'checkpoint_seconds': Config.DB_CHECKPOINT_SECONDS if wal else 0,
+    }
+
+def apply_storage_profile(conn, profile):
+    conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = -{int(profile['cache_size_kb'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+    if profile['journal_mode'] == 'wal':
+        conn.execute(f"PRAGMA wal_autocheckpoint = {int(profile['wal_autocheckpoint'])}")
+
+class ConnectionPool:
+    """Long-lived sqlite connections, each used by one thread at a time"""
+    
+    class _Pooled:
+        __slots__ = ('conn', 'last_checked')
+        
+        def __init__(self, conn):
+            self.conn = conn
+            self.last_checked = time.monotonic()
+    
+    def __init__(self, db_file, size=Config.DB_POOL_SIZE, timeout=Config.DB_TIMEOUT,
+                 healthcheck_seconds=Config.DB_HEALTHCHECK_SECONDS, on_connect=None):
+        self.db_file = db_file
+        self.timeout = timeout
+        self.on_connect = on_connect
+        self.healthcheck_seconds = healthcheck_seconds
+        self.idle = queue.LifoQueue(maxsize=size)
+        self.lock = threading.Lock()  # guards stats; checkouts happen on many threads
+        self.stats = {'created': 0, 'reused': 0, 'reconnects': 0, 'healthchecks': 0}
+    
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+    
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+    
+    def _open(self):
+        conn = sqlite3.connect(self.db_file, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.on_connect:
+            self.on_connect(conn)
+        self._count('created')
+        return self._Pooled(conn)
+    
+    def _is_healthy(self, pooled):
+        if time.monotonic() - pooled.last_checked < self.healthcheck_seconds:
+            return True
+        self._count('healthchecks')
+        try:
+            pooled.conn.execute("SELECT 1").fetchone()
+            pooled.last_checked = time.monotonic()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def _checkout(self):
+        while True:
+            try:
+                pooled = self.idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if self._is_healthy(pooled):
+                self._count('reused')
+                return pooled
+            self._close(pooled)
+            self._count('reconnects')
+    
+    def _checkin(self, pooled):
+        try:
+            self.idle.put_nowait(pooled)
+        except queue.Full:
+            self._close(pooled)
+    
+    def _close(self, pooled):
+        try:
+            pooled.conn.close()
+        except sqlite3.Error:
+            pass
+    
+    DISCONNECT_ERRORS = ('disk i/o error', 'unable to open')
+    
+    @classmethod
+    def _is_disconnect(cls, exc):
+        # Only I/O failures mean the share went away; "locked" is contention and errors like
+        # "no such table", "readonly database" or "malformed" would fail the same on a new handle
+        message = str(exc).lower()
+        return isinstance(exc, sqlite3.OperationalError) and any(e in message for e in cls.DISCONNECT_ERRORS)
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is dropped instead of returned if the share went away"""
+        pooled = self._checkout()
+        try:
+            yield pooled.conn
+        except BaseException as e:
+            try:
+                pooled.conn.rollback()
+            except sqlite3.Error:
+                pass
+            if self._is_disconnect(e):
+                # Vanished share or I/O error - never hand this handle out again
+                self._close(pooled)
+                self._count('reconnects')
+            else:
+                self._checkin(pooled)
+            raise
+        else:
+            self._checkin(pooled)
+    
+    def run(self, op, retries=1):
+        """Run op(conn), retrying on a fresh connection after a dropped share"""
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as conn:
+                    return op(conn)
+            except sqlite3.OperationalError as e:
+                if attempt == retries or not self._is_disconnect(e):
+                    raise
+    
+    def close_all(self):
+        while True:
+            try:
+                self._close(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+TRADE_COLUMNS = ('trade_id', 'timestamp', 'currency_pair', 'side', 'notional_amount', 'base_currency',
+                 'quote_currency', 'execution_rate', 'current_market_rate', 'value_date', 'settlement_date',
+                 'counterparty', 'trader_name', 'status', 'unrealized_pnl', 'realized_pnl', 'last_updated', 'pips')
+TRADE_COLUMNS_SQL = ', '.join(TRADE_COLUMNS)
+TRADE_PARAMS_SQL = ','.join('?' * len(TRADE_COLUMNS))
+
+class Trade:
+    """One blotter row. Slots follow TRADE_COLUMNS, so a row maps to and from SQLite positionally
+    and a big history costs a fraction of the per-trade dicts it replaced"""
+    __slots__ = TRADE_COLUMNS
+    
+    def __init__(self, trade_id, timestamp, currency_pair, side, notional_amount, base_currency, quote_currency,
+                 execution_rate, current_market_rate, value_date, settlement_date, counterparty, trader_name,
+                 status, unrealized_pnl, realized_pnl, last_updated, pips=None):
+        self.trade_id = trade_id
+        self.timestamp = timestamp
+        self.currency_pair = currency_pair
+        self.side = side
+        self.notional_amount = notional_amount
+        self.base_currency = base_currency
+        self.quote_currency = quote_currency
+        self.execution_rate = execution_rate
+        self.current_market_rate = current_market_rate
+        self.value_date = value_date
+        self.settlement_date = settlement_date
+        self.counterparty = counterparty
+        self.trader_name = trader_name
+        self.status = status
+        self.unrealized_pnl = unrealized_pnl
+        self.realized_pnl = realized_pnl
+        self.last_updated = last_updated
+        self.pips = pips
+    
+    @classmethod
+    def from_row(cls, row):
+        """From a SELECT of TRADE_COLUMNS_SQL, in column order"""
+        return cls(*row)
+    
+    def to_row(self):
+        """Parameters for INSERT INTO trades (TRADE_COLUMNS_SQL), stamped last_updated now"""
+        return (self.trade_id, epoch_ms(self.timestamp), self.currency_pair, self.side,
+                float(self.notional_amount), self.base_currency, self.quote_currency,
+                float(self.execution_rate), float(self.current_market_rate) if self.current_market_rate else None,
+                epoch_date_ms(self.value_date), epoch_date_ms(self.settlement_date), self.counterparty,
+                self.trader_name, self.status, float(self.unrealized_pnl or 0.0),
+                float(self.realized_pnl) if self.realized_pnl else None, epoch_ms(datetime.now()),
+                calculate_pips(self.currency_pair, self.side, self.execution_rate, self.current_market_rate))
+    
+    def to_dict(self):
+        return {name: getattr(self, name) for name in TRADE_COLUMNS}
+    
+    def to_json(self):
+        """Dashboard shape; open trades carry the age/staleness of the quote behind their mark"""
+        is_open = self.status == 'open'
+        quote = rate_cache.quote(self.currency_pair) if is_open else None
+        if quote:
+            mark_age, stale = quote['age'], quote['stale']
+        elif is_open:
+            # No quote cached for the pair (feed down, or never priced here): age the stored mark instead
+            marked = self.last_updated if isinstance(self.last_updated, (int, float)) else None
+            mark_age, stale = round(time.time() - marked / 1000, 1) if marked else None, True
+        else:
+            mark_age, stale = None, False
+        return {
+            'trade_id': str(self.trade_id),
+            'timestamp': self.timestamp,  # epoch ms
+            'pair': self.currency_pair,
+            'side': self.side,
+            'amount': float(self.notional_amount or 0),
+            'entry_rate': float(self.execution_rate or 0),
+            'current_rate': float(self.current_market_rate) if self.current_market_rate else None,
+            'pnl': float(self.unrealized_pnl or 0) if is_open else float(self.realized_pnl) if self.realized_pnl else 0.0,
+            'pips': float(self.pips or 0),
+            'status': self.status,
+            'trader': self.trader_name,
+            'counterparty': self.counterparty,
+            'mark_age': mark_age,
+            'stale': stale
+        }
+    
+    def __repr__(self):
+        return f"Trade({self.trade_id} {self.side} {self.currency_pair} {self.status})"
+
+SCHEMA_VERSION = 2  # PRAGMA user_version; SharedDatabase._migrate steps older files up
+TRADES_TABLE_SQL = """CREATE TABLE IF NOT EXISTS %s (
+    trade_id TEXT PRIMARY KEY, timestamp INTEGER NOT NULL, currency_pair TEXT NOT NULL,
+    side TEXT NOT NULL, notional_amount REAL NOT NULL, base_currency TEXT,
+    quote_currency TEXT, execution_rate REAL NOT NULL, current_market_rate REAL,
+    value_date INTEGER, settlement_date INTEGER, counterparty TEXT, trader_name TEXT,
+    status TEXT DEFAULT 'open', unrealized_pnl REAL DEFAULT 0, realized_pnl REAL, last_updated INTEGER,
+    pips REAL, change_seq INTEGER DEFAULT 0)"""
+EPOCH_COLUMNS = ('timestamp', 'value_date', 'settlement_date', 'last_updated')
+
+def _sql_epoch_ms(column):
+    # Local-time text (what str(datetime.now()) wrote) -> epoch ms, same as epoch_ms(); numbers pass through
+    return (f"CASE WHEN typeof({column}) = 'text' THEN CAST(ROUND((julianday({column}, 'utc') - 2440587.5) * 86400000) AS INTEGER) "
+            f"ELSE {column} END")
+
+def _sql_epoch_date_ms(column):
+    return (f"CASE WHEN typeof({column}) = 'text' THEN CAST(ROUND((julianday(substr({column}, 1, 10)) - 2440587.5) * 86400000) AS INTEGER) "
+            f"ELSE {column} END")
+
+def _sql_pips(prefix=''):
+    # calculate_pips() as SQL, for the backfill and for rows written by builds that don't store pips
+    sizes = ' '.join(f"WHEN '{pair}' THEN {size}" for pair, size in sorted(Config.PIP_SIZES.items()))
+    return (f"ROUND(({prefix}current_market_rate - {prefix}execution_rate) / (CASE {prefix}currency_pair {sizes} "
+            f"ELSE (CASE WHEN {prefix}currency_pair LIKE '%JPY%' THEN 0.01 ELSE 0.0001 END) END) "
+            f"* (CASE WHEN {prefix}side = 'SELL' THEN -1 ELSE 1 END), 1)")
+
+# Blotter sort keys (as used by the dashboard columns) -> SQL expressions
+SORT_COLUMNS = {
+    'trade_id': 'trade_id',
+    'timestamp': 'timestamp',
+    'trader': 'trader_name',
+    'pair': 'currency_pair',
+    'side': 'side',
+    'amount': 'notional_amount',
+    'entry_rate': 'execution_rate',
+    'current_rate': 'COALESCE(current_market_rate, 0)',
+    'pnl': "CASE WHEN status = 'open' THEN COALESCE(unrealized_pnl, 0) ELSE COALESCE(realized_pnl, 0) END",
+    'pips': 'COALESCE(pips, 0)',
+    'counterparty': 'counterparty',
+    'status': 'status',
+}
+
+class WaitStats:
+    """Count / total / max of a duration, safe to record from any thread"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+    
+    def snapshot(self):
+        with self._lock:
+            return {'count': self.count, 'total_ms': round(self.total * 1000, 3),
+                    'avg_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+                    'max_ms': round(self.max * 1000, 3)}
+
+class InstrumentedLock:
+    """threading.Lock that records how long callers waited to get it"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waits = WaitStats()
+        self.contended = 0
+    
+    def __enter__(self):
+        if self._lock.acquire(blocking=False):
+            self.waits.record(0.0)
+            return self
+        start = time.perf_counter()
+        self._lock.acquire()
+        self.contended += 1
+        self.waits.record(time.perf_counter() - start)
+        return self
+    
+    def __exit__(self, *exc):
+        self._lock.release()
+    
+    def snapshot(self):
+        return dict(self.waits.snapshot(), contended=self.contended)
+
+class SharedDatabase:
+    def __init__(self, db_file, profile=None):
+        self.db_file = db_file
+        self.profile = profile or probe_storage_profile(os.path.dirname(os.path.abspath(db_file)))
+        # One writer at a time in this process; readers get their own query_only
+        # connections and take no Python lock (SQLite arbitrates against the writer)
+        self.write_lock = InstrumentedLock()
+        self.pool = ConnectionPool(db_file, on_connect=lambda conn: apply_storage_profile(conn, self.profile))
+        self.read_pool = ConnectionPool(db_file, on_connect=self._setup_reader)
+        self.read_times = WaitStats()
+        self.archive_stats = {'moved': 0, 'runs': 0, 'last_run': None}
+        self._create_tables()
+    
+    def _setup_reader(self, conn):
+        apply_storage_profile(conn, self.profile)
+        conn.execute("PRAGMA query_only = ON")
+    
+    def _write(self, op):
+        with self.write_lock:
+            return self.pool.run(op)
+    
+    def _read(self, sql, params=()):
+        start = time.perf_counter()
+        try:
+            return self.read_pool.run(lambda conn: conn.execute(sql, params).fetchall())
+        finally:
+            self.read_times.record(time.perf_counter() - start)
+    
+    def _read_trades(self, where='', params=(), table='trades'):
+        """SELECT TRADE_COLUMNS_SQL FROM <table> <where>, built straight into Trade records"""
+        def op(conn):
+            cursor = conn.cursor()
+            cursor.row_factory = lambda cursor, row: Trade(*row)
+            return cursor.execute(f"SELECT {TRADE_COLUMNS_SQL} FROM {table} {where}", params).fetchall()
+        start = time.perf_counter()
+        try:
+            return self.read_pool.run(op)
+        finally:
+            self.read_times.record(time.perf_counter() - start)
+    
+    def get_stats(self):
+        return {'write_lock_wait': self.write_lock.snapshot(), 'reads': self.read_times.snapshot(),
+                'write_pool': self.pool.get_stats(), 'read_pool': self.read_pool.get_stats(),
+                'archive': dict(self.archive_stats)}
+    
+    def _create_tables(self):
+        def op(conn):
+            # journal_mode is persistent in the file; record what SQLite actually granted
+            self.profile['journal_mode'] = conn.execute(f"PRAGMA journal_mode = {self.profile['journal_mode']}").fetchone()[0].lower()
+            cursor = conn.cursor()
+            # IMMEDIATE: desks starting together queue here, and each re-reads user_version once it holds the lock
+            cursor.execute("BEGIN IMMEDIATE")
+            if not cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trades'").fetchone():
+                cursor.execute(TRADES_TABLE_SQL % 'trades')
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._migrate(cursor)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_status ON trades(status)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_trader ON trades(trader_name)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_pair ON trades(currency_pair)")
+            # Blotter queries filter on one of these and page in time order
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON trades(timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_status_ts ON trades(status, timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_pair_ts ON trades(currency_pair, timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_trader_ts ON trades(trader_name, timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_counterparty ON trades(counterparty)")
+            # The archiver looks for closes older than the horizon; last_updated of a closed trade is its close time.
+            # Partial, so the mark writes that stamp last_updated on every open row never touch it.
+            cursor.execute("DROP INDEX IF EXISTS idx_status_updated")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_closed_updated ON trades(last_updated) WHERE status = 'closed'")
+            cursor.execute(TRADES_TABLE_SQL % 'trades_archive')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_ts ON trades_archive(timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_pair_ts ON trades_archive(currency_pair, timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_trader_ts ON trades_archive(trader_name, timestamp)")
+            self._create_change_tracking(cursor)
+            self._create_epoch_triggers(cursor)
+            self._create_pips_triggers(cursor)
+            conn.commit()
+        self._write(op)
+    
+    def _migrate(self, cursor):
+        """Bring an older file up to SCHEMA_VERSION, one step per PRAGMA user_version"""
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for target, step in ((1, self._migrate_v1_epoch_columns), (2, self._migrate_v2_pips)):
+            if version < target:
+                step(cursor)
+                cursor.execute(f"PRAGMA user_version = {target}")
+                version = target
+    
+    def _migrate_v1_epoch_columns(self, cursor):
+        # v0 kept times/dates as str(datetime) TEXT. TEXT affinity would turn integers back into text,
+        # so the table is rebuilt with INTEGER columns (dropping it also drops its indexes and triggers)
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(trades)").fetchall()]
+        select = [{'timestamp': _sql_epoch_ms('timestamp'), 'last_updated': _sql_epoch_ms('last_updated'),
+                   'value_date': _sql_epoch_date_ms('value_date'), 'settlement_date': _sql_epoch_date_ms('settlement_date'),
+                   }.get(c, c if c in columns else 'NULL') for c in TRADE_COLUMNS]
+        select.append('change_seq' if 'change_seq' in columns else '0')
+        cursor.execute(TRADES_TABLE_SQL % 'trades_v1')
+        cursor.execute(f"INSERT INTO trades_v1 ({TRADE_COLUMNS_SQL}, change_seq) SELECT {', '.join(select)} FROM trades")
+        cursor.execute("DROP TABLE trades")
+        cursor.execute("ALTER TABLE trades_v1 RENAME TO trades")
+    
+    def _migrate_v2_pips(self, cursor):
+        # v2 stores pips next to unrealized_pnl; backfill them from the marks already on file
+        for table in ('trades', 'trades_archive'):
+            columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+            if not columns:
+                continue
+            if 'pips' not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN pips REAL")
+            cursor.execute(f"UPDATE {table} SET pips = {_sql_pips()} WHERE current_market_rate IS NOT NULL")
+    
+    def _create_epoch_triggers(self, cursor):
+        # Older builds and the Mac build still write str(datetime) text; convert it in place
+        text = ' OR '.join(f"typeof(NEW.{c}) = 'text'" for c in EPOCH_COLUMNS)
+        sets = ', '.join(f"{c} = {(_sql_epoch_date_ms if c in ('value_date', 'settlement_date') else _sql_epoch_ms)('NEW.' + c)}"
+                         for c in EPOCH_COLUMNS)
+        for event in ('INSERT', f"UPDATE OF {', '.join(EPOCH_COLUMNS)}"):
+            name = 'trg_trades_epoch_' + event.split()[0].lower()
+            cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON trades WHEN {text} BEGIN
+                UPDATE trades SET {sets} WHERE rowid = NEW.rowid; END""")
+    
+    def _create_pips_triggers(self, cursor):
+        # The Mac build and pre-v2 desks write marks without pips; derive them so the column never lags the rate
+        pips = _sql_pips('NEW.')
+        triggers = {
+            'trg_trades_pips_insert': f"""CREATE TRIGGER trg_trades_pips_insert AFTER INSERT ON trades
+            WHEN NEW.pips IS NULL AND NEW.current_market_rate IS NOT NULL BEGIN
+            UPDATE trades SET pips = {pips} WHERE rowid = NEW.rowid; END""",
+            'trg_trades_pips_update': f"""CREATE TRIGGER trg_trades_pips_update AFTER UPDATE OF current_market_rate ON trades
+            WHEN NEW.current_market_rate IS NOT OLD.current_market_rate AND NEW.pips IS OLD.pips BEGIN
+            UPDATE trades SET pips = {pips} WHERE rowid = NEW.rowid AND pips IS NOT {pips}; END""",
+        }
+        # The trigger bodies bake in PIP_SIZES, so a file built with other sizes gets them rebuilt (and its pips redone)
+        digest = int(hashlib.sha1(''.join(triggers.values()).encode()).hexdigest()[:15], 16)
+        stored = cursor.execute("SELECT value FROM store_meta WHERE key = 'pips_triggers'").fetchone()
+        if stored and stored[0] == digest:
+            return
+        for name, sql in triggers.items():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(sql)
+        if stored:
+            for table in ('trades', 'trades_archive'):
+                cursor.execute(f"UPDATE {table} SET pips = {_sql_pips()} WHERE current_market_rate IS NOT NULL")
+        cursor.execute("INSERT OR REPLACE INTO store_meta VALUES ('pips_triggers', ?)", (digest,))
+    
+    def _create_change_tracking(self, cursor):
+        # Every insert/update/delete bumps store_meta.change_seq from inside SQLite, so rows
+        # written by any build or any desk on the share get a sequence number for /api/trades?since=
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(trades)").fetchall()]
+        if 'change_seq' not in columns:
+            cursor.execute("ALTER TABLE trades ADD COLUMN change_seq INTEGER DEFAULT 0")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_seq ON trades(change_seq)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        cursor.execute("INSERT OR IGNORE INTO store_meta VALUES ('change_seq', 0)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS trade_tombstones (trade_id TEXT PRIMARY KEY, change_seq INTEGER NOT NULL)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tombstone_seq ON trade_tombstones(change_seq)")
+        bump = """UPDATE store_meta SET value = value + 1 WHERE key = 'change_seq';"""
+        stamp = """UPDATE trades SET change_seq = (SELECT value FROM store_meta WHERE key = 'change_seq') WHERE rowid = NEW.rowid;"""
+        data_columns = ', '.join(c for c in columns if c != 'change_seq')
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_trades_seq_insert AFTER INSERT ON trades BEGIN
+            {bump} {stamp}
+            DELETE FROM trade_tombstones WHERE trade_id = NEW.trade_id; END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_trades_seq_update AFTER UPDATE OF {data_columns} ON trades BEGIN
+            {bump} {stamp} END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_trades_seq_delete AFTER DELETE ON trades BEGIN
+            {bump}
+            INSERT OR REPLACE INTO trade_tombstones VALUES (OLD.trade_id, (SELECT value FROM store_meta WHERE key = 'change_seq')); END""")
+    
+    def save_trade(self, trade):
+        if not trade or not trade.trade_id: return False
+        def op(conn):
+            conn.execute("INSERT OR REPLACE INTO trades (%s) VALUES (%s)" % (TRADE_COLUMNS_SQL, TRADE_PARAMS_SQL), trade.to_row())
+            conn.commit()
+            return True
+        try:
+            return self._write(op)
+        except:
+            return False
+    
+    def save_trades_batch(self, trades):
+        """Write many trades in one transaction (one commit/fsync on the share). Returns rows written."""
+        rows = [t.to_row() for t in trades if t and t.trade_id]
+        if not rows: return 0
+        def op(conn):
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO trades (%s) VALUES (%s)" % (TRADE_COLUMNS_SQL, TRADE_PARAMS_SQL), rows)
+            return len(rows)
+        try:
+            return self._write(op)
+        except:
+            return 0
+    
+    def update_marks(self, marks):
+        """Write (trade_id, rate, pnl, pips) marks to the price/P&L columns only, in one transaction.
+        Rows whose stored mark already matches are left alone. Returns rows really changed."""
+        now = epoch_ms(datetime.now())
+        rows = [(rate, pnl, pips, now, trade_id, rate, pnl) for trade_id, rate, pnl, pips in marks]
+        if not rows: return 0
+        def op(conn):
+            with conn:
+                cursor = conn.executemany("""UPDATE trades SET current_market_rate = ?, unrealized_pnl = ?, pips = ?, last_updated = ?
+                    WHERE trade_id = ? AND status = 'open'
+                    AND (current_market_rate IS NOT ? OR unrealized_pnl IS NOT ?)""", rows)
+            return max(cursor.rowcount, 0)
+        try:
+            return self._write(op)
+        except:
+            return 0
+    
+    def delete_trade(self, trade_id):
+        def op(conn):
+            deleted = conn.execute("DELETE FROM trades WHERE trade_id = ?", (trade_id,)).rowcount > 0
+            deleted = conn.execute("DELETE FROM trades_archive WHERE trade_id = ?", (trade_id,)).rowcount > 0 or deleted
+            conn.commit()
+            return deleted
+        try:
+            return self._write(op)
+        except:
+            return False
+    
+    def get_all_trades(self):
+        """The live blotter: open trades and closes newer than the archive horizon"""
+        try:
+            return self._read_trades("ORDER BY timestamp DESC")
+        except:
+            return []
+    
+    def get_trade_ids(self):
+        """Every trade id on record, live and archived"""
+        return set(row[0] for row in self._read("SELECT trade_id FROM trades UNION ALL SELECT trade_id FROM trades_archive"))
+    
+    def query_trades(self, status=None, pairs=None, sides=None, trader=None, counterparty=None,
+                     search=None, sort='timestamp', direction='desc', limit=200, offset=0,
+                     start_ms=None, end_ms=None, archive=False):
+        """Filtered, sorted page of the live blotter (or of the archive). Returns (total matching, rows)."""
+        table = 'trades_archive' if archive else 'trades'
+        where, params = [], []
+        if start_ms is not None:
+            where.append("timestamp >= ?")
+            params.append(int(start_ms))
+        if end_ms is not None:
+            where.append("timestamp < ?")
+            params.append(int(end_ms))
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if pairs:
+            where.append("currency_pair IN (%s)" % ','.join('?' * len(pairs)))
+            params.extend(pairs)
+        if sides:
+            where.append("side IN (%s)" % ','.join('?' * len(sides)))
+            params.extend(sides)
+        if trader:
+            where.append("trader_name = ?")
+            params.append(trader)
+        if counterparty:
+            where.append("counterparty = ?")
+            params.append(counterparty)
+        if search:
+            pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            where.append("(" + " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in
+                         ('trade_id', 'currency_pair', 'trader_name', 'counterparty', 'side')) + ")")
+            params.extend([pattern] * 5)
+        clause = (" WHERE " + " AND ".join(where)) if where else ""
+        order = SORT_COLUMNS.get(sort, 'timestamp')
+        direction = 'ASC' if str(direction).lower() == 'asc' else 'DESC'
+        total = self._read(f"SELECT COUNT(*) FROM {table}" + clause, params)[0][0]
+        rows = self._read_trades(f"{clause} ORDER BY {order} {direction}, trade_id {direction} LIMIT ? OFFSET ?",
+                                 params + [int(limit), int(offset)], table)
+        return total, rows
+    
+    def archive_closed(self, older_than_ms, batch=None):
+        """Move closed trades last touched before older_than_ms into trades_archive, batch by batch.
+        The delete leaves tombstones, so live clients drop the rows through the normal delta feed."""
+        batch = batch or Config.ARCHIVE_BATCH
+        def op(conn):
+            with conn:
+                ids = [row[0] for row in conn.execute(
+                    "SELECT trade_id FROM trades INDEXED BY idx_closed_updated WHERE status = 'closed' AND last_updated < ? LIMIT ?",
+                    (older_than_ms, batch)).fetchall()]
+                if ids:
+                    marks = ','.join('?' * len(ids))
+                    conn.execute(f"INSERT OR REPLACE INTO trades_archive ({TRADE_COLUMNS_SQL}, change_seq) "
+                                 f"SELECT {TRADE_COLUMNS_SQL}, change_seq FROM trades WHERE trade_id IN ({marks})", ids)
+                    conn.execute(f"DELETE FROM trades WHERE trade_id IN ({marks})", ids)
+            return len(ids)
+        moved = 0
+        while True:
+            n = self._write(op)  # lock released between batches so repricing and reads interleave
+            moved += n
+            if n < batch:
+                break
+        self.archive_stats['moved'] += moved
+        self.archive_stats['runs'] += 1
+        self.archive_stats['last_run'] = epoch_ms(datetime.now())
+        return moved
+    
+    def start_archiver(self):
+        if Config.ARCHIVE_AFTER_DAYS:
+            threading.Thread(target=self._archive_loop, daemon=True).start()
+    
+    def _archive_loop(self):
+        while True:
+            try:
+                self.archive_closed(epoch_ms(datetime.now() - timedelta(days=Config.ARCHIVE_AFTER_DAYS)))
+            except:
+                pass
+            time.sleep(Config.ARCHIVE_CHECK_SECONDS)
+    
+    def current_seq(self):
+        return self._read("SELECT value FROM store_meta WHERE key = 'change_seq'")[0][0]
+    
+    def get_changes_since(self, since):
+        """Rows inserted/updated and ids deleted after change sequence `since`.
+        Returns (seq, trades, deleted_ids, full) - full means trades is the whole table."""
+        seq = self.current_seq()  # read first: anything committed before it is in the queries below
+        if since <= 0 or since > seq:
+            return seq, self.get_all_trades(), [], True
+        rows = self._read_trades("WHERE change_seq > ?", (since,))
+        deleted = self._read("SELECT trade_id FROM trade_tombstones WHERE change_seq > ?", (since,))
+        return seq, rows, [row[0] for row in deleted], False
+    
+    def get_book_changes(self, since):
+        """Narrow feed the in-memory open book syncs from: (seq, [(trade_id, status, pair, side, notional,
+        entry)] for every row changed after `since`, deleted ids)"""
+        seq = self.current_seq()
+        rows = self._read("""SELECT trade_id, status, currency_pair, side, notional_amount, execution_rate
+                             FROM trades WHERE change_seq > ?""", (since,))
+        deleted = self._read("SELECT trade_id FROM trade_tombstones WHERE change_seq > ?", (since,))
+        return seq, rows, [row[0] for row in deleted]
+    
+    def get_open_ids(self, trade_ids):
+        """Which of trade_ids are open in the live table"""
+        trade_ids = list(trade_ids)
+        return set(row[0] for row in self._read("SELECT trade_id FROM trades WHERE status = 'open' AND trade_id IN (%s)"
+                                                % ','.join('?' * len(trade_ids)), trade_ids))
+    
+    def get_open_trades(self, pairs=None, trade_ids=None):
+        try:
+            if trade_ids:
+                trade_ids = list(trade_ids)
+                return self._read_trades("WHERE status = 'open' AND trade_id IN (%s)"
+                                         % ','.join('?' * len(trade_ids)), trade_ids)
+            if pairs:
+                pairs = list(pairs)
+                return self._read_trades("WHERE status = 'open' AND currency_pair IN (%s)"
+                                         % ','.join('?' * len(pairs)), pairs)
+            return self._read_trades("WHERE status = 'open'")
+        except:
+            return []
+    
+    def checkpoint(self, mode='PASSIVE'):
+        """Fold the WAL back into the database file; returns (busy, log pages, checkpointed pages)"""
+        if self.profile['journal_mode'] != 'wal': return None
+        try:
+            return tuple(self.pool.run(lambda conn: conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()))
+        except:
+            return None
+    
+    def start_checkpointer(self):
+        if self.profile['journal_mode'] == 'wal' and self.profile['checkpoint_seconds']:
+            threading.Thread(target=self._checkpoint_loop, daemon=True).start()
+    
+    def _checkpoint_loop(self):
+        while True:
+            time.sleep(self.profile['checkpoint_seconds'])
+            self.checkpoint()
+    
+    def close(self):
+        # Readers go first so TRUNCATE can reset the WAL file to zero length
+        self.read_pool.close_all()
+        self.checkpoint('TRUNCATE')
+        self.pool.close_all()
+
+shared_db = SharedDatabase(Config.DATABASE_FILE)
+
+# ============================================================================
+# FLASK APP
+# ============================================================================
+
+app = Flask(__name__)
+app.config['SECRET_KEY'] = 'fx-tracker'
+tracker_instance = None
+webview_window = None  # For fullscreen
+
+DASHBOARD_CSS = """* { margin: 0; padding: 0; box-sizing: border-box; }
+html, body { height: 100%; overflow: hidden; }
+body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 15px; display: flex; flex-direction: column; }
+.header { background: white; padding: 18px 25px; border-radius: 12px; margin-bottom: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.15); flex-shrink: 0; }
+.header h1 { color: #2d3748; font-size: 24px; margin-bottom: 5px; font-weight: 700; }
+.subtitle { color: #718096; font-size: 12px; margin-bottom: 10px; }
+.connection-badge { display: inline-block; padding: 4px 10px; border-radius: 5px; font-size: 11px; font-weight: 600; background: #fef5e7; color: #f39c12; margin-bottom: 10px; }
+.controls { display: flex; gap: 8px; margin-bottom: 10px; flex-wrap: wrap; align-items: center; }
+.filter-btn, .action-btn { padding: 7px 14px; border: none; border-radius: 6px; font-size: 12px; font-weight: 600; cursor: pointer; transition: all 0.15s; }
+.filter-btn.active { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; }
+.filter-btn:not(.active) { background: #edf2f7; color: #4a5568; }
+.action-btn { background: #48bb78; color: white; }
+.action-btn.calc { background: #ed8936; }
+.action-btn.fullscreen { background: #4299e1; }
+.filter-btn:hover, .action-btn:hover { transform: translateY(-1px); }
+.search-box { padding: 7px 12px; border: 2px solid #e2e8f0; border-radius: 6px; font-size: 12px; width: 250px; }
+.search-box:focus { outline: none; border-color: #667eea; }
+.toggle-advanced { background: #edf2f7; color: #4a5568; font-size: 11px; padding: 5px 10px; border: none; border-radius: 4px; cursor: pointer; }
+.advanced-search { background: #f7fafc; padding: 10px; border-radius: 6px; margin-bottom: 10px; display: none; }
+.advanced-search.active { display: block; }
+.filter-group { display: flex; gap: 12px; flex-wrap: wrap; align-items: center; font-size: 12px; }
+.filter-group label { display: flex; align-items: center; gap: 4px; cursor: pointer; }
+.stats-grid { display: grid; grid-template-columns: repeat(5, 1fr); gap: 10px; margin-bottom: 10px; }
+.stat-card { background: linear-gradient(135deg, #f7fafc 0%, #edf2f7 100%); padding: 10px 12px; border-radius: 6px; border-left: 3px solid #667eea; }
+.stat-label { font-size: 9px; color: #718096; text-transform: uppercase; font-weight: 600; margin-bottom: 3px; }
+.stat-value { font-size: 18px; font-weight: 700; color: #2d3748; }
+.trades-table-container { background: white; border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.15); flex: 1; display: flex; flex-direction: column; overflow: hidden; min-height: 0; }
+.table-wrapper { flex: 1; overflow: auto; }
+table { width: 100%; border-collapse: collapse; }
+thead { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); position: sticky; top: 0; z-index: 10; }
+th { padding: 10px; text-align: left; color: white; font-weight: 600; font-size: 11px; text-transform: uppercase; cursor: pointer; user-select: none; white-space: nowrap; }
+th:hover { background: rgba(255,255,255,0.1); }
+th.sortable::after { content: ' ⇅'; opacity: 0.5; }
+th.sort-asc::after { content: ' ↑'; opacity: 1; }
+th.sort-desc::after { content: ' ↓'; opacity: 1; }
+tbody tr:hover { background: #f7fafc; }
+tbody tr.spacer:hover { background: none; }
+tr.spacer td { padding: 0; border: 0; }
+td { padding: 8px 10px; border-bottom: 1px solid #e2e8f0; font-size: 12px; white-space: nowrap; }
+.trade-id { font-family: 'Courier New', monospace; font-weight: 700; color: #667eea; background: #edf2f7; padding: 2px 6px; border-radius: 3px; font-size: 11px; }
+.side-buy { background: #c6f6d5; color: #22543d; padding: 3px 8px; border-radius: 4px; font-weight: 700; font-size: 10px; }
+.side-sell { background: #fed7d7; color: #742a2a; padding: 3px 8px; border-radius: 4px; font-weight: 700; font-size: 10px; }
+.status-open { background: #fef5e7; color: #f39c12; padding: 3px 8px; border-radius: 4px; font-weight: 700; font-size: 9px; }
+.status-closed { background: #d5f4e6; color: #27ae60; padding: 3px 8px; border-radius: 4px; font-weight: 700; font-size: 9px; }
+.pnl-positive { color: #48bb78; font-weight: 700; }
+.pnl-negative { color: #f56565; font-weight: 700; }
+.trader-badge, .bank-badge { background: #edf2f7; padding: 2px 7px; border-radius: 3px; font-size: 11px; font-weight: 600; color: #4a5568; }
+.rate-display { font-family: 'Courier New', monospace; font-weight: 600; }
+.rate-stale { color: #a0aec0; font-style: italic; }
+.edit-btn, .delete-btn { padding: 3px 7px; border: none; border-radius: 3px; font-size: 10px; font-weight: 600; cursor: pointer; margin-right: 3px; }
+.edit-btn { background: #4299e1; color: white; }
+.delete-btn { background: #fc8181; color: white; }
+
+.modal { display: none; position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0,0,0,0.75); z-index: 1000; justify-content: center; align-items: center; }
+.modal.active { display: flex; }
+.modal-content { background: white; padding: 25px; border-radius: 12px; max-width: 600px; width: 90%; max-height: 90vh; overflow-y: auto; }
+.modal-header { font-size: 20px; font-weight: 700; color: #2d3748; margin-bottom: 15px; }
+.form-group { margin-bottom: 12px; }
+.form-label { display: block; font-size: 12px; font-weight: 600; color: #4a5568; margin-bottom: 4px; }
+.form-input, .form-select { width: 100%; padding: 8px; border: 2px solid #e2e8f0; border-radius: 5px; font-size: 13px; }
+.form-input:focus, .form-select:focus { outline: none; border-color: #667eea; }
+.form-actions { display: flex; gap: 8px; margin-top: 15px; }
+.btn-primary, .btn-secondary { flex: 1; padding: 10px; border: none; border-radius: 6px; font-size: 13px; font-weight: 600; cursor: pointer; }
+.btn-primary { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; }
+.btn-secondary { background: #e2e8f0; color: #4a5568; }
+
+.calc-grid { display: grid; grid-template-columns: 1fr 1fr; gap: 12px; margin-bottom: 15px; }
+.calc-result { background: #f7fafc; padding: 15px; border-radius: 8px; border-left: 4px solid #667eea; }
+.calc-result-label { font-size: 11px; color: #718096; margin-bottom: 5px; font-weight: 600; }
+.calc-result-value { font-size: 24px; font-weight: 700; color: #2d3748; }
+"""
+
+# Filter/sort worker: holds a columnar copy of the blotter off the UI thread
+DASHBOARD_WORKER_JS = """// Columnar copy of the blotter: one array per field, sort keys precomputed as trades arrive
+const NUM = ['timestamp', 'amount', 'entry_rate', 'current_rate', 'pnl', 'pips'];
+const STR = ['trade_id', 'trader', 'pair', 'side', 'counterparty', 'status'];
+let n = 0, cap = 1024, slots = new Map(), text = [], cols = {};
+
+function reset() {
+    n = 0; slots = new Map(); text = [];
+    NUM.forEach(c => cols[c] = new Float64Array(cap));
+    STR.forEach(c => cols[c] = []);
+}
+
+function grow() {
+    cap *= 2;
+    NUM.forEach(c => { const a = new Float64Array(cap); a.set(cols[c]); cols[c] = a; });
+}
+
+function put(t) {
+    let i = slots.get(t.trade_id);
+    if (i === undefined) { if (n === cap) grow(); i = n++; slots.set(t.trade_id, i); }
+    cols.timestamp[i] = t.timestamp;
+    cols.amount[i] = parseFloat(t.amount) || 0;
+    cols.entry_rate[i] = parseFloat(t.entry_rate) || 0;
+    cols.current_rate[i] = parseFloat(t.current_rate) || 0;
+    cols.pnl[i] = parseFloat(t.pnl) || 0;
+    cols.pips[i] = t.pips || 0;
+    cols.trade_id[i] = t.trade_id; cols.trader[i] = t.trader || ''; cols.pair[i] = t.pair;
+    cols.side[i] = t.side; cols.counterparty[i] = t.counterparty || ''; cols.status[i] = t.status;
+    text[i] = `${t.trade_id} ${t.pair} ${t.trader} ${t.counterparty || ''} ${t.side}`.toLowerCase();
+}
+
+function drop(id) {
+    // Swap-remove: the last slot moves into the hole so the columns stay dense
+    const i = slots.get(id);
+    if (i === undefined) return;
+    const last = --n;
+    slots.delete(id);
+    if (i !== last) {
+        NUM.forEach(c => cols[c][i] = cols[c][last]);
+        STR.forEach(c => cols[c][i] = cols[c][last]);
+        text[i] = text[last];
+        slots.set(cols.trade_id[i], i);
+    }
+    STR.forEach(c => cols[c].length = n);
+    text.length = n;
+}
+
+function view(q) {
+    const pairs = new Set(q.pairs), sides = new Set(q.sides), status = cols.status, idx = [];
+    for (let i = 0; i < n; i++) {
+        if (q.filter !== 'all' && status[i] !== q.filter) continue;
+        if (q.search && !text[i].includes(q.search)) continue;
+        if (pairs.size && !pairs.has(cols.pair[i])) continue;
+        if (sides.size && !sides.has(cols.side[i])) continue;
+        idx.push(i);
+    }
+    const key = cols[q.column], dir = q.direction === 'asc' ? 1 : -1, ids = cols.trade_id;
+    if (key) idx.sort((a, b) => key[a] < key[b] ? -dir : key[a] > key[b] ? dir : ids[a] < ids[b] ? -1 : ids[a] > ids[b] ? 1 : 0);
+    postMessage({ids: idx.map(i => ids[i])});
+}
+
+onmessage = e => {
+    const m = e.data;
+    if (m.type !== 'delta') return view(m);
+    if (m.full) reset();
+    m.trades.forEach(put);
+    m.deleted.forEach(drop);
+};
+reset();
+"""
+
+DASHBOARD_JS = """let allTrades = [], currentFilter = 'all', searchQuery = '', sortColumn = 'timestamp', sortDirection = 'desc';
+let selectedPairs = [], selectedSides = [], quotes = {}, pipSizes = {};
+const SEARCH_DEBOUNCE_MS = 150;
+
+function toggleFullscreen() {
+    fetch('/api/fullscreen', {method: 'POST'});
+}
+
+function toggleAdvanced() { document.getElementById('advanced').classList.toggle('active'); }
+
+function updateFilters() {
+    selectedPairs = Array.from(document.querySelectorAll('#advanced input[type="checkbox"]:not(.side-filter):checked')).map(cb => cb.value);
+    selectedSides = Array.from(document.querySelectorAll('#advanced input.side-filter:checked')).map(cb => cb.value);
+    renderTrades(allTrades);
+}
+
+function clearFilters() {
+    document.querySelectorAll('#advanced input[type="checkbox"]').forEach(cb => cb.checked = false);
+    selectedPairs = []; selectedSides = [];
+    renderTrades(allTrades);
+}
+
+function filterTrades(f) {
+    currentFilter = f;
+    document.querySelectorAll('.filter-btn').forEach(b => b.classList.remove('active'));
+    document.getElementById('btn-' + f).classList.add('active');
+    renderTrades(allTrades);
+}
+
+let searchTimer = null;
+
+function searchTrades() {
+    // Debounced so a burst of keystrokes costs one filter pass
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+        searchQuery = document.getElementById('search-box').value.toLowerCase().trim();
+        renderTrades(allTrades);
+    }, SEARCH_DEBOUNCE_MS);
+}
+
+function sortTable(c) {
+    sortColumn === c ? (sortDirection = sortDirection === 'asc' ? 'desc' : 'asc') : (sortColumn = c, sortDirection = 'desc');
+    document.querySelectorAll('th').forEach(th => th.classList.remove('sort-asc', 'sort-desc'));
+    event.target.classList.add('sort-' + sortDirection);
+    renderTrades(allTrades);
+}
+
+function pipSize(pair) {
+    // Same fallback as the server until /api/config has loaded (or for a pair it doesn't list)
+    return pipSizes[pair] || (pair.includes('JPY') ? 0.01 : 0.0001);
+}
+
+function calculatePips(pair, entry, current, side) {
+    // Calculator only: blotter rows carry server-computed pips
+    if (!entry || !current || !pair) return 0;
+
+    let pips = (current - entry) / pipSize(pair);
+    if (side === 'SELL') pips = -pips;
+
+    return Math.round(pips * 10) / 10; // Round to 1 decimal
+}
+
+function getSortValue(t, c) {
+    const v = {pips: t.pips || 0, trade_id: t.trade_id, timestamp: t.timestamp, trader: t.trader || '', pair: t.pair, side: t.side, amount: parseFloat(t.amount), entry_rate: parseFloat(t.entry_rate), current_rate: parseFloat(t.current_rate) || 0, pnl: parseFloat(t.pnl) || 0, counterparty: t.counterparty || '', status: t.status};
+    return v[c] !== undefined ? v[c] : '';
+}
+
+function isStale(t) {
+    // Quote ages come from /api/status, so a pair that stops ticking is flagged without any row changing
+    if (t.status !== 'open') return false;
+    // No quote for the pair: the server aged the stored mark from last_updated and flagged it stale
+    const q = quotes[t.pair];
+    return q ? q.stale : !!t.stale;
+}
+
+function matchesFilters(t) {
+    if (currentFilter === 'open' && t.status !== 'open') return false;
+    if (currentFilter === 'closed' && t.status !== 'closed') return false;
+    if (searchQuery && !`${t.trade_id} ${t.pair} ${t.trader} ${t.counterparty || ''} ${t.side}`.toLowerCase().includes(searchQuery)) return false;
+    if (selectedPairs.length && !selectedPairs.includes(t.pair)) return false;
+    if (selectedSides.length && !selectedSides.includes(t.side)) return false;
+    return true;
+}
+
+// Keyed row cache: trade_id -> {tr, text, t, vals, stale, pass}. Rows are patched in place, never rebuilt
+const rowCache = new Map(), emptyRow = document.createElement('tr'), rowTemplate = document.createElement('tr');
+emptyRow.innerHTML = '<td colspan="13" style="text-align: center; padding: 40px; color: #a0aec0;">No matches</td>';
+rowTemplate.innerHTML = '<td><span class="trade-id"></span></td><td></td><td><span class="trader-badge"></span></td><td></td><td><span></span></td><td></td><td class="rate-display"></td><td class="rate-display"></td><td></td><td></td><td><span class="bank-badge"></span></td><td><span></span></td><td><button class="edit-btn">Edit</button><button class="delete-btn">Del</button></td>';
+const timeFmt = new Intl.DateTimeFormat('en-US', {month:'short', day:'numeric', hour:'2-digit', minute:'2-digit'});
+const amountFmt = new Intl.NumberFormat('en-US', {maximumFractionDigits: 0}), pnlFmt = new Intl.NumberFormat('en-US', {minimumFractionDigits: 2});
+const CELL_CLASS = {4: v => 'side-' + v.toLowerCase(), 8: v => v[0] === '+' ? 'pnl-positive' : 'pnl-negative', 9: v => v[0] === '+' ? 'pnl-positive' : 'pnl-negative', 11: v => 'status-' + v.toLowerCase()};
+const ROW_OVERSCAN = 20, ROW_CACHE_MAX = 2000;
+const topSpacer = document.createElement('tr'), bottomSpacer = document.createElement('tr');
+topSpacer.className = bottomSpacer.className = 'spacer';
+topSpacer.innerHTML = bottomSpacer.innerHTML = '<td colspan="13"></td>';
+let renderPass = 0, viewTrades = [], rowHeight = 33, rowHeightMeasured = false;
+
+function cellValues(t) {
+    const pnl = parseFloat(t.pnl) || 0;
+    const pips = t.pips || 0;
+    return [t.trade_id, timeFmt.format(new Date(t.timestamp)), t.trader || 'Unknown', t.pair, t.side,
+            amountFmt.format(t.amount), t.entry_rate.toFixed(4), t.current_rate ? t.current_rate.toFixed(4) : '--',
+            (pnl >= 0 ? '+' : '') + '$' + pnlFmt.format(Math.abs(pnl)), (pips >= 0 ? '+' : '') + pips.toFixed(1),
+            t.counterparty || 'N/A', t.status.toUpperCase()];
+}
+
+function patchRow(r, t) {
+    // Only cells whose text changed are touched, so an unchanged row costs one comparison per cell
+    const vals = cellValues(t);
+    for (let i = 0; i < vals.length; i++) {
+        if (r.vals[i] === vals[i]) continue;
+        r.text[i].textContent = vals[i];
+        if (CELL_CLASS[i]) (i === 8 || i === 9 ? r.tr.cells[i] : r.text[i]).className = CELL_CLASS[i](vals[i]);
+    }
+    r.vals = vals; r.t = t;
+}
+
+function makeRow(t) {
+    const tr = rowTemplate.cloneNode(true);
+    tr.dataset.id = t.trade_id;
+    const r = {tr, text: Array.from(tr.cells).slice(0, 12).map(td => td.firstElementChild || td), vals: [], t: null, stale: false, pass: 0};
+    patchRow(r, t);
+    rowCache.set(t.trade_id, r);
+    return r;
+}
+
+// Filtering and sorting run in a worker holding a columnar copy of the trades; the page only applies the order.
+// matchesFilters/getSortValue remain as the in-page path for webviews without Worker support.
+let viewWorker = null, viewBusy = false, viewDirty = false, viewWaiters = [];
+const WORKER_URL = document.currentScript && document.currentScript.dataset.worker;  // content-hashed, from the shell
+
+function startViewWorker() {
+    if (!window.Worker || !WORKER_URL) return;
+    try {
+        viewWorker = new Worker(WORKER_URL);
+    } catch (e) { viewWorker = null; return; }
+    viewWorker.onmessage = e => {
+        viewBusy = false;
+        applyView(e.data.ids.map(id => tradeIndex.get(id)).filter(t => t));
+        if (viewDirty) { viewDirty = false; renderTrades(allTrades); }
+        else { viewWaiters.forEach(r => r()); viewWaiters = []; }
+    };
+}
+
+function viewSettled() {
+    return viewBusy ? new Promise(r => viewWaiters.push(r)) : Promise.resolve();
+}
+
+function renderTrades(trades) {
+    if (viewWorker) {
+        // One request in flight; anything asked for meanwhile collapses into a single follow-up
+        if (viewBusy) { viewDirty = true; return; }
+        viewBusy = true;
+        viewWorker.postMessage({type: 'view', filter: currentFilter, search: searchQuery, pairs: selectedPairs, sides: selectedSides, column: sortColumn, direction: sortDirection});
+        return;
+    }
+    let filtered = trades.filter(matchesFilters);
+
+    filtered.sort((a, b) => {
+        const aVal = getSortValue(a, sortColumn), bVal = getSortValue(b, sortColumn);
+        return aVal < bVal ? (sortDirection === 'asc' ? -1 : 1) : aVal > bVal ? (sortDirection === 'asc' ? 1 : -1) : 0;
+    });
+    applyView(filtered);
+}
+
+function applyView(filtered) {
+    document.getElementById('last-update').textContent = new Date().toLocaleTimeString();
+
+    viewTrades = filtered;
+    if (filtered.length && !firstRowsSent) { firstRowsSent = true; reportTiming('first_rows', performance.now()); }
+    if (rowCache.size > tradeIndex.size) rowCache.forEach((r, id) => { if (!tradeIndex.has(id)) rowCache.delete(id); });
+    renderWindow();
+}
+
+function renderWindow() {
+    // Only the rows in view plus ROW_OVERSCAN either side are in the DOM; spacer rows stand in for the rest
+    const tbody = document.getElementById('tbody'), wrapper = document.getElementById('table-wrapper');
+    if (topSpacer.parentNode !== tbody) { tbody.textContent = ''; tbody.appendChild(topSpacer); tbody.appendChild(bottomSpacer); }
+
+    const n = viewTrades.length, headH = document.querySelector('thead').offsetHeight || 0;
+    const visible = Math.ceil((wrapper.clientHeight || 0) / rowHeight) + 1;
+    let start = Math.max(0, Math.floor(((wrapper.scrollTop || 0) - headH) / rowHeight) - ROW_OVERSCAN);
+    start = Math.min(start, Math.max(0, n - visible - ROW_OVERSCAN));
+    const end = Math.min(n, start + visible + 2 * ROW_OVERSCAN);
+
+    const pass = ++renderPass;
+    const rows = viewTrades.slice(start, end).map(t => {
+        const r = rowCache.get(t.trade_id) || makeRow(t);
+        if (r.t !== t) patchRow(r, t);  // deltas replace the trade object, so identity means unchanged
+        const stale = isStale(t);
+        if (r.stale !== stale) {
+            r.tr.cells[7].className = 'rate-display' + (stale ? ' rate-stale' : '');
+            r.tr.cells[7].title = stale ? 'Stale quote' : '';
+            r.stale = stale;
+        }
+        r.pass = pass;
+        return r.tr;
+    });
+
+    // Walk the live rows against the wanted order: drop rows that left, move or insert only on mismatch
+    const wanted = tr => { const r = rowCache.get(tr.dataset.id); return r && r.tr === tr && r.pass === pass; };
+    let cursor = topSpacer.nextSibling;
+    for (const tr of rows) {
+        while (cursor !== bottomSpacer && cursor !== tr && !wanted(cursor)) { const next = cursor.nextSibling; tbody.removeChild(cursor); cursor = next; }
+        if (cursor === tr) cursor = cursor.nextSibling;
+        else tbody.insertBefore(tr, cursor);
+    }
+    while (cursor !== bottomSpacer) { const next = cursor.nextSibling; tbody.removeChild(cursor); cursor = next; }
+    if (!rows.length) tbody.insertBefore(emptyRow, bottomSpacer);
+
+    if (rows.length && !rowHeightMeasured && rows[0].offsetHeight) { rowHeight = rows[0].offsetHeight; rowHeightMeasured = true; }
+    topSpacer.firstChild.style.height = start * rowHeight + 'px';
+    bottomSpacer.firstChild.style.height = (n - end) * rowHeight + 'px';
+
+    // Rows scrolled out of the window stay cached for a quick return, up to ROW_CACHE_MAX
+    if (rowCache.size > ROW_CACHE_MAX) rowCache.forEach((r, id) => { if (r.pass !== pass) rowCache.delete(id); });
+}
+
+let scrollQueued = false;
+
+function queueWindow() {
+    if (scrollQueued) return;
+    scrollQueued = true;
+    requestAnimationFrame(() => { scrollQueued = false; renderWindow(); });
+}
+
+document.getElementById('table-wrapper').addEventListener('scroll', queueWindow);
+window.addEventListener('resize', queueWindow);
+
+document.getElementById('tbody').addEventListener('click', e => {
+    const btn = e.target.closest('button'), tr = btn && btn.closest('tr');
+    if (!tr || !tr.dataset.id) return;
+    btn.classList.contains('edit-btn') ? editTrade(tr.dataset.id) : deleteTrade(tr.dataset.id);
+});
+
+function openAddModal() {
+    document.getElementById('modal-title').textContent = 'Add New Trade';
+    document.getElementById('trade-form').reset();
+    document.getElementById('trade-id').value = 'FX' + new Date().toISOString().slice(0,10).replace(/-/g,'') + Math.floor(Math.random()*1000).toString().padStart(3,'0');
+    document.getElementById('trade-id').readOnly = false;
+    document.getElementById('trade-modal').classList.add('active');
+}
+
+function editTrade(id) {
+    const t = tradeIndex.get(id);
+    if (!t) return;
+    document.getElementById('modal-title').textContent = `Edit: ${t.trade_id}`;
+    document.getElementById('trade-id').value = t.trade_id;
+    document.getElementById('trade-id').readOnly = false;
+    document.getElementById('pair').value = t.pair;
+    document.getElementById('side').value = t.side;
+    document.getElementById('amount').value = t.amount;
+    document.getElementById('rate').value = t.entry_rate;
+    document.getElementById('trader').value = t.trader || '';
+    document.getElementById('counterparty').value = t.counterparty || '';
+    document.getElementById('status').value = t.status;
+    document.getElementById('trade-modal').classList.add('active');
+}
+
+function openCalcModal() {
+    // Reset all fields when opening
+    document.getElementById('calc-trade-ref').value = '';
+    document.getElementById('calc-pair').value = '';
+    document.getElementById('calc-side').value = '';
+    document.getElementById('calc-amount').value = '';
+    document.getElementById('calc-entry').value = '';
+    document.getElementById('calc-exit').value = '';
+    document.getElementById('calc-pnl-result').textContent = '$0.00';
+    document.getElementById('calc-pnl-result').style.color = '#2d3748';
+    document.getElementById('calc-pips-result').textContent = '0.0';
+    document.getElementById('calc-pips-result').style.color = '#2d3748';
+
+    // Populate trade dropdown
+    const sel = document.getElementById('calc-trade-ref');
+    sel.innerHTML = '<option value="">-- New Calculation --</option>';
+    allTrades.filter(t => t.status === 'open').forEach(t => {
+        sel.innerHTML += `<option value="${t.trade_id}">${t.trade_id} - ${t.pair} ${t.side} ${t.amount.toLocaleString()}</option>`;
+    });
+    document.getElementById('calc-modal').classList.add('active');
+}
+
+function loadTradeToCalc() {
+    const id = document.getElementById('calc-trade-ref').value;
+    if (!id) {
+        document.getElementById('calc-pair').value = '';
+        document.getElementById('calc-side').value = '';
+        document.getElementById('calc-amount').value = '';
+        document.getElementById('calc-entry').value = '';
+        document.getElementById('calc-exit').value = '';
+        calculatePnL();
+        return;
+    }
+
+    const trade = allTrades.find(t => t.trade_id === id);
+    if (trade) {
+        document.getElementById('calc-pair').value = trade.pair;
+        document.getElementById('calc-side').value = trade.side;
+        document.getElementById('calc-amount').value = trade.amount;
+        document.getElementById('calc-entry').value = trade.entry_rate;
+        document.getElementById('calc-exit').value = trade.current_rate || '';
+        calculatePnL();
+    }
+}
+
+function calculatePnL() {
+    const pair = document.getElementById('calc-pair').value;
+    const side = document.getElementById('calc-side').value;
+    const amount = parseFloat(document.getElementById('calc-amount').value) || 0;
+    const entry = parseFloat(document.getElementById('calc-entry').value) || 0;
+    const exit = parseFloat(document.getElementById('calc-exit').value) || 0;
+
+    if (!pair || !side || !amount || !entry || !exit) {
+        document.getElementById('calc-pnl-result').textContent = '$0.00';
+        document.getElementById('calc-pips-result').textContent = '0.0';
+        return;
+    }
+
+    // Calculate P&L
+    let pnl = 0;
+    if (side === 'BUY') {
+        pnl = (exit - entry) * amount;
+    } else {
+        pnl = (entry - exit) * amount;
+    }
+
+    // Calculate Pips
+    const pips = calculatePips(pair, entry, exit, side);
+
+    // Display
+    const pnlEl = document.getElementById('calc-pnl-result');
+    pnlEl.textContent = (pnl >= 0 ? '+' : '') + '$' + Math.abs(pnl).toLocaleString('en-US', {minimumFractionDigits: 2});
+    pnlEl.style.color = pnl >= 0 ? '#48bb78' : '#f56565';
+
+    const pipsEl = document.getElementById('calc-pips-result');
+    pipsEl.textContent = (pips >= 0 ? '+' : '') + pips.toFixed(1);
+    pipsEl.style.color = pips >= 0 ? '#48bb78' : '#f56565';
+}
+
+function closeModal(id) {
+    document.getElementById(id).classList.remove('active');
+}
+
+function saveTrade(e) {
+    e.preventDefault();
+    const pair = document.getElementById('pair').value;
+    const currencies = pair.split('/');
+
+    const data = {
+        trade_id: document.getElementById('trade-id').value.trim(),
+        timestamp: new Date().toISOString(),
+        currency_pair: pair,
+        base_currency: currencies[0],
+        quote_currency: currencies[1] || '',
+        side: document.getElementById('side').value,
+        notional_amount: parseFloat(document.getElementById('amount').value),
+        execution_rate: parseFloat(document.getElementById('rate').value),
+        trader_name: document.getElementById('trader').value.trim(),
+        counterparty: document.getElementById('counterparty').value.trim(),
+        status: document.getElementById('status').value,
+        value_date: new Date(Date.now() + 2*24*60*60*1000).toISOString().split('T')[0],
+        settlement_date: new Date(Date.now() + 2*24*60*60*1000).toISOString().split('T')[0]
+    };
+
+    fetch('/api/trade', {method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(data)})
+    .then(r => r.json())
+    .then(d => { if (d.success) { closeModal('trade-modal'); setTimeout(updateTrades, 100); } else alert('Error: ' + (d.error || 'Unknown')); })
+    .catch(err => alert('Error: ' + err));
+}
+
+function deleteTrade(id) {
+    if (!confirm(`Delete ${id}?`)) return;
+    fetch('/api/trade/' + id, {method: 'DELETE'})
+    .then(r => r.json())
+    .then(d => { if (d.success) setTimeout(updateTrades, 100); })
+    .catch(err => alert('Error'));
+}
+
+function updateStatus() {
+    fetch('/api/status').then(r => r.json()).then(d => {
+        document.getElementById('status').textContent = d.status;
+        const stalePairs = q => Object.keys(q).filter(p => q[p] && q[p].stale).join(',');
+        const before = stalePairs(quotes);
+        quotes = d.quotes || {};
+        if (stalePairs(quotes) !== before) renderWindow();
+    }).catch(() => {});
+}
+
+let summaryBusy = false;
+
+function updateSummary() {
+    // Stats cards come from the server's running aggregates, not from a pass over the list
+    if (summaryBusy) return;
+    summaryBusy = true;
+    fetch('/api/summary').then(r => r.json()).then(d => {
+        const s = d.totals;
+        document.getElementById('count-total').textContent = s.count;
+        document.getElementById('count-open').textContent = s.open;
+        document.getElementById('count-closed').textContent = s.closed;
+        const pnlEl = document.getElementById('total-pnl');
+        pnlEl.textContent = (s.pnl >= 0 ? '+' : '') + '$' + Math.abs(s.pnl).toLocaleString('en-US', {minimumFractionDigits: 2});
+        pnlEl.style.color = s.pnl >= 0 ? '#48bb78' : '#f56565';
+    }).catch(() => {}).finally(() => { summaryBusy = false; });
+}
+
+let tradeIndex = new Map(), changeSeq = 0;
+
+function applyTradeDelta(d) {
+    if (d.full) tradeIndex = new Map();
+    d.trades.forEach(t => tradeIndex.set(t.trade_id, t));
+    d.deleted.forEach(id => tradeIndex.delete(id));
+    if (viewWorker) viewWorker.postMessage({type: 'delta', full: d.full, trades: d.trades, deleted: d.deleted});
+    changeSeq = d.seq;
+    allTrades = Array.from(tradeIndex.values());
+    return d.full || d.trades.length > 0 || d.deleted.length > 0;
+}
+
+function updateTrades() {
+    // Only rows changed since the last poll come back; re-render only when something did
+    fetch('/api/trades?since=' + changeSeq).then(r => r.json()).then(d => {
+        if (applyTradeDelta(d)) { renderTrades(allTrades); updateSummary(); }
+        else document.getElementById('last-update').textContent = new Date().toLocaleTimeString();
+    }).catch(() => {});
+}
+
+let pushConnected = false;
+
+function startPush() {
+    // Server pushes coalesced deltas; polling only runs while the stream is down
+    if (!window.EventSource) return;
+    const es = new EventSource('/api/stream');
+    es.onopen = () => { pushConnected = true; };
+    es.onerror = () => { pushConnected = false; };
+    es.onmessage = e => {
+        const f = JSON.parse(e.data);
+        if (!f.full && f.seq <= changeSeq) return;
+        if (!f.full && f.since > changeSeq) { updateTrades(); return; }  // missed a frame
+        if (applyTradeDelta(f)) { renderTrades(allTrades); updateSummary(); }
+    };
+}
+
+document.addEventListener('keydown', e => { 
+    if (e.key === 'Escape') { 
+        closeModal('trade-modal'); 
+        closeModal('calc-modal'); 
+    }
+    if (e.key === 'F11') {
+        e.preventDefault();
+        toggleFullscreen();
+    }
+});
+
+function benchTrades(n) {
+    const pairs = ['EUR/USD', 'GBP/USD', 'USD/JPY', 'AUD/USD'], now = Date.now();
+    return Array.from({length: n}, (_, i) => {
+        const pair = pairs[i % pairs.length], rate = pair.includes('JPY') ? 148.5 : 1.085;
+        return {trade_id: 'BENCH' + String(i).padStart(6, '0'), timestamp: now - i * 60000, trader: 'Bench', pair, side: i % 2 ? 'SELL' : 'BUY',
+                amount: 1000000 + i, entry_rate: rate, current_rate: rate, pnl: 0, pips: 0, counterparty: 'HSBC', status: i % 5 ? 'open' : 'closed'};
+    });
+}
+
+async function runRenderBench(sizes, frames) {
+    // /bench?rows=1000,10000,100000&frames=120 - synthetic blotter, a tenth of the open rows repriced and
+    // the table scrolled a few rows per frame, no server traffic. Update time includes the worker round trip
+    const nextFrame = () => new Promise(r => requestAnimationFrame(r));
+    const pct = (a, p) => a.slice().sort((x, y) => x - y)[Math.min(a.length - 1, Math.floor(a.length * p))].toFixed(2);
+    const results = [];
+    for (const n of sizes) {
+        applyTradeDelta({full: true, trades: benchTrades(n), deleted: [], seq: 0});
+        let t0 = performance.now();
+        renderTrades(allTrades);
+        await viewSettled();
+        const build = performance.now() - t0;
+        await nextFrame();
+        const script = [], frame = [], wrapper = document.getElementById('table-wrapper');
+        wrapper.scrollTop = 0;
+        let last = performance.now();
+        for (let f = 0; f < frames; f++) {
+            t0 = performance.now();
+            wrapper.scrollTop += 3 * rowHeight;
+            const moved = [];
+            for (let k = 0; k < n / 10; k++) {
+                const old = allTrades[Math.floor(Math.random() * n)];
+                if (old.status !== 'open') continue;
+                const rate = +(old.entry_rate * (1 + (Math.random() - 0.5) * 0.002)).toFixed(5);
+                const move = (rate - old.entry_rate) * (old.side === 'BUY' ? 1 : -1);
+                moved.push(Object.assign({}, old, {current_rate: rate, pnl: move * old.amount, pips: Math.round(move / pipSize(old.pair) * 10) / 10}));
+            }
+            applyTradeDelta({full: false, trades: moved, deleted: [], seq: 0});
+            renderTrades(allTrades);
+            await viewSettled();
+            script.push(performance.now() - t0);
+            await nextFrame();
+            const now = performance.now();
+            frame.push(now - last);
+            last = now;
+        }
+        results.push({rows: n, build_ms: build.toFixed(1), update_p50_ms: pct(script, 0.5), update_p95_ms: pct(script, 0.95), frame_p50_ms: pct(frame, 0.5), frame_p95_ms: pct(frame, 0.95)});
+    }
+    console.table(results);
+    window.benchResults = results;
+    document.getElementById('status').textContent = 'Render bench: ' + results.map(r => `${r.rows} rows ${r.frame_p50_ms}/${r.frame_p95_ms} ms frame p50/p95`).join(' • ');
+}
+
+let firstRowsSent = false;
+
+function reportTiming(event, ms) {
+    // Page-relative ms; the server adds the gap between its own start and this page's navigation
+    fetch('/api/timing', {method: 'POST', headers: {'Content-Type': 'application/json'},
+                          body: JSON.stringify({event, ms, time_origin: performance.timeOrigin})}).catch(() => {});
+}
+
+function watchFirstPaint() {
+    if (!window.PerformanceObserver) return;
+    try {
+        new PerformanceObserver((list, observer) => list.getEntries().forEach(e => {
+            if (e.name === 'first-contentful-paint') { reportTiming('first_paint', e.startTime); observer.disconnect(); }
+        })).observe({type: 'paint', buffered: true});
+    } catch (e) {}
+}
 
-shared_db = SharedDatabase(Config.DATABASE_FILE)
+function loadConfig() {
+    fetch('/api/config').then(r => r.json()).then(d => { pipSizes = d.pip_sizes || {}; }).catch(() => {});
+}
 
-# ============================================================================
-# FLASK APP
-# ============================================================================
+watchFirstPaint();
+startViewWorker();
+loadConfig();
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'fx-tracker'
-tracker_instance = None
-webview_window = None  # For fullscreen
+if (location.pathname === '/bench') {
+    const q = new URLSearchParams(location.search);
+    runRenderBench((q.get('rows') || '1000,10000,100000').split(',').map(Number), Number(q.get('frames')) || 120);
+} else {
+    updateStatus();
+    updateTrades();
+    updateSummary();
+    startPush();
+    setInterval(updateStatus, 5000);
+    setInterval(() => { if (!pushConnected) updateTrades(); }, 1000);
+    setInterval(updateTrades, 15000);  // safety resync while pushed
+}
+"""
 
-HTML_TEMPLATE = """<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>FX Trade Tracker</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        html, body { height: 100%; overflow: hidden; }
-        body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 15px; display: flex; flex-direction: column; }
-        .header { background: white; padding: 18px 25px; border-radius: 12px; margin-bottom: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.15); flex-shrink: 0; }
-        .header h1 { color: #2d3748; font-size: 24px; margin-bottom: 5px; font-weight: 700; }
-        .subtitle { color: #718096; font-size: 12px; margin-bottom: 10px; }
-        .connection-badge { display: inline-block; padding: 4px 10px; border-radius: 5px; font-size: 11px; font-weight: 600; background: #fef5e7; color: #f39c12; margin-bottom: 10px; }
-        .controls { display: flex; gap: 8px; margin-bottom: 10px; flex-wrap: wrap; align-items: center; }
-        .filter-btn, .action-btn { padding: 7px 14px; border: none; border-radius: 6px; font-size: 12px; font-weight: 600; cursor: pointer; transition: all 0.15s; }
-        .filter-btn.active { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; }
-        .filter-btn:not(.active) { background: #edf2f7; color: #4a5568; }
-        .action-btn { background: #48bb78; color: white; }
-        .action-btn.calc { background: #ed8936; }
-        .action-btn.fullscreen { background: #4299e1; }
-        .filter-btn:hover, .action-btn:hover { transform: translateY(-1px); }
-        .search-box { padding: 7px 12px; border: 2px solid #e2e8f0; border-radius: 6px; font-size: 12px; width: 250px; }
-        .search-box:focus { outline: none; border-color: #667eea; }
-        .toggle-advanced { background: #edf2f7; color: #4a5568; font-size: 11px; padding: 5px 10px; border: none; border-radius: 4px; cursor: pointer; }
-        .advanced-search { background: #f7fafc; padding: 10px; border-radius: 6px; margin-bottom: 10px; display: none; }
-        .advanced-search.active { display: block; }
-        .filter-group { display: flex; gap: 12px; flex-wrap: wrap; align-items: center; font-size: 12px; }
-        .filter-group label { display: flex; align-items: center; gap: 4px; cursor: pointer; }
-        .stats-grid { display: grid; grid-template-columns: repeat(5, 1fr); gap: 10px; margin-bottom: 10px; }
-        .stat-card { background: linear-gradient(135deg, #f7fafc 0%, #edf2f7 100%); padding: 10px 12px; border-radius: 6px; border-left: 3px solid #667eea; }
-        .stat-label { font-size: 9px; color: #718096; text-transform: uppercase; font-weight: 600; margin-bottom: 3px; }
-        .stat-value { font-size: 18px; font-weight: 700; color: #2d3748; }
-        .trades-table-container { background: white; border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.15); flex: 1; display: flex; flex-direction: column; overflow: hidden; min-height: 0; }
-        .table-wrapper { flex: 1; overflow: auto; }
-        table { width: 100%; border-collapse: collapse; }
-        thead { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); position: sticky; top: 0; z-index: 10; }
-        th { padding: 10px; text-align: left; color: white; font-weight: 600; font-size: 11px; text-transform: uppercase; cursor: pointer; user-select: none; white-space: nowrap; }
-        th:hover { background: rgba(255,255,255,0.1); }
-        th.sortable::after { content: ' ⇅'; opacity: 0.5; }
-        th.sort-asc::after { content: ' ↑'; opacity: 1; }
-        th.sort-desc::after { content: ' ↓'; opacity: 1; }
-        tbody tr:hover { background: #f7fafc; }
-        td { padding: 8px 10px; border-bottom: 1px solid #e2e8f0; font-size: 12px; white-space: nowrap; }
-        .trade-id { font-family: 'Courier New', monospace; font-weight: 700; color: #667eea; background: #edf2f7; padding: 2px 6px; border-radius: 3px; font-size: 11px; }
-        .side-buy { background: #c6f6d5; color: #22543d; padding: 3px 8px; border-radius: 4px; font-weight: 700; font-size: 10px; }
-        .side-sell { background: #fed7d7; color: #742a2a; padding: 3px 8px; border-radius: 4px; font-weight: 700; font-size: 10px; }
-        .status-open { background: #fef5e7; color: #f39c12; padding: 3px 8px; border-radius: 4px; font-weight: 700; font-size: 9px; }
-        .status-closed { background: #d5f4e6; color: #27ae60; padding: 3px 8px; border-radius: 4px; font-weight: 700; font-size: 9px; }
-        .pnl-positive { color: #48bb78; font-weight: 700; }
-        .pnl-negative { color: #f56565; font-weight: 700; }
-        .trader-badge, .bank-badge { background: #edf2f7; padding: 2px 7px; border-radius: 3px; font-size: 11px; font-weight: 600; color: #4a5568; }
-        .rate-display { font-family: 'Courier New', monospace; font-weight: 600; }
-        .edit-btn, .delete-btn { padding: 3px 7px; border: none; border-radius: 3px; font-size: 10px; font-weight: 600; cursor: pointer; margin-right: 3px; }
-        .edit-btn { background: #4299e1; color: white; }
-        .delete-btn { background: #fc8181; color: white; }
-        
-        .modal { display: none; position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0,0,0,0.75); z-index: 1000; justify-content: center; align-items: center; }
-        .modal.active { display: flex; }
-        .modal-content { background: white; padding: 25px; border-radius: 12px; max-width: 600px; width: 90%; max-height: 90vh; overflow-y: auto; }
-        .modal-header { font-size: 20px; font-weight: 700; color: #2d3748; margin-bottom: 15px; }
-        .form-group { margin-bottom: 12px; }
-        .form-label { display: block; font-size: 12px; font-weight: 600; color: #4a5568; margin-bottom: 4px; }
-        .form-input, .form-select { width: 100%; padding: 8px; border: 2px solid #e2e8f0; border-radius: 5px; font-size: 13px; }
-        .form-input:focus, .form-select:focus { outline: none; border-color: #667eea; }
-        .form-actions { display: flex; gap: 8px; margin-top: 15px; }
-        .btn-primary, .btn-secondary { flex: 1; padding: 10px; border: none; border-radius: 6px; font-size: 13px; font-weight: 600; cursor: pointer; }
-        .btn-primary { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; }
-        .btn-secondary { background: #e2e8f0; color: #4a5568; }
-        
-        .calc-grid { display: grid; grid-template-columns: 1fr 1fr; gap: 12px; margin-bottom: 15px; }
-        .calc-result { background: #f7fafc; padding: 15px; border-radius: 8px; border-left: 4px solid #667eea; }
-        .calc-result-label { font-size: 11px; color: #718096; margin-bottom: 5px; font-weight: 600; }
-        .calc-result-value { font-size: 24px; font-weight: 700; color: #2d3748; }
-    </style>
-</head>
-<body>
-    <div class="header">
+# Page markup; the <head> and asset tags are added when the shell is built
+DASHBOARD_BODY = """    <div class="header">
         <h1>📊 FX Trade Tracker</h1>
         <div class="subtitle">Team Dashboard • Full Featured • Network Shared Database</div>
         <div class="connection-badge" id="status">Loading...</div>
@@ -472,7 +2560,7 @@ HTML_TEMPLATE = """<!DOCTYPE html>
     </div>
     
     <div class="trades-table-container">
-        <div class="table-wrapper">
+        <div class="table-wrapper" id="table-wrapper">
             <table>
                 <thead>
                     <tr>
@@ -621,322 +2709,304 @@ HTML_TEMPLATE = """<!DOCTYPE html>
             </div>
         </div>
     </div>
+"""
 
-    <script>
-        let allTrades = [], currentFilter = 'all', searchQuery = '', sortColumn = 'timestamp', sortDirection = 'desc';
-        let selectedPairs = [], selectedSides = [];
-        
-        function toggleFullscreen() {
-            fetch('/api/fullscreen', {method: 'POST'});
-        }
-        
-        function toggleAdvanced() { document.getElementById('advanced').classList.toggle('active'); }
-        
-        function updateFilters() {
-            selectedPairs = Array.from(document.querySelectorAll('#advanced input[type="checkbox"]:not(.side-filter):checked')).map(cb => cb.value);
-            selectedSides = Array.from(document.querySelectorAll('#advanced input.side-filter:checked')).map(cb => cb.value);
-            renderTrades(allTrades);
-        }
-        
-        function clearFilters() {
-            document.querySelectorAll('#advanced input[type="checkbox"]').forEach(cb => cb.checked = false);
-            selectedPairs = []; selectedSides = [];
-            renderTrades(allTrades);
-        }
-        
-        function filterTrades(f) {
-            currentFilter = f;
-            document.querySelectorAll('.filter-btn').forEach(b => b.classList.remove('active'));
-            document.getElementById('btn-' + f).classList.add('active');
-            renderTrades(allTrades);
-        }
-        
-        function searchTrades() {
-            searchQuery = document.getElementById('search-box').value.toLowerCase().trim();
-            renderTrades(allTrades);
-        }
-        
-        function sortTable(c) {
-            sortColumn === c ? (sortDirection = sortDirection === 'asc' ? 'desc' : 'asc') : (sortColumn = c, sortDirection = 'desc');
-            document.querySelectorAll('th').forEach(th => th.classList.remove('sort-asc', 'sort-desc'));
-            event.target.classList.add('sort-' + sortDirection);
-            renderTrades(allTrades);
-        }
-        
-        function calculatePips(pair, entry, current, side) {
-            if (!entry || !current || !pair) return 0;
-            
-            let pipValue = 0.0001; // Standard pip
-            if (pair.includes('JPY')) pipValue = 0.01; // JPY pairs use 0.01
-            
-            let pips = (current - entry) / pipValue;
-            if (side === 'SELL') pips = -pips;
-            
-            return Math.round(pips * 10) / 10; // Round to 1 decimal
-        }
-        
-        function getSortValue(t, c) {
-            if (c === 'pips') {
-                return calculatePips(t.pair, t.entry_rate, t.current_rate, t.side);
-            }
-            const v = {trade_id: t.trade_id, timestamp: new Date(t.timestamp).getTime(), trader: t.trader || '', pair: t.pair, side: t.side, amount: parseFloat(t.amount), entry_rate: parseFloat(t.entry_rate), current_rate: parseFloat(t.current_rate) || 0, pnl: parseFloat(t.pnl) || 0, counterparty: t.counterparty || '', status: t.status};
-            return v[c] !== undefined ? v[c] : '';
-        }
-        
-        function matchesFilters(t) {
-            if (currentFilter === 'open' && t.status !== 'open') return false;
-            if (currentFilter === 'closed' && t.status !== 'closed') return false;
-            if (searchQuery && !`${t.trade_id} ${t.pair} ${t.trader} ${t.counterparty || ''} ${t.side}`.toLowerCase().includes(searchQuery)) return false;
-            if (selectedPairs.length && !selectedPairs.includes(t.pair)) return false;
-            if (selectedSides.length && !selectedSides.includes(t.side)) return false;
-            return true;
-        }
-        
-        function renderTrades(trades) {
-            const tbody = document.getElementById('tbody');
-            let filtered = trades.filter(matchesFilters);
-            
-            filtered.sort((a, b) => {
-                const aVal = getSortValue(a, sortColumn), bVal = getSortValue(b, sortColumn);
-                return aVal < bVal ? (sortDirection === 'asc' ? -1 : 1) : aVal > bVal ? (sortDirection === 'asc' ? 1 : -1) : 0;
-            });
-            
-            document.getElementById('count-total').textContent = trades.length;
-            document.getElementById('count-open').textContent = trades.filter(t => t.status === 'open').length;
-            document.getElementById('count-closed').textContent = trades.filter(t => t.status === 'closed').length;
-            document.getElementById('last-update').textContent = new Date().toLocaleTimeString();
-            
-            const totalPnL = trades.reduce((s, t) => s + (parseFloat(t.pnl) || 0), 0);
-            const pnlEl = document.getElementById('total-pnl');
-            pnlEl.textContent = (totalPnL >= 0 ? '+' : '') + '$' + Math.abs(totalPnL).toLocaleString('en-US', {minimumFractionDigits: 2});
-            pnlEl.style.color = totalPnL >= 0 ? '#48bb78' : '#f56565';
-            
-            tbody.innerHTML = '';
-            if (!filtered.length) {
-                tbody.innerHTML = `<tr><td colspan="13" style="text-align: center; padding: 40px; color: #a0aec0;">No matches</td></tr>`;
-                return;
-            }
-            
-            window.filteredTrades = filtered;
-            filtered.forEach((t, i) => {
-                const pnl = parseFloat(t.pnl) || 0;
-                const pips = calculatePips(t.pair, t.entry_rate, t.current_rate, t.side);
-                const time = new Date(t.timestamp).toLocaleString('en-US', {month:'short', day:'numeric', hour:'2-digit', minute:'2-digit'});
-                
-                tbody.insertRow().innerHTML = `
-                    <td><span class="trade-id">${t.trade_id}</span></td>
-                    <td>${time}</td>
-                    <td><span class="trader-badge">${t.trader || 'Unknown'}</span></td>
-                    <td>${t.pair}</td>
-                    <td><span class="side-${t.side.toLowerCase()}">${t.side}</span></td>
-                    <td>${t.amount.toLocaleString('en-US', {maximumFractionDigits: 0})}</td>
-                    <td class="rate-display">${t.entry_rate.toFixed(4)}</td>
-                    <td class="rate-display">${t.current_rate ? t.current_rate.toFixed(4) : '--'}</td>
-                    <td class="${pnl >= 0 ? 'pnl-positive' : 'pnl-negative'}">${pnl >= 0 ? '+' : ''}$${Math.abs(pnl).toLocaleString('en-US', {minimumFractionDigits: 2})}</td>
-                    <td class="${pips >= 0 ? 'pnl-positive' : 'pnl-negative'}">${pips >= 0 ? '+' : ''}${pips.toFixed(1)}</td>
-                    <td><span class="bank-badge">${t.counterparty || 'N/A'}</span></td>
-                    <td><span class="status-${t.status}">${t.status.toUpperCase()}</span></td>
-                    <td><button class="edit-btn" onclick="editTrade(${i})">Edit</button><button class="delete-btn" onclick="deleteTrade('${t.trade_id}')">Del</button></td>
-                `;
-            });
-        }
-        
-        function openAddModal() {
-            document.getElementById('modal-title').textContent = 'Add New Trade';
-            document.getElementById('trade-form').reset();
-            document.getElementById('trade-id').value = 'FX' + new Date().toISOString().slice(0,10).replace(/-/g,'') + Math.floor(Math.random()*1000).toString().padStart(3,'0');
-            document.getElementById('trade-id').readOnly = false;
-            document.getElementById('trade-modal').classList.add('active');
-        }
-        
-        function editTrade(i) {
-            const t = window.filteredTrades[i];
-            if (!t) return;
-            document.getElementById('modal-title').textContent = `Edit: ${t.trade_id}`;
-            document.getElementById('trade-id').value = t.trade_id;
-            document.getElementById('trade-id').readOnly = false;
-            document.getElementById('pair').value = t.pair;
-            document.getElementById('side').value = t.side;
-            document.getElementById('amount').value = t.amount;
-            document.getElementById('rate').value = t.entry_rate;
-            document.getElementById('trader').value = t.trader || '';
-            document.getElementById('counterparty').value = t.counterparty || '';
-            document.getElementById('status').value = t.status;
-            document.getElementById('trade-modal').classList.add('active');
-        }
-        
-        function openCalcModal() {
-            // Reset all fields when opening
-            document.getElementById('calc-trade-ref').value = '';
-            document.getElementById('calc-pair').value = '';
-            document.getElementById('calc-side').value = '';
-            document.getElementById('calc-amount').value = '';
-            document.getElementById('calc-entry').value = '';
-            document.getElementById('calc-exit').value = '';
-            document.getElementById('calc-pnl-result').textContent = '$0.00';
-            document.getElementById('calc-pnl-result').style.color = '#2d3748';
-            document.getElementById('calc-pips-result').textContent = '0.0';
-            document.getElementById('calc-pips-result').style.color = '#2d3748';
-            
-            // Populate trade dropdown
-            const sel = document.getElementById('calc-trade-ref');
-            sel.innerHTML = '<option value="">-- New Calculation --</option>';
-            allTrades.filter(t => t.status === 'open').forEach(t => {
-                sel.innerHTML += `<option value="${t.trade_id}">${t.trade_id} - ${t.pair} ${t.side} ${t.amount.toLocaleString()}</option>`;
-            });
-            document.getElementById('calc-modal').classList.add('active');
-        }
-        
-        function loadTradeToCalc() {
-            const id = document.getElementById('calc-trade-ref').value;
-            if (!id) {
-                document.getElementById('calc-pair').value = '';
-                document.getElementById('calc-side').value = '';
-                document.getElementById('calc-amount').value = '';
-                document.getElementById('calc-entry').value = '';
-                document.getElementById('calc-exit').value = '';
-                calculatePnL();
-                return;
-            }
-            
-            const trade = allTrades.find(t => t.trade_id === id);
-            if (trade) {
-                document.getElementById('calc-pair').value = trade.pair;
-                document.getElementById('calc-side').value = trade.side;
-                document.getElementById('calc-amount').value = trade.amount;
-                document.getElementById('calc-entry').value = trade.entry_rate;
-                document.getElementById('calc-exit').value = trade.current_rate || '';
-                calculatePnL();
-            }
-        }
-        
-        function calculatePnL() {
-            const pair = document.getElementById('calc-pair').value;
-            const side = document.getElementById('calc-side').value;
-            const amount = parseFloat(document.getElementById('calc-amount').value) || 0;
-            const entry = parseFloat(document.getElementById('calc-entry').value) || 0;
-            const exit = parseFloat(document.getElementById('calc-exit').value) || 0;
-            
-            if (!pair || !side || !amount || !entry || !exit) {
-                document.getElementById('calc-pnl-result').textContent = '$0.00';
-                document.getElementById('calc-pips-result').textContent = '0.0';
-                return;
-            }
-            
-            // Calculate P&L
-            let pnl = 0;
-            if (side === 'BUY') {
-                pnl = (exit - entry) * amount;
-            } else {
-                pnl = (entry - exit) * amount;
-            }
-            
-            // Calculate Pips
-            const pips = calculatePips(pair, entry, exit, side);
-            
-            // Display
-            const pnlEl = document.getElementById('calc-pnl-result');
-            pnlEl.textContent = (pnl >= 0 ? '+' : '') + '$' + Math.abs(pnl).toLocaleString('en-US', {minimumFractionDigits: 2});
-            pnlEl.style.color = pnl >= 0 ? '#48bb78' : '#f56565';
-            
-            const pipsEl = document.getElementById('calc-pips-result');
-            pipsEl.textContent = (pips >= 0 ? '+' : '') + pips.toFixed(1);
-            pipsEl.style.color = pips >= 0 ? '#48bb78' : '#f56565';
-        }
-        
-        function closeModal(id) {
-            document.getElementById(id).classList.remove('active');
-        }
-        
-        function saveTrade(e) {
-            e.preventDefault();
-            const pair = document.getElementById('pair').value;
-            const currencies = pair.split('/');
-            
-            const data = {
-                trade_id: document.getElementById('trade-id').value.trim(),
-                timestamp: new Date().toISOString(),
-                currency_pair: pair,
-                base_currency: currencies[0],
-                quote_currency: currencies[1] || '',
-                side: document.getElementById('side').value,
-                notional_amount: parseFloat(document.getElementById('amount').value),
-                execution_rate: parseFloat(document.getElementById('rate').value),
-                trader_name: document.getElementById('trader').value.trim(),
-                counterparty: document.getElementById('counterparty').value.trim(),
-                status: document.getElementById('status').value,
-                value_date: new Date(Date.now() + 2*24*60*60*1000).toISOString().split('T')[0],
-                settlement_date: new Date(Date.now() + 2*24*60*60*1000).toISOString().split('T')[0]
-            };
-            
-            fetch('/api/trade', {method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(data)})
-            .then(r => r.json())
-            .then(d => { if (d.success) { closeModal('trade-modal'); setTimeout(updateTrades, 100); } else alert('Error: ' + (d.error || 'Unknown')); })
-            .catch(err => alert('Error: ' + err));
-        }
-        
-        function deleteTrade(id) {
-            if (!confirm(`Delete ${id}?`)) return;
-            fetch('/api/trade/' + id, {method: 'DELETE'})
-            .then(r => r.json())
-            .then(d => { if (d.success) setTimeout(updateTrades, 100); })
-            .catch(err => alert('Error'));
-        }
-        
-        function updateStatus() {
-            fetch('/api/status').then(r => r.json()).then(d => document.getElementById('status').textContent = d.status).catch(() => {});
-        }
-        
-        function updateTrades() {
-            fetch('/api/trades').then(r => r.json()).then(trades => { allTrades = trades; renderTrades(trades); }).catch(() => {});
-        }
-        
-        document.addEventListener('keydown', e => { 
-            if (e.key === 'Escape') { 
-                closeModal('trade-modal'); 
-                closeModal('calc-modal'); 
-            }
-            if (e.key === 'F11') {
-                e.preventDefault();
-                toggleFullscreen();
-            }
-        });
-        
-        updateStatus();
-        updateTrades();
-        setInterval(updateStatus, 5000);
-        setInterval(updateTrades, 1000);
-    </script>
+class StaticAsset:
+    """A response body built once at import: raw, gzip and (with brotli installed) br bytes,
+    served by content-hash ETag so an unchanged asset costs a 304 or nothing at all"""
+    
+    def __init__(self, name, text, mimetype):
+        self.body = text.encode('utf-8')
+        self.etag = hashlib.sha256(self.body).hexdigest()[:16]
+        root, ext = os.path.splitext(name)
+        self.url = f'/assets/{root}.{self.etag}{ext}'
+        self.mimetype = mimetype
+        self.encoded = {'gzip': gzip.compress(self.body, 9, mtime=0)}
+        if HAS_BROTLI:
+            self.encoded['br'] = brotli.compress(self.body, quality=11)
+    
+    def response(self, cache_control):
+        headers = {'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+        if request.if_none_match.contains(self.etag):
+            resp = Response(status=304, headers=headers)
+        else:
+            encoding = next((e for e in ('br', 'gzip') if e in self.encoded and request.accept_encodings[e]), None)
+            resp = Response(self.encoded[encoding] if encoding else self.body, mimetype=self.mimetype, headers=headers)
+            if encoding:
+                resp.headers['Content-Encoding'] = encoding
+        resp.set_etag(self.etag)
+        return resp
+
+dashboard_css = StaticAsset('dashboard.css', DASHBOARD_CSS, 'text/css')
+dashboard_worker = StaticAsset('view-worker.js', DASHBOARD_WORKER_JS, 'text/javascript')
+dashboard_js = StaticAsset('dashboard.js', DASHBOARD_JS, 'text/javascript')
+dashboard_shell = StaticAsset('index.html', f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>FX Trade Tracker</title>
+    <link rel="stylesheet" href="{dashboard_css.url}">
+</head>
+<body>
+{DASHBOARD_BODY}
+    <script src="{dashboard_js.url}" data-worker="{dashboard_worker.url}"></script>
 </body>
-</html>"""
+</html>""", 'text/html')
+STATIC_ASSETS = {asset.url: asset for asset in (dashboard_css, dashboard_worker, dashboard_js)}
+startup_timing = {}  # event -> ms from process start, as reported by the first page to get there
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    # Revalidated on every load (asset names change with their content), answered from the ETag
+    return dashboard_shell.response('no-cache')
+
+@app.route('/bench')
+def render_bench():
+    """Blotter render benchmark: /bench?rows=1000,10000,100000&frames=120, results in the status badge and console"""
+    return dashboard_shell.response('no-cache')
+
+@app.route('/assets/<name>')
+def static_asset(name):
+    asset = STATIC_ASSETS.get('/assets/' + name)
+    if not asset:
+        return jsonify({'error': 'not found'}), 404
+    return asset.response('public, max-age=31536000, immutable')
+
+@app.route('/api/timing', methods=['POST'])
+def api_timing():
+    """Page load milestones (first_paint, first_rows), turned into ms since this process started"""
+    try:
+        data = request.json
+        event = str(data['event'])
+        if event in ('first_paint', 'first_rows') and event not in startup_timing:
+            startup_timing[event] = round(float(data['time_origin']) + float(data['ms']) - STARTED_AT * 1000)
+        return jsonify({'success': True, 'startup': startup_timing})
+    except:
+        return jsonify({'success': False}), 400
+
+class ChangeBroadcaster:
+    """Pushes store deltas to streaming clients, coalesced to at most PUSH_MAX_FPS frames/s.
+    One change-feed query per frame serves every connected window."""
+    
+    def __init__(self, storage, max_fps=Config.PUSH_MAX_FPS):
+        self.storage = storage
+        self.max_fps = max_fps
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.seq = None
+        self.frames_sent = 0
+    
+    def notify(self):
+        """Called after writes; everything notified within one frame interval goes out as one frame"""
+        self.wake.set()
+    
+    def subscribe(self):
+        q = queue.Queue(maxsize=Config.PUSH_QUEUE_FRAMES)
+        with self.lock:
+            self.subscribers.add(q)
+            if not self.thread:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        return q
+    
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.discard(q)
+    
+    def _run(self):
+        while True:
+            # Writes from other desks on the share never call notify(), so wake up periodically too
+            self.wake.wait(Config.PUSH_IDLE_CHECK_SECONDS)
+            self.wake.clear()
+            try:
+                if self.subscribers:
+                    self.publish()
+            except:
+                pass
+            time.sleep(1.0 / self.max_fps)
+    
+    def publish(self):
+        if self.seq is None:
+            self.seq = self.storage.current_seq()
+            return
+        since = self.seq
+        seq, trades, deleted, full = self.storage.get_changes_since(since)
+        if seq == since:
+            return
+        self.seq = seq
+        frame = json.dumps({'since': since, 'seq': seq, 'full': full,
+                            'trades': [t.to_json() for t in trades], 'deleted': deleted})
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(frame)
+            except queue.Full:
+                pass  # the client sees a gap in since/seq and catches up with a delta poll
+        self.frames_sent += 1
+
+broadcaster = ChangeBroadcaster(shared_db)
+
+class TradeSummary:
+    """Blotter aggregates (totals, by status / pair / trader / counterparty) kept current from the change feed:
+    a refresh applies only the rows changed since the last one. P&L is held in integer cents, so removing a
+    trade's old contribution and adding its new one cancels exactly however long the process runs."""
+    
+    GROUPS = ('status', 'pair', 'trader', 'counterparty')
+    
+    def __init__(self, storage):
+        self.storage = storage
+        self.lock = threading.Lock()
+        self._reset()
+    
+    def _reset(self):
+        self.seq = 0
+        self.rows = {}  # trade_id -> (status, pair, trader, counterparty, pnl cents)
+        self.totals = self._bucket()
+        self.groups = {name: {} for name in self.GROUPS}
+    
+    @staticmethod
+    def _bucket():
+        return {'count': 0, 'open': 0, 'closed': 0, 'pnl': 0}
+    
+    @staticmethod
+    def _key(t):
+        pnl = t.unrealized_pnl if t.status == 'open' else t.realized_pnl
+        return (t.status, t.currency_pair, t.trader_name or '', t.counterparty or '', int(round((pnl or 0.0) * 100)))
+    
+    def _apply(self, key, sign):
+        status, cents = key[0], key[4]
+        for bucket in [self.totals] + [self.groups[name].setdefault(value, self._bucket())
+                                       for name, value in zip(self.GROUPS, key)]:
+            bucket['count'] += sign
+            if status in ('open', 'closed'):
+                bucket[status] += sign
+            bucket['pnl'] += sign * cents
+        for name, value in zip(self.GROUPS, key):
+            if not self.groups[name][value]['count']:
+                del self.groups[name][value]
+    
+    def refresh(self):
+        with self.lock:
+            seq, trades, deleted, full = self.storage.get_changes_since(self.seq)
+            if full:
+                self._reset()
+            for t in trades:
+                old = self.rows.pop(t.trade_id, None)
+                if old:
+                    self._apply(old, -1)
+                self.rows[t.trade_id] = key = self._key(t)
+                self._apply(key, 1)
+            for trade_id in deleted:
+                old = self.rows.pop(trade_id, None)
+                if old:
+                    self._apply(old, -1)
+            self.seq = seq
+    
+    def snapshot(self, groups=()):
+        export = lambda b: dict(b, pnl=b['pnl'] / 100)
+        with self.lock:
+            out = {'seq': self.seq, 'totals': export(self.totals)}
+            for name in groups:
+                if name in self.groups:
+                    out['by_' + name] = {value: export(b) for value, b in self.groups[name].items()}
+        return out
+
+summary = TradeSummary(shared_db)
+
+BLOTTER_QUERY_ARGS = ('status', 'pair', 'side', 'trader', 'counterparty', 'q', 'sort', 'dir', 'limit', 'offset', 'from', 'to')
+
+def _list_arg(name):
+    # ?pair=EUR/USD&pair=USD/JPY or ?pair=EUR/USD,USD/JPY
+    return [v for arg in request.args.getlist(name) for v in arg.split(',') if v]
+
+def _blotter_query(archive=False):
+    try:
+        limit = min(max(request.args.get('limit', Config.QUERY_DEFAULT_LIMIT, type=int), 0), Config.QUERY_MAX_LIMIT)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        status = request.args.get('status', '').lower()
+        total, trades = shared_db.query_trades(
+            status=status if status in ('open', 'closed') else None,
+            pairs=_list_arg('pair'), sides=[s.upper() for s in _list_arg('side')],
+            trader=request.args.get('trader'), counterparty=request.args.get('counterparty'),
+            search=request.args.get('q', '').strip(), sort=request.args.get('sort', 'timestamp'),
+            direction=request.args.get('dir', 'desc'), limit=limit, offset=offset,
+            start_ms=epoch_ms(request.args.get('from')), end_ms=epoch_ms(request.args.get('to')), archive=archive)
+        return jsonify({'total': total, 'limit': limit, 'offset': offset, 'trades': [t.to_json() for t in trades]})
+    except Exception as e:
+        return jsonify({'total': 0, 'trades': [], 'error': str(e)}), 400
 
 @app.route('/api/trades')
 def api_get_trades():
+    if any(arg in request.args for arg in BLOTTER_QUERY_ARGS):
+        return _blotter_query()
+    since = request.args.get('since', type=int)
+    if since is not None:
+        # Delta mode: only rows changed after `since`; a full snapshot when since=0 or the store was reset
+        try:
+            seq, trades, deleted, full = shared_db.get_changes_since(since)
+            return jsonify({'seq': seq, 'full': full, 'trades': [t.to_json() for t in trades], 'deleted': deleted})
+        except:
+            return jsonify({'seq': since, 'full': False, 'trades': [], 'deleted': []})
     try:
-        trades = shared_db.get_all_trades()
-        return jsonify([{
-            'trade_id': str(t.get('trade_id', '')),
-            'timestamp': str(t.get('timestamp', '')),
-            'pair': str(t.get('currency_pair', '')),
-            'side': str(t.get('side', '')),
-            'amount': float(t.get('notional_amount', 0)),
-            'entry_rate': float(t.get('execution_rate', 0)),
-            'current_rate': float(t.get('current_market_rate')) if t.get('current_market_rate') else None,
-            'pnl': float(t.get('unrealized_pnl', 0)) if t.get('status') == 'open' else float(t.get('realized_pnl', 0)) if t.get('realized_pnl') else 0.0,
-            'status': str(t.get('status', 'open')),
-            'trader': str(t.get('trader_name', '')),
-            'counterparty': str(t.get('counterparty', ''))
-        } for t in trades])
+        return jsonify([t.to_json() for t in shared_db.get_all_trades()])
     except:
         return jsonify([])
 
+@app.route('/api/summary')
+def api_summary():
+    """Totals for the stats cards; ?by=pair,trader (status, pair, trader, counterparty) adds breakdowns"""
+    try:
+        summary.refresh()
+    except:
+        pass
+    return jsonify(summary.snapshot(_list_arg('by')))
+
+@app.route('/api/archive')
+def api_archive():
+    """Closed trades past the archive horizon; same filters as /api/trades, plus from/to (epoch ms or ISO)"""
+    return _blotter_query(archive=True)
+
+@app.route('/api/stream')
+def api_stream():
+    q = broadcaster.subscribe()
+    def stream():
+        try:
+            yield 'retry: 2000\n\n'
+            while True:
+                try:
+                    frame = q.get(timeout=Config.PUSH_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'data: {frame}\n\n'
+        finally:
+            broadcaster.unsubscribe(q)
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/status')
 def api_status():
-    return jsonify({'status': tracker_instance.bloomberg.get_connection_status() if tracker_instance else 'Starting...'})
+    if not tracker_instance:
+        return jsonify({'status': 'Starting...'})
+    return jsonify({'status': tracker_instance.bloomberg.get_connection_status(),
+                    'last_reprice': tracker_instance.last_reprice,
+                    'quotes': rate_cache.quotes(),
+                    'market_data': dict(tracker_instance.ticks.get_stats(), mode=Config.MARKET_DATA_MODE),
+                    'ingest': tracker_instance.ingest.get_stats(),
+                    'startup': startup_timing,
+                    'storage': {k: shared_db.profile[k] for k in ('journal_mode', 'reason', 'synchronous')}})
+
+@app.route('/api/config')
+def api_config():
+    """Static lookups the page needs; the P&L calculator takes its pip sizes from here"""
+    return jsonify({'pip_sizes': {pair: pip_size(pair) for pair in sorted(set(Config.PIP_SIZES) | set(Config.STREAM_PAIRS))}})
+
+@app.route('/api/db_stats')
+def api_db_stats():
+    return jsonify(shared_db.get_stats())
 
 @app.route('/api/trade', methods=['POST'])
 def api_add_trade():
@@ -945,8 +3015,9 @@ def api_add_trade():
         trade = scrub_trade_details(data)
         
         if trade and shared_db.save_trade(trade):
-            if tracker_instance and trade['trade_id'] not in tracker_instance.tracked_trades:
-                tracker_instance.tracked_trades.add(trade['trade_id'])
+            if tracker_instance:
+                tracker_instance.track_trade(trade)
+            broadcaster.notify()
             return jsonify({'success': True})
         return jsonify({'success': False, 'error': 'Invalid'}), 400
     except Exception as e:
@@ -956,8 +3027,9 @@ def api_add_trade():
 def api_delete_trade(trade_id):
     try:
         if shared_db.delete_trade(trade_id):
-            if tracker_instance and trade_id in tracker_instance.tracked_trades:
-                tracker_instance.tracked_trades.discard(trade_id)
+            if tracker_instance:
+                tracker_instance.forget_trade(trade_id)
+            broadcaster.notify()
             return jsonify({'success': True})
         return jsonify({'success': False}), 404
     except:
@@ -970,63 +3042,474 @@ def api_fullscreen():
         webview_window.toggle_fullscreen()
     return jsonify({'success': True})
 
+# ============================================================================
+# P&L ENGINE
+# ============================================================================
+
+def pip_size(pair):
+    return Config.PIP_SIZES.get(pair) or (0.01 if 'JPY' in pair else 0.0001)
+
+def calculate_pips(pair, side, entry, current):
+    """Signed pip move of a position, 1 dp; None until it has a mark"""
+    try:
+        if not current: return None
+        move = (float(current) - float(entry)) / pip_size(pair)
+        return round(-move if side == 'SELL' else move, 1)
+    except:
+        return None
+
+class PositionBook:
+    """Open book as NumPy arrays; the whole book reprices in one vectorized pass
+    from a per-pair rate vector. Kept alive and patched in place as trades open, close or go."""
+    
+    COLUMNS = ('pair_idx', 'entry', 'notional', 'sign', 'stored_rate', 'stored_pnl')
+    
+    def __init__(self):
+        self.lock = threading.Lock()      # held by whoever patches or reprices the arrays
+        self.load([])
+    
+    def load(self, trades):
+        self.trade_ids = []
+        self.row = {}                     # trade_id -> array index
+        self.pair_rows = {}               # index into self.pairs -> set of array indexes holding it
+        self.pair_arrays = {}             # the same as index arrays, rebuilt only after a pair's rows change
+        self.pairs = []
+        self.pip_sizes = np.empty(0, dtype=np.float64)
+        for name, column in self._columns([]).items():
+            setattr(self, name, column)
+        self.apply(trades)
+    
+    def _columns(self, trades):
+        index = {pair: i for i, pair in enumerate(self.pairs)}
+        n = len(trades)
+        return {
+            'pair_idx': np.fromiter((index[t.currency_pair] for t in trades), dtype=np.int32, count=n),
+            'entry': np.fromiter((float(t.execution_rate) for t in trades), dtype=np.float64, count=n),
+            'notional': np.fromiter((float(t.notional_amount) for t in trades), dtype=np.float64, count=n),
+            'sign': np.fromiter((1.0 if t.side == 'BUY' else -1.0 for t in trades), dtype=np.float64, count=n),
+            'stored_rate': np.fromiter((t.current_market_rate if t.current_market_rate is not None else np.nan
+                                        for t in trades), dtype=np.float64, count=n),
+            'stored_pnl': np.fromiter((t.unrealized_pnl if t.unrealized_pnl is not None else np.nan
+                                       for t in trades), dtype=np.float64, count=n),
+        }
+    
+    def apply(self, trades=(), removed_ids=()):
+        """Open trades are added (or rewritten if already held); closed trades and removed_ids are
+        dropped. Pairs are only ever appended, so pair_idx stays valid."""
+        incoming = {t.trade_id: t for t in trades if t}
+        gone = set(removed_ids) | set(tid for tid, t in incoming.items() if t.status != 'open')
+        incoming = {tid: t for tid, t in incoming.items() if t.status == 'open'}
+        amended = incoming.keys() & self.row.keys()
+        # Amends are a drop and re-add: one removal pass and one append per batch
+        for trade_id in gone & self.row.keys() | amended:
+            self._remove(trade_id)
+        n = len(self.trade_ids)
+        if n < len(self.entry):
+            for name in self.COLUMNS:
+                setattr(self, name, getattr(self, name)[:n])
+        if incoming:
+            fresh = list(incoming.values())
+            new_pairs = sorted(set(t.currency_pair for t in fresh) - set(self.pairs))
+            if new_pairs:
+                self.pairs += new_pairs
+                self.pip_sizes = np.append(self.pip_sizes, [pip_size(pair) for pair in new_pairs])
+            self.row.update((t.trade_id, n + k) for k, t in enumerate(fresh))
+            self.trade_ids += [t.trade_id for t in fresh]
+            columns = self._columns(fresh)
+            for k, p in enumerate(columns['pair_idx'].tolist()):
+                self.pair_rows.setdefault(p, set()).add(n + k)
+                self.pair_arrays.pop(p, None)
+            for name, column in columns.items():
+                setattr(self, name, np.concatenate((getattr(self, name), column)))
+        # An amended trade's stored mark was priced on its old terms: forget it so the next pass rewrites the row
+        for trade_id in amended:
+            self.stored_rate[self.row[trade_id]] = np.nan
+    
+    def differs(self, trade_id, pair, side, notional, entry):
+        """Whether a held trade's terms no longer match (pair, side, notional, entry) from the store"""
+        i = self.row[trade_id]
+        return (self.pairs[self.pair_idx[i]] != pair or self.sign[i] != (1.0 if side == 'BUY' else -1.0)
+                or self.notional[i] != float(notional) or self.entry[i] != float(entry))
+    
+    def _remove(self, trade_id):
+        # Swap the last row into the hole; apply() trims the tails once per batch
+        i, last = self.row.pop(trade_id), len(self.trade_ids) - 1
+        p = int(self.pair_idx[i])
+        self.pair_rows[p].discard(i)
+        self.pair_arrays.pop(p, None)
+        if i != last:
+            moved = self.trade_ids[i] = self.trade_ids[last]
+            self.row[moved] = i
+            p = int(self.pair_idx[last])
+            self.pair_rows[p].discard(last)
+            self.pair_rows[p].add(i)
+            self.pair_arrays.pop(p, None)
+            for name in self.COLUMNS:
+                column = getattr(self, name)
+                column[i] = column[last]
+        self.trade_ids.pop()
+    
+    def __len__(self):
+        return len(self.trade_ids)
+    
+    def held_pairs(self):
+        """Pairs with at least one position (self.pairs also keeps pairs that have gone flat)"""
+        return [self.pairs[i] for i in np.unique(self.pair_idx)]
+    
+    def rows_for(self, pairs):
+        """Array indexes of the positions in pairs, without touching the rest of the book"""
+        index = {pair: i for i, pair in enumerate(self.pairs)}
+        arrays = []
+        for p in (index[pair] for pair in pairs if pair in index):
+            if p not in self.pair_arrays:
+                rows = self.pair_rows.get(p, ())
+                self.pair_arrays[p] = np.fromiter(rows, dtype=np.intp, count=len(rows))
+            arrays.append(self.pair_arrays[p])
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.intp)
+    
+    def reprice(self, pair_rates, rows=None):
+        """pair_rates[i] is the rate for self.pairs[i] (NaN = no quote); rows (from rows_for) limits the
+        pass to those positions. Returns (rates, pnl, pips), aligned with rows if given."""
+        pick = (lambda column: column) if rows is None else (lambda column: column[rows])
+        pair_idx = pick(self.pair_idx)
+        rates = np.asarray(pair_rates, dtype=np.float64)[pair_idx]
+        move = (rates - pick(self.entry)) * pick(self.sign)
+        return rates, np.round(move * pick(self.notional), 2), np.round(move / self.pip_sizes[pair_idx], 1)
+    
+    def changed_marks(self, rates, pnl, pips, rows=None):
+        """(trade_id, rate, pnl, pips) for rows whose mark differs from the last one written"""
+        pick = (lambda column: column) if rows is None else (lambda column: column[rows])
+        quoted = ~np.isnan(rates)
+        moved = np.flatnonzero(quoted & ((rates != pick(self.stored_rate)) | (pnl != pick(self.stored_pnl))))
+        ids = self.trade_ids
+        at = moved if rows is None else rows[moved]
+        return [(ids[j], float(rates[i]), float(pnl[i]), float(pips[i])) for i, j in zip(moved, at)]
+    
+    def settle(self, marks):
+        """Marks written to the store become the baseline changed_marks diffs against"""
+        for trade_id, rate, pnl, pips in marks:
+            i = self.row.get(trade_id)
+            if i is not None:
+                self.stored_rate[i], self.stored_pnl[i] = rate, pnl
+
+# ============================================================================
+# TRADE INGESTION
+# ============================================================================
+
+class LatencyWindow:
+    """Recent latencies for percentiles, plus lifetime count and max"""
+    
+    def __init__(self, size=2048):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.max = 0.0
+        self.lock = threading.Lock()
+    
+    def record_many(self, seconds):
+        with self.lock:
+            self.samples.extend(seconds)
+            self.count += len(seconds)
+            self.max = max([self.max] + list(seconds))
+    
+    def snapshot(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            count, worst = self.count, self.max
+        pick = lambda q: round(samples[min(int(q * len(samples)), len(samples) - 1)] * 1000, 2) if samples else 0.0
+        return {'count': count, 'p50_ms': pick(0.50), 'p99_ms': pick(0.99), 'max_ms': round(worst * 1000, 2)}
+
+class TradeIngestQueue:
+    """New/amended/closed trade events pushed by the connector. Each micro-batch keeps the highest
+    version per trade_id, drops versions already written, and lands in one transaction."""
+    
+    def __init__(self, storage, prepare, on_committed=None, batch_max=Config.INGEST_BATCH_MAX,
+                 batch_wait=Config.INGEST_BATCH_WAIT, versions_max=Config.INGEST_VERSIONS_MAX):
+        self.storage = storage
+        self.prepare = prepare            # [(kind, raw trade)] -> [trade rows to save]
+        self.on_committed = on_committed  # called with the rows once they are written
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait
+        self.queue = queue.Queue()
+        # trade_id -> last version written. A close is final, so it drops the entry; replays of a
+        # trade that is gone from here are caught by prepare (already tracked / no longer open)
+        self.versions = OrderedDict()
+        self.versions_max = versions_max
+        self.latency = LatencyWindow()    # source event -> commit
+        self.stats = {'events': 0, 'batches': 0, 'written': 0, 'duplicates': 0}
+    
+    def push(self, kind, trade, version=None, at=None):
+        """at: perf_counter() when the source saw the event (default: now), so latency includes the hand-off"""
+        self.queue.put((time.perf_counter() if at is None else at, kind, trade, version))
+    
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+    
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.batch_max:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.apply(batch)
+            except:
+                pass
+    
+    def apply(self, batch):
+        self.stats['events'] += len(batch)
+        latest = {}
+        for event in batch:
+            _, kind, raw, version = event
+            trade_id = str(raw.get('trade_id', '')) if raw else ''
+            if not trade_id:
+                continue
+            written = self.versions.get(trade_id)
+            held = latest.get(trade_id)
+            if version is not None and written is not None and version <= written:
+                self.stats['duplicates'] += 1
+                continue
+            if held is not None:
+                self.stats['duplicates'] += 1
+                if version is not None and held[3] is not None and version < held[3]:
+                    continue
+            latest[trade_id] = event
+        
+        trades = self.prepare([(event[1], event[2]) for event in latest.values()])
+        if trades:
+            self.storage.save_trades_batch(trades)
+        committed = time.perf_counter()
+        for trade_id, event in latest.items():
+            if event[1] == 'close':
+                self.versions.pop(trade_id, None)
+            elif event[3] is not None:
+                self.versions[trade_id] = event[3]
+                self.versions.move_to_end(trade_id)
+        while len(self.versions) > self.versions_max:
+            self.versions.popitem(last=False)
+        self.latency.record_many([committed - event[0] for event in batch])
+        self.stats['batches'] += 1
+        self.stats['written'] += len(trades)
+        if trades and self.on_committed:
+            self.on_committed(trades)
+    
+    def get_stats(self):
+        return dict(self.stats, queued=self.queue.qsize(), latency=self.latency.snapshot())
+
 # ============================================================================
 # TRACKER
 # ============================================================================
 
 class TeamFXTracker:
     def __init__(self):
-        self.bloomberg = BloombergConnector(use_real=Config.USE_REAL_BLOOMBERG)
+        if Config.REPLAY_TICK_LOG:
+            self.bloomberg = ReplayConnector(Config.REPLAY_TICK_LOG, Config.REPLAY_SPEED)
+        else:
+            self.bloomberg = BloombergConnector(use_real=Config.USE_REAL_BLOOMBERG)
         self.storage = shared_db
-        self.tracked_trades = set(t['trade_id'] for t in self.storage.get_all_trades())
+        self.broadcaster = broadcaster
+        self.tracked_trades = self.storage.get_trade_ids()
         self.running = True
+        self.last_reprice = {'open': 0, 'pairs': 0, 'changed': 0}
+        self.ticks = TickHub(rate_cache)
+        self.book = PositionBook() if HAS_NUMPY else None
+        self.book_seq = 0                 # change_seq the book has folded in up to
+        self.ingest = TradeIngestQueue(self.storage, self._prepare_events, self._on_ingested)
     
     def start_monitoring(self):
-        threading.Thread(target=self.monitor_trades_loop, daemon=True).start()
-        threading.Thread(target=self.update_pnl_loop, daemon=True).start()
+        self.storage.start_checkpointer()
+        self.storage.start_archiver()
+        self.load_book()
+        self.sync_from_blotter()
+        self.ingest.start()
+        self.bloomberg.start_event_pump(self.ingest.push)
+        if Config.MARKET_DATA_MODE == 'stream':
+            self.bloomberg.start_stream(self.ticks.on_ticks)
+            threading.Thread(target=self.stream_reprice_loop, daemon=True).start()
+        else:
+            threading.Thread(target=self.update_pnl_loop, daemon=True).start()
+    
+    def sync_from_blotter(self):
+        """One full pass over the connector's blotter at startup; after that trades arrive as events"""
+        try:
+            trades = [scrub_trade_details(raw) for raw in self.bloomberg.get_trades() if raw and raw.get('trade_id')]
+            new = [t for t in trades if t and t.trade_id not in self.tracked_trades]
+            if new and self.storage.save_trades_batch(new):
+                self._on_ingested(new)
+        except:
+            pass
+    
+    def _prepare_events(self, events):
+        trades = [(kind, scrub_trade_details(raw)) for kind, raw in events]
+        # A re-sent close of a trade already closed here would rewrite its realized P&L at today's rate
+        known = [t.trade_id for kind, t in trades if t and kind == 'close' and t.trade_id in self.tracked_trades]
+        try:
+            closed = set(known) - self.storage.get_open_ids(known) if known else set()
+        except:
+            closed = set()  # can't tell: let the closes through rather than lose one
+        trades = [(kind, t) for kind, t in trades if not (t and kind == 'close' and t.trade_id in closed)]
+        # One rate snapshot for every close in the batch
+        rates = self.bloomberg.get_rates(t.currency_pair for kind, t in trades if t and kind == 'close')
+        rows = []
+        for kind, trade in trades:
+            if not trade:
+                continue
+            if kind == 'new' and trade.trade_id in self.tracked_trades:
+                continue
+            if kind == 'close':
+                trade.current_market_rate = rates.get(trade.currency_pair)
+                trade.realized_pnl = self.calculate_pnl(trade)
+            rows.append(trade)
+        return rows
+    
+    def _on_ingested(self, trades):
+        for trade in trades:
+            if trade.trade_id not in self.tracked_trades:
+                self.tracked_trades.add(trade.trade_id)
+                self.ticks.mark_dirty(trade.currency_pair)
+        if self.book is not None:
+            with self.book.lock:
+                self.book.apply(trades)
+        self.broadcaster.notify()
+    
+    def track_trade(self, trade):
+        """A trade saved from the dashboard, new or edited: the book takes its terms now"""
+        self.tracked_trades.add(trade.trade_id)
+        self.ticks.mark_dirty(trade.currency_pair)
+        if self.book is not None:
+            with self.book.lock:
+                self.book.apply([trade])
+    
+    def forget_trade(self, trade_id):
+        self.tracked_trades.discard(trade_id)
+        if self.book is not None:
+            with self.book.lock:
+                self.book.apply(removed_ids=[trade_id])
+    
+    def load_book(self):
+        """Full read of the open trades into the position book; after this it is patched in place"""
+        if self.book is None: return
+        try:
+            seq = self.storage.current_seq()  # read first: anything committed before it is in the load
+            trades = self.storage.get_open_trades()
+        except:
+            return
+        with self.book.lock:
+            self.book.load(trades)
+            self.book_seq = seq
+    
+    def sync_book(self):
+        """Fold in trades opened, amended, closed or deleted on the share since the last pass.
+        Every changed row's terms are checked against the book (most changes are our own marks);
+        full rows are read only for trades new here or whose terms moved."""
+        try:
+            seq, changes, deleted = self.storage.get_book_changes(self.book_seq)
+        except:
+            return
+        if seq == self.book_seq: return
+        reread, gone = [], list(deleted)
+        with self.book.lock:
+            held = self.book.row
+            for trade_id, status, pair, side, notional, entry in changes:
+                if status != 'open':
+                    if trade_id in held:
+                        gone.append(trade_id)
+                elif trade_id not in held:
+                    reread.append(trade_id)
+                else:
+                    try:
+                        if self.book.differs(trade_id, pair, side, notional, entry):
+                            reread.append(trade_id)
+                    except:
+                        reread.append(trade_id)
+        if len(reread) > Config.BOOK_RESYNC_MAX:
+            return self.load_book()
+        trades = self.storage.get_open_trades(trade_ids=reread) if reread else []
+        with self.book.lock:
+            self.book.apply(trades, gone)
+            self.book_seq = seq
     
-    def monitor_trades_loop(self):
+    def update_pnl_loop(self):
         while self.running:
             try:
-                for trade_raw in self.bloomberg.get_trades():
-                    if trade_raw and trade_raw.get('trade_id'):
-                        trade = scrub_trade_details(trade_raw)
-                        if trade and trade['trade_id'] not in self.tracked_trades:
-                            self.tracked_trades.add(trade['trade_id'])
-                            self.storage.save_trade(trade)
-                
-                new_trade, closed_trade = self.bloomberg.check_for_new_events()
-                if new_trade:
-                    trade = scrub_trade_details(new_trade)
-                    if trade and trade['trade_id'] not in self.tracked_trades:
-                        self.tracked_trades.add(trade['trade_id'])
-                        self.storage.save_trade(trade)
-                if closed_trade:
-                    trade = scrub_trade_details(closed_trade)
-                    if trade:
-                        trade['current_market_rate'] = self.bloomberg.get_current_rate(trade['currency_pair'])
-                        trade['realized_pnl'] = self.calculate_pnl(trade)
-                        self.storage.save_trade(trade)
-                time.sleep(30)
+                self.reprice_open_book()
+                time.sleep(1)  # CHANGED: 2 → 1 second
             except:
                 time.sleep(5)
     
-    def update_pnl_loop(self):
+    def stream_reprice_loop(self):
+        self.reprice_open_book()
         while self.running:
             try:
-                for trade in self.storage.get_open_trades():
-                    trade['current_market_rate'] = self.bloomberg.get_current_rate(trade['currency_pair'])
-                    trade['unrealized_pnl'] = self.calculate_pnl(trade)
-                    self.storage.save_trade(trade)
-                time.sleep(1)  # CHANGED: 2 → 1 second
+                pairs = self.ticks.take_dirty()
+                if pairs:
+                    self.reprice_pairs(pairs)
+                time.sleep(Config.STREAM_REPRICE_SECONDS)
             except:
                 time.sleep(5)
     
+    def reprice_open_book(self):
+        """Mark every open trade from one rate snapshot; only marks that moved are written, in a single transaction"""
+        if self.book is not None:
+            self.sync_book()
+            # Snapshot stage: each pair of the open book is fetched once, so every trade in a pair gets the same mark
+            return self._mark_book(self.bloomberg.get_rates(self.book.held_pairs()))
+        trades = self.storage.get_open_trades()
+        snapshot = self.bloomberg.get_rates(t.currency_pair for t in trades)
+        return self._mark_trades(trades, snapshot)
+    
+    def reprice_pairs(self, pairs):
+        """Subscription mode: reprice only the positions in pairs that ticked, from their last tick"""
+        snapshot = {pair: rate_cache.get_last(pair) for pair in pairs}
+        snapshot = {pair: rate for pair, rate in snapshot.items() if rate is not None}
+        if self.book is not None:
+            self.sync_book()
+            return self._mark_book(snapshot, only_quoted=True)
+        return self._mark_trades(self.storage.get_open_trades(pairs), snapshot)
+    
+    def _mark_book(self, snapshot, only_quoted=False):
+        """Reprice the in-memory book (pairs missing from snapshot keep their mark) and write what moved.
+        only_quoted: touch just the positions in the snapshot's pairs, so a tick costs what it moves."""
+        with self.book.lock:
+            rows = self.book.rows_for(snapshot) if only_quoted else None
+            rates, pnl, pips = self.book.reprice([snapshot.get(pair, np.nan) for pair in self.book.pairs], rows)
+            marks = self.book.changed_marks(rates, pnl, pips, rows)
+            held = len(self.book) if rows is None else len(rows)
+        changed = self.storage.update_marks(marks)
+        with self.book.lock:
+            self.book.settle(marks)
+        return self._marked(held, snapshot, changed)
+    
+    def _mark_trades(self, trades, snapshot):
+        """Pure-Python fallback without NumPy: reprice rows fresh from the store"""
+        marks = []
+        for trade in trades:
+            if snapshot.get(trade.currency_pair) is None:
+                continue
+            stored_rate, stored_pnl = trade.current_market_rate, trade.unrealized_pnl
+            trade.current_market_rate = snapshot[trade.currency_pair]
+            trade.unrealized_pnl = self.calculate_pnl(trade)
+            if trade.current_market_rate != stored_rate or trade.unrealized_pnl != stored_pnl:
+                marks.append((trade.trade_id, trade.current_market_rate, trade.unrealized_pnl,
+                              calculate_pips(trade.currency_pair, trade.side, trade.execution_rate, trade.current_market_rate)))
+        return self._marked(len(trades), snapshot, self.storage.update_marks(marks))
+    
+    def _marked(self, held, snapshot, changed):
+        self.last_reprice = {'open': held, 'pairs': len(snapshot), 'changed': changed}
+        if changed:
+            self.broadcaster.notify()
+        return changed
+    
     def calculate_pnl(self, trade):
         try:
-            if not trade.get('current_market_rate'): return 0.0
-            entry, current, amount = float(trade['execution_rate']), float(trade['current_market_rate']), float(trade['notional_amount'])
-            return round((current - entry) * amount if trade['side'] == 'BUY' else (entry - current) * amount, 2)
+            if not trade.current_market_rate: return 0.0
+            entry, current, amount = float(trade.execution_rate), float(trade.current_market_rate), float(trade.notional_amount)
+            return round((current - entry) * amount if trade.side == 'BUY' else (entry - current) * amount, 2)
         except:
             return 0.0
 
@@ -1042,6 +3525,7 @@ def main():
     
     try:
         tracker_instance = TeamFXTracker()
+        atexit.register(lambda: shared_db.close())  # final WAL checkpoint however the window closes
         threading.Thread(target=start_flask, daemon=True).start()
         tracker_instance.start_monitoring()
         
@@ -1061,5 +3545,29 @@ def main():
         input("Press Enter...")
         sys.exit(1)
 
+def run_tick_server(argv):
+    """python fx_tracker_windows.py --tick-server [ticks per second]"""
+    i = argv.index('--tick-server')
+    rate = int(argv[i + 1]) if len(argv) > i + 1 else 1000
+    print(f"Tick server: {rate:,} ticks/s to udp://{Config.TICK_FEED_HOST}:{Config.TICK_FEED_PORT} (Ctrl+C to stop)")
+    try:
+        TickServer(rate).run()
+    except KeyboardInterrupt:
+        pass
+
+def configure_tick_log(argv):
+    """--record: log observed rates to today's tick log. --replay <file> [speed]: price from a log (0 = max speed)"""
+    if '--record' in argv:
+        Config.RECORD_TICKS = True
+    if '--replay' in argv:
+        i = argv.index('--replay')
+        Config.REPLAY_TICK_LOG = argv[i + 1]
+        if len(argv) > i + 2:
+            Config.REPLAY_SPEED = float(argv[i + 2])
+
 if __name__ == '__main__':
-    main()
+    if '--tick-server' in sys.argv:
+        run_tick_server(sys.argv)
+    else:
+        configure_tick_log(sys.argv)
+        main()